@@ -0,0 +1,135 @@
+"""Prompt-token reduction from compact citation tokens.
+
+Usage:
+    # Record the final state of recent runs from a LangGraph server
+    python benchmarks/citation_tokens_benchmark.py --export http://localhost:2024 --out runs.jsonl
+    # Measure the reflection and answer prompts of the recorded runs
+    python benchmarks/citation_tokens_benchmark.py --runs runs.jsonl
+    # Without recordings, measure synthetic runs shaped like real ones
+    python benchmarks/citation_tokens_benchmark.py --synthetic 50
+
+Each run is measured as one reflection prompt per research loop plus the
+answer prompt, built from its `web_research_result` with and without
+`compact_citations`. Tokens are estimated with `estimate_tokens`; pass
+`--gemini-model` to count them with the Gemini API instead. Importing
+`agent` loads the graph, so run it from `backend/` with the usual `.env`
+(or `GEMINI_API_KEY`) in place.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+from typing import Callable, Dict, List
+
+from agent.citations import compact_citations, estimate_tokens
+from agent.prompts import (
+    answer_instructions,
+    compact_citation_instructions,
+    reflection_instructions,
+)
+
+SITES = ["tripadvisor", "burpple", "sethlui", "eatbook", "google", "facebook", "instagram", "misstamchiak"]
+
+
+def synthetic_run(rng: random.Random) -> Dict:
+    """Build a recorded-looking run state with cited summaries."""
+    loops = rng.randint(1, 3)
+    results = []
+    for branch in range(rng.randint(2, 3) + (loops - 1) * 2):
+        sentences = []
+        for _ in range(rng.randint(6, 12)):
+            sentence = " ".join(rng.choice(["the", "dumplings", "are", "priced", "around", "$12", "with", "friendly", "service", "and", "long", "queues"]) for _ in range(rng.randint(10, 20)))
+            links = "".join(
+                f" [{rng.choice(SITES)}](https://vertexaisearch.cloud.google.com/id/{branch}-{rng.randint(0, 14)})"
+                for _ in range(rng.randint(1, 3))
+            )
+            sentences.append(sentence + "." + links)
+        results.append(" ".join(sentences))
+    return {
+        "messages": [{"type": "human", "content": "Tell me about Din Tai Fung at Orchard"}],
+        "web_research_result": results,
+        "research_loop_count": loops,
+    }
+
+
+def prompts(run: Dict, compact: bool) -> List[str]:
+    """Render the reflection and answer prompts of a run."""
+    summaries = run.get("web_research_result") or []
+    if compact:
+        summaries, _ = compact_citations(summaries)
+    topic = next((m.get("content", "") for m in run.get("messages", []) if m.get("type") == "human"), "")
+    reflection = reflection_instructions.format(
+        current_date="January 01, 2025", research_topic=topic, summaries="\n\n---\n\n".join(summaries)
+    )
+    answer = answer_instructions.format(
+        current_date="January 01, 2025", research_topic=topic, summaries="\n---\n\n".join(summaries)
+    )
+    if compact:
+        answer += compact_citation_instructions
+    return [reflection] * max(1, run.get("research_loop_count") or 1) + [answer]
+
+
+def export_runs(url: str, out: str, limit: int) -> int:
+    """Record finished thread states from a LangGraph server as JSONL."""
+    from langgraph_sdk import get_client
+
+    async def fetch():
+        client = get_client(url=url)
+        threads = await client.threads.search(limit=limit, status="idle")
+        states = []
+        for thread in threads:
+            values = thread.get("values") or {}
+            if values.get("web_research_result"):
+                states.append(values)
+        return states
+
+    states = asyncio.run(fetch())
+    with open(out, "w", encoding="utf-8") as handle:
+        for state in states:
+            handle.write(json.dumps(state) + "\n")
+    return len(states)
+
+
+def main() -> None:
+    """Compare prompt tokens with and without compact citations."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="JSONL of recorded run states")
+    parser.add_argument("--synthetic", type=int, default=50)
+    parser.add_argument("--export", help="LangGraph server URL to record runs from")
+    parser.add_argument("--out", default="runs.jsonl")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--gemini-model", help="Count tokens with this Gemini model")
+    args = parser.parse_args()
+
+    if args.export:
+        print(f"Recorded {export_runs(args.export, args.out, args.limit)} runs to {args.out}")  # noqa: T201
+        return
+
+    if args.runs:
+        with open(args.runs, encoding="utf-8") as handle:
+            runs = [json.loads(line) for line in handle if line.strip()]
+    else:
+        rng = random.Random(0)
+        runs = [synthetic_run(rng) for _ in range(args.synthetic)]
+
+    count: Callable[[str], int] = estimate_tokens
+    if args.gemini_model:
+        from google.genai import Client
+
+        client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+        def count(text: str) -> int:
+            return client.models.count_tokens(model=args.gemini_model, contents=text).total_tokens
+
+    before = sum(count(prompt) for run in runs for prompt in prompts(run, compact=False))
+    after = sum(count(prompt) for run in runs for prompt in prompts(run, compact=True))
+    print(f"runs                {len(runs)}")  # noqa: T201
+    print(f"prompt tokens       {before} -> {after}")  # noqa: T201
+    print(f"per run             {before / len(runs):.0f} -> {after / len(runs):.0f}")  # noqa: T201
+    print(f"reduction           {1 - after / before:.1%}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
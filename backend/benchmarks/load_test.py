@@ -0,0 +1,288 @@
+"""HTTP load generator for a LangGraph server running the agent.
+
+Usage:
+    # Offline: start `langgraph dev` with stubbed upstream models and load it
+    python benchmarks/load_test.py --serve-stubbed --rates 1,2,4,8 --stage-seconds 30
+    # Against a running deployment
+    python benchmarks/load_test.py --url http://localhost:2024 --rates 2 --stage-seconds 60
+
+Requests arrive open loop (Poisson) at each rate in `--rates`, one stage per
+rate, so a slow server builds up a backlog instead of slowing the client
+down. Each request is one scenario, picked by the `--mix` weights:
+- run: creates a thread and consumes `/threads/{id}/runs/stream` to the end;
+- research: consumes `POST /research/stream` from `app.py`;
+- ping: calls `GET /ping`.
+
+Topics are drawn by the `--topic-mix` weights from the TOPICS kinds (or from
+`--topics-file`, a JSON object of kind to topics). Graph profiles are drawn
+by the `--profile-mix` weights. Every stage reports the following per
+scenario:
+- time to first byte of the response (of the run stream, for run);
+- completion latency of requests that finished without error;
+- error rate: HTTP errors, error events in the stream, timeouts;
+- completed requests per second.
+
+`--serve-stubbed` serves `langgraph.stubbed.json` (see `stubbed_graph.py`),
+so nothing leaves the machine. Tune the stub latency with
+`STUB_SEARCH_SECONDS` and `STUB_LLM_SECONDS`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+TOPICS = {
+    "lookup": [
+        "Tell me about Din Tai Fung at Orchard",
+        "Tell me about Jumbo Seafood at Clarke Quay",
+        "Tell me about Tim Ho Wan at Plaza Singapura",
+        "Tell me about Burnt Ends at Dempsey",
+        "Tell me about Ya Kun Kaya Toast at Far East Square",
+    ],
+    "open": [
+        "Which ramen places near Bugis are good for a date?",
+        "Compare the best chicken rice stalls in Tiong Bahru",
+        "What are affordable halal brunch spots in the east?",
+    ],
+}
+
+
+@dataclass
+class Result:
+    """Outcome of one request."""
+    stage: float
+    scenario: str
+    started: float
+    ttfb: Optional[float] = None
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """`"run=6,ping=2"` as `{"run": 6.0, "ping": 2.0}`."""
+    weights = {}
+    for part in filter(None, text.split(",")):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def pick(rng: random.Random, weights: Dict[str, float]) -> str:
+    """Draw a name from `weights`."""
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+
+async def consume(response: httpx.Response, result: Result, started: float) -> None:
+    """Read a response to the end, recording TTFB and any error event."""
+    if response.status_code >= 400:
+        await response.aread()
+        result.ttfb = time.perf_counter() - started
+        result.error = f"http_{response.status_code}"
+        return
+    tail = b""
+    async for chunk in response.aiter_raw():
+        if result.ttfb is None:
+            result.ttfb = time.perf_counter() - started
+        # Keep a little of the previous chunk so split event names still match
+        window = tail + chunk
+        if b"event: error" in window:
+            result.error = "stream_error"
+        tail = window[-16:]
+    if result.ttfb is None:
+        result.ttfb = time.perf_counter() - started
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, request: dict, result: Result) -> None:
+    """Send one request of `scenario` and record its timings in `result`."""
+    started = time.perf_counter()
+    if scenario == "ping":
+        response = await client.get("/ping")
+        result.ttfb = time.perf_counter() - started
+        if response.status_code >= 400:
+            result.error = f"http_{response.status_code}"
+    elif scenario == "research":
+        body = {"topic": request["topic"], "configurable": request["configurable"]}
+        async with client.stream("POST", "/research/stream", json=body) as response:
+            await consume(response, result, started)
+    elif scenario == "run":
+        response = await client.post("/threads", json={})
+        if response.status_code >= 400:
+            result.ttfb, result.error = time.perf_counter() - started, f"http_{response.status_code}"
+            return
+        body = {
+            "assistant_id": request["assistant"],
+            "input": {"messages": [{"type": "human", "content": request["topic"]}]},
+            "config": {"configurable": request["configurable"]},
+            "stream_mode": ["values", "custom"],
+        }
+        path = f"/threads/{response.json()['thread_id']}/runs/stream"
+        # TTFB of the run itself, not of creating its thread
+        async with client.stream("POST", path, json=body) as response:
+            await consume(response, result, time.perf_counter())
+    else:
+        raise ValueError(f"Unknown scenario {scenario!r}")
+    if result.error is None:
+        result.latency = time.perf_counter() - started
+
+
+async def one_request(client, semaphore, stage, scenario, request, timeout, results) -> None:
+    """Run one request, or record `client_backlog` when the client is saturated."""
+    result = Result(stage=stage, scenario=scenario, started=time.time())
+    results.append(result)
+    if semaphore.locked():
+        result.error = "client_backlog"
+        return
+    async with semaphore:
+        try:
+            await asyncio.wait_for(run_scenario(client, scenario, request, result), timeout)
+        except TimeoutError:
+            result.error = "timeout"
+        except httpx.HTTPError as e:
+            result.error = type(e).__name__
+
+
+async def run_load(args, topics: Dict[str, List[str]]) -> List[Result]:
+    """Send Poisson arrivals at each rate in turn and collect every result."""
+    rng = random.Random(args.seed)
+    mix = parse_weights(args.mix)
+    topic_mix = {kind: weight for kind, weight in parse_weights(args.topic_mix).items() if topics.get(kind)}
+    profile_mix = parse_weights(args.profile_mix)
+    results: List[Result] = []
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for rate in args.rates:
+            print(f"stage {rate:g} req/s for {args.stage_seconds:g}s")  # noqa: T201
+            tasks = []
+            deadline = time.perf_counter() + args.stage_seconds
+            while time.perf_counter() < deadline:
+                request = {
+                    "topic": rng.choice(topics[pick(rng, topic_mix)]),
+                    "configurable": {"graph_profile": pick(rng, profile_mix)},
+                    "assistant": args.assistant,
+                }
+                tasks.append(asyncio.create_task(
+                    one_request(client, semaphore, rate, pick(rng, mix), request, args.timeout, results)
+                ))
+                await asyncio.sleep(rng.expovariate(rate))
+            await asyncio.gather(*tasks)
+    return results
+
+
+def percentiles(values: List[float]) -> str:
+    """p50/p95/p99 of `values` as text."""
+    if not values:
+        return "-"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"{p50:.2f}/{p95:.2f}/{p99:.2f}"
+
+
+def summarize(results: List[Result], stage_seconds: float) -> List[dict]:
+    """One report row per stage and scenario."""
+    rows = []
+    for stage in sorted({result.stage for result in results}):
+        for scenario in sorted({result.scenario for result in results if result.stage == stage}):
+            group = [result for result in results if result.stage == stage and result.scenario == scenario]
+            ok = [result for result in group if result.error is None]
+            rows.append({
+                "stage": stage,
+                "scenario": scenario,
+                "requests": len(group),
+                "error_rate": 1 - len(ok) / len(group),
+                "errors": dict(Counter(result.error for result in group if result.error)),
+                "ttfb": percentiles([result.ttfb for result in group if result.ttfb is not None]),
+                "latency": percentiles([result.latency for result in ok]),
+                "throughput": len(ok) / stage_seconds,
+            })
+    return rows
+
+
+def print_report(rows: List[dict]) -> None:
+    """Print `rows` as a table."""
+    print(f"{'rate':>6} {'scenario':<9} {'reqs':>5} {'errors':>7} {'ttfb p50/95/99 s':>18} {'latency p50/95/99 s':>21} {'ok/s':>6}")  # noqa: T201
+    for row in rows:
+        print(  # noqa: T201
+            f"{row['stage']:>6g} {row['scenario']:<9} {row['requests']:>5} {row['error_rate']:>7.1%} "
+            f"{row['ttfb']:>18} {row['latency']:>21} {row['throughput']:>6.2f}"
+            + (f"  {row['errors']}" if row["errors"] else "")
+        )
+
+
+def serve_stubbed(port: int) -> subprocess.Popen:
+    """Start `langgraph dev` with the stubbed graphs and wait until it answers."""
+    server = subprocess.Popen(
+        ["langgraph", "dev", "--config", "langgraph.stubbed.json", "--no-browser", "--no-reload", "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"langgraph dev exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://localhost:{port}/ok", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    sys.exit("langgraph dev did not start within 120s")
+
+
+def main() -> None:
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:2024")
+    parser.add_argument("--serve-stubbed", action="store_true", help="Start an offline server with stubbed upstream models")
+    parser.add_argument("--port", type=int, default=2124, help="Port of the --serve-stubbed server")
+    parser.add_argument("--rates", default="1,2,4", help="Arrival rate of each stage, in requests per second")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--mix", default="run=6,research=2,ping=2")
+    parser.add_argument("--topic-mix", default="lookup=8,open=2")
+    parser.add_argument("--topics-file", help="JSON object of topic kind to a list of topics")
+    parser.add_argument("--profile-mix", default="full=1", help="Weights of graph_profile values, e.g. full=1,lite=3")
+    parser.add_argument("--assistant", default="agent")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--max-in-flight", type=int, default=500, help="Requests beyond this count as client_backlog errors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+    args.rates = [float(rate) for rate in args.rates.split(",")]
+
+    topics = TOPICS
+    if args.topics_file:
+        with open(args.topics_file, encoding="utf-8") as handle:
+            topics = json.load(handle)
+
+    server = None
+    if args.serve_stubbed:
+        server = serve_stubbed(args.port)
+        args.url = f"http://localhost:{args.port}"
+    try:
+        results = asyncio.run(run_load(args, topics))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    rows = summarize(results, args.stage_seconds)
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"report": rows, "results": [asdict(result) for result in results]}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""The agent graphs with stubbed upstream models, for offline load tests.
+
+`langgraph.stubbed.json` serves these graphs and `app.py` from one process.
+Because of that, the patches below also apply to `POST /research/stream`. The
+patched upstreams are:
+- Gemini search, which returns canned summaries;
+- the chat models, which return canned queries, reflections and answers;
+- Redis, replaced with an in-process research cache.
+
+Each stub sleeps for a jittered delay to stand in for upstream latency. The
+delays come from `STUB_SEARCH_SECONDS` (default 1.0) and `STUB_LLM_SECONDS`
+(default 0.5). `STUB_SUFFICIENT_RATE` (default 0.5) is the chance that a
+reflection ends the research loop. Nothing leaves the machine.
+"""
+
+import importlib
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("GEMINI_API_KEY", "stubbed")
+
+from agent.research_cache import ResearchCache  # noqa: E402
+from agent.tools_and_schemas import Reflection, SearchQueryList  # noqa: E402
+
+# `agent.graph` the attribute is the compiled graph, so fetch the module itself
+graph_module = importlib.import_module("agent.graph")
+
+SUMMARY = (
+    "The menu is known for its signature dishes and popular items. Prices are around $15 to $30 per person. "
+    "Reviews are mostly positive and diners recommend the service. A new weekend promotion started recently. "
+    "Vegetarian options are available and allergen information is listed. Opening hours are 11am to 10pm."
+)
+
+
+def pause(variable: str, default: float) -> None:
+    """Sleep for a jittered multiple of the seconds set in `variable`."""
+    seconds = float(os.getenv(variable, default))
+    time.sleep(random.uniform(0.5, 1.5) * seconds)
+
+
+class MemoryRedis:
+    """The few Redis commands `ResearchCache` uses, ignoring TTLs."""
+
+    def __init__(self):
+        """Create an empty store."""
+        self.store = {}
+        self.lock = threading.RLock()
+
+    def hset(self, key, field, value):
+        """Redis `HSET` of one field."""
+        with self.lock:
+            self.store.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hgetall(self, key):
+        """Redis `HGETALL`."""
+        with self.lock:
+            return dict(self.store.get(key, {}))
+
+    def rpush(self, key, value):
+        """Redis `RPUSH` of one value."""
+        with self.lock:
+            self.store.setdefault(key, []).append(value.encode())
+
+    def ltrim(self, key, start, end):
+        """Redis `LTRIM` to the last entries, the only range `ResearchCache` uses."""
+        with self.lock:
+            self.store[key] = self.store.get(key, [])[start:]
+
+    def lrange(self, key, start, end):
+        """Redis `LRANGE` from `start` to the end of the list."""
+        with self.lock:
+            return list(self.store.get(key, [])[start:])
+
+    def expire(self, key, ttl):
+        """Redis `EXPIRE`; entries never expire in memory."""
+        pass
+
+    def pipeline(self, transaction=True):
+        """Queue commands to run together, like a MULTI/EXEC pipeline."""
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    """Runs the queued commands under the client's lock, like MULTI/EXEC."""
+
+    def __init__(self, client):
+        """Start an empty pipeline on `client`."""
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        """Queue any client command instead of running it."""
+        def queue(*args):
+            self.commands.append((getattr(self.client, name), args))
+            return self
+        return queue
+
+    def execute(self):
+        """Run the queued commands and return their results."""
+        with self.client.lock:
+            return [command(*args) for command, args in self.commands]
+
+
+class StubChatModel:
+    """Stands in for `ChatGoogleGenerativeAI` and its structured output."""
+
+    def __init__(self, model: str = "stub", schema: type = None, **kwargs):
+        """Answer with canned output for `schema`, or plain text without one."""
+        self.model = model
+        self.schema = schema
+
+    def with_structured_output(self, schema: type) -> "StubChatModel":
+        """Stub whose `invoke` returns an instance of `schema`."""
+        return StubChatModel(self.model, schema)
+
+    def invoke(self, prompt, config=None):
+        """Return a canned answer, query list or reflection after a pause."""
+        pause("STUB_LLM_SECONDS", 0.5)
+        if self.schema is None:
+            return AIMessage(content=f"## 🍽️ Menu Information\n{SUMMARY}")
+        if issubclass(self.schema, SearchQueryList):
+            return SearchQueryList(
+                query=["restaurant menu", "restaurant prices", "restaurant reviews"],
+                rationale="stubbed",
+            )
+        if issubclass(self.schema, Reflection):
+            sufficient = random.random() < float(os.getenv("STUB_SUFFICIENT_RATE", "0.5"))
+            fields = {
+                "is_sufficient": sufficient,
+                "knowledge_gap": "" if sufficient else "recent promotions",
+                "follow_up_queries": [] if sufficient else ["restaurant latest promotions"],
+            }
+            if "confidence" in self.schema.model_fields:
+                fields["confidence"] = 0.9
+            return self.schema(**fields)
+        raise ValueError(f"No stub for {self.schema.__name__}")
+
+
+def generate_content(model: str, contents: str, config=None):
+    """Stand-in for `genai_client.models.generate_content` with a canned summary."""
+    pause("STUB_SEARCH_SECONDS", 1.0)
+    return SimpleNamespace(text=SUMMARY, candidates=[SimpleNamespace(grounding_metadata=None)])
+
+
+graph_module.ChatGoogleGenerativeAI = StubChatModel
+graph_module.genai_client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+_cache = ResearchCache(MemoryRedis())
+graph_module.get_research_cache = lambda: _cache
+
+graph = graph_module.graph
+lite_graph = graph_module.lite_graph
@@ -0,0 +1,94 @@
+"""Recall and QPS of the IVF vector index against brute-force search.
+
+Usage:
+    python benchmarks/vector_search_benchmark.py --size 100000 --queries 200
+
+Importing `agent` loads the graph, so run it from `backend/` with the usual
+`.env` (or `GEMINI_API_KEY`) in place.
+
+Embeddings are synthetic but clustered (like real text embeddings), so the
+recall numbers are representative of restaurant summaries grouped by cuisine
+and area rather than of uniformly random vectors.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from agent.vector_search import VectorIndex, _normalize, brute_force_search
+
+
+def make_dataset(size: int, dim: int, n_topics: int, seed: int) -> np.ndarray:
+    """Generate unit vectors clustered around `n_topics` random topics."""
+    rng = np.random.default_rng(seed)
+    topics = _normalize(rng.standard_normal((n_topics, dim), dtype=np.float32))
+    data = np.empty((size, dim), dtype=np.float32)
+    chunk = 10_000
+    for start in range(0, size, chunk):
+        stop = min(size, start + chunk)
+        assignment = rng.integers(0, n_topics, size=stop - start)
+        noise = rng.standard_normal((stop - start, dim), dtype=np.float32) * 0.03
+        data[start:stop] = _normalize(topics[assignment] + noise)
+    return data
+
+
+def main() -> None:
+    """Compare the index against exact search on recall and latency."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=None, help="Defaults to one topic per 100 vectors")
+    parser.add_argument("--quantization", choices=["int8", "float16"], default="int8")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    n_topics = args.topics or max(1, args.size // 100)
+    data = make_dataset(args.size, args.dim, n_topics, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, args.size, size=args.queries)
+    queries = _normalize(data[picks] + rng.standard_normal((args.queries, args.dim), dtype=np.float32) * 0.03)
+
+    start = time.perf_counter()
+    index = VectorIndex(dim=args.dim, quantization=args.quantization, min_train_size=args.size + 1)
+    batch = 10_000
+    for offset in range(0, args.size, batch):
+        ids = [str(i) for i in range(offset, min(args.size, offset + batch))]
+        index.add(ids, data[offset:offset + batch])
+    index.train()
+    build_seconds = time.perf_counter() - start
+    print(  # noqa: T201
+        f"vectors={args.size} dim={args.dim} quantization={args.quantization} "
+        f"lists={len(index._lists)} build={build_seconds:.1f}s "
+        f"memory={data.nbytes / 2**20:.0f}MiB float32 -> "
+        f"{sum(lst.codes[:lst.size].nbytes for lst in index._lists) / 2**20:.0f}MiB quantized"
+    )
+
+    start = time.perf_counter()
+    truth = [
+        {row for row, _ in brute_force_search(data, query, match_count=args.k)}
+        for query in queries
+    ]
+    brute_qps = args.queries / (time.perf_counter() - start)
+    print(f"brute-force  qps={brute_qps:8.1f}  recall@{args.k}=1.000")  # noqa: T201
+
+    for n_probe in args.n_probe:
+        start = time.perf_counter()
+        results = [
+            index.search(query, match_count=args.k, n_probe=n_probe)
+            for query in queries
+        ]
+        qps = args.queries / (time.perf_counter() - start)
+        hits = sum(
+            len({int(match["id"]) for match in result} & expected)
+            for result, expected in zip(results, truth)
+        )
+        recall = hits / (args.k * args.queries)
+        print(f"ivf n_probe={n_probe:<3} qps={qps:8.1f}  recall@{args.k}={recall:.3f}  speedup={qps / brute_qps:.1f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
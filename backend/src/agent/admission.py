@@ -0,0 +1,221 @@
+"""Admission control and load shedding for research runs.
+
+Every run fans out into several upstream LLM and search calls, so accepting
+all requests during a spike only grows the queue until everyone times out.
+The controller bounds the number of runs in flight, queues a limited number
+of waiters by priority (interactive before batch/warmer traffic), drops
+waiters whose queue-time deadline passes, and rejects immediately with
+503 + `Retry-After` once the queue is full.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+from agent.metrics import metrics
+
+
+class Priority(IntEnum):
+    """Scheduling class of a request; lower values are admitted first."""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, priority: Priority):
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """Bounded in-flight limit with a prioritised, deadline-aware wait queue.
+
+    Args:
+        max_in_flight: Runs allowed to execute concurrently.
+        max_queue: Waiters allowed to queue for a slot.
+        queue_timeouts: Maximum seconds a waiter of each priority may queue.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 64,
+        queue_timeouts: Optional[Dict[Priority, float]] = None,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeouts = {
+            Priority.INTERACTIVE: 10.0,
+            Priority.BATCH: 30.0,
+            **(queue_timeouts or {}),
+        }
+        self.in_flight = 0
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._service_seconds = 5.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Count the waiters still queued for a slot."""
+        return sum(1 for *_, waiter in self._queue if not waiter.future.done())
+
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up, for the `Retry-After` header."""
+        backlog = self.queue_depth + 1
+        return max(1, math.ceil(self._service_seconds * backlog / max(1, self.max_in_flight)))
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority = Priority.INTERACTIVE):
+        """Hold an execution slot for the duration of the block."""
+        await self._acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            # Smoothed service time feeds the Retry-After estimate
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * elapsed
+            self._release()
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+            metrics.increment(f"admission.admitted.{priority.name.lower()}")
+            return
+
+        if self.queue_depth >= self.max_queue and not self._evict_lower_priority(priority):
+            self._reject("queue_full", priority)
+
+        waiter = _Waiter(priority)
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter.future), timeout=self.queue_timeouts[priority]
+            )
+        except TimeoutError:
+            if waiter.future.done() and not waiter.future.exception():
+                # Granted a slot right as the deadline passed; keep it
+                pass
+            else:
+                waiter.future.cancel()
+                self._reject("queue_timeout", priority)
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception():
+                self._release()
+            waiter.future.cancel()
+            raise
+        # An evicted waiter's future carries the rejection
+        waiter.future.result()
+        metrics.observe("admission.queue_seconds", time.monotonic() - waiter.enqueued_at)
+        metrics.increment(f"admission.admitted.{priority.name.lower()}")
+
+    def _release(self) -> None:
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.future.done():
+                # Hand the slot straight to the next waiter
+                waiter.future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _evict_lower_priority(self, priority: Priority) -> bool:
+        """Shed the newest queued waiter of lower priority to make room."""
+        victims = [
+            entry for entry in self._queue
+            if entry[0] > priority and not entry[2].future.done()
+        ]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda entry: (entry[0], entry[1]))
+        metrics.increment(f"admission.rejected.evicted.{victim[0].name.lower()}")
+        victim[2].future.set_exception(AdmissionRejected("evicted", self.retry_after()))
+        return True
+
+    def _reject(self, reason: str, priority: Priority) -> None:
+        metrics.increment(f"admission.rejected.{reason}.{priority.name.lower()}")
+        raise AdmissionRejected(reason, self.retry_after())
+
+
+# POST requests that run research for as long as the request is open
+RUN_PATHS = re.compile(r"^(?:(?:/threads/[^/]+)?/runs/(?:stream|wait)|/research/stream)/?$")
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits run-creating requests through a controller.
+
+    langgraph-api applies the custom `http.app` middleware to its own routes
+    as well, so this also covers `/runs/stream`, `/runs/wait` and their
+    thread variants. A slot is held only while the request is open, so only
+    endpoints that return when the run ends are admitted here. Background
+    runs (`POST /runs`, `/threads/{id}/runs`, `/runs/batch`) return once the
+    run is queued and are bounded by the server's own worker pool
+    (`N_JOBS_PER_WORKER`) instead, as `/jobs` runs are by the research
+    workers. Callers mark prefetch/warmer traffic with
+    `X-Request-Priority: batch`.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: re.Pattern = RUN_PATHS):
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        """Admit or shed run-creating requests, passing everything else through."""
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not self.paths.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        requested = headers.get(b"x-request-priority", b"interactive").decode().lower()
+        priority = Priority.BATCH if requested == "batch" else Priority.INTERACTIVE
+
+        try:
+            async with self.controller.admit(priority):
+                await self.app(scope, receive, send)
+        except AdmissionRejected as rejected:
+            body = json.dumps(
+                {"error": "overloaded", "reason": rejected.reason, "retry_after": rejected.retry_after}
+            ).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(rejected.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+
+def controller_from_env() -> AdmissionController:
+    """Build the controller from the `ADMISSION_*` environment variables."""
+    return AdmissionController(
+        max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+        queue_timeouts={
+            Priority.INTERACTIVE: float(os.getenv("ADMISSION_INTERACTIVE_QUEUE_SECONDS", "10")),
+            Priority.BATCH: float(os.getenv("ADMISSION_BATCH_QUEUE_SECONDS", "30")),
+        },
+    )
@@ -1,7 +1,316 @@
-from fastapi import FastAPI, Response
+import json
+import os
+from typing import Any, Dict, List, Literal, Optional
+from uuid import UUID
+
+import redis
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from agent.admission import AdmissionMiddleware, controller_from_env
+from agent.auth import optional_user, require_index_admin, require_user, run_configurable
+from agent.embeddings import EmbeddingService, get_embedding_service
+from agent.jobs import JobQueue, get_job_queue, get_prefetch_queue
+from agent.metrics import metrics
+from agent.prefetch import Prefetcher
+from agent.progress import sse_events
+from agent.request_profiler import profile_permissions
+from agent.research_cache import get_research_cache
+from agent.vector_search import VectorIndex
+from agent.writeback import WritebackItem, WritebackPipeline, get_writeback_pipeline
 
 app = FastAPI()
 
+# Shed research runs under load before they reach the graph
+admission_controller = controller_from_env()
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+metrics.gauge("admission.in_flight", lambda: admission_controller.in_flight)
+metrics.gauge("admission.queue_depth", lambda: admission_controller.queue_depth)
+
+vector_index = (
+    VectorIndex.load(os.environ["VECTOR_INDEX_PATH"])
+    if os.path.exists(os.getenv("VECTOR_INDEX_PATH", ""))
+    else VectorIndex(dim=int(os.getenv("VECTOR_INDEX_DIM", "1536")))
+)
+
+# Built on first use so importing the app doesn't require embedding credentials
+embedding_service: Optional[EmbeddingService] = None
+
+
+def _get_embedding_service() -> EmbeddingService:
+    global embedding_service
+    if embedding_service is None:
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        embedding_service = get_embedding_service(redis.Redis.from_url(redis_url))
+    return embedding_service
+
+
+job_queue: Optional[JobQueue] = None
+
+
+def _get_job_queue() -> JobQueue:
+    global job_queue
+    if job_queue is None:
+        job_queue = get_job_queue()
+        if os.getenv("JOB_QUEUE_BACKEND", "redis") == "memory":
+            # The in-memory stand-in only reaches workers in this process
+            from agent.worker import start_workers
+
+            start_workers(
+                job_queue,
+                concurrency=int(os.getenv("JOB_WORKER_CONCURRENCY", "2")),
+                background=get_prefetch_queue(),
+            )
+    return job_queue
+
+
+prefetcher: Optional[Prefetcher] = None
+
+
+def _get_prefetcher() -> Prefetcher:
+    global prefetcher
+    if prefetcher is None:
+        # Make sure in-process workers are running in the memory backend
+        _get_job_queue()
+        prefetcher = Prefetcher(
+            get_prefetch_queue(),
+            get_research_cache(),
+            max_per_viewport=int(os.getenv("PREFETCH_MAX_PER_VIEWPORT", "5")),
+            max_queue_depth=int(os.getenv("PREFETCH_MAX_QUEUE_DEPTH", "100")),
+        )
+    return prefetcher
+
+
+def _get_writeback_pipeline() -> WritebackPipeline:
+    pipeline = get_writeback_pipeline()
+    if pipeline is None:
+        raise HTTPException(status_code=503, detail="Write-back is not configured")
+    return pipeline
+
+
+class SearchRequest(BaseModel):
+    """Body of `POST /search`, mirroring the `match_documents` SQL function."""
+    query_embedding: List[float]
+    match_threshold: float = 0.78
+    match_count: int = Field(default=10, ge=1, le=1000)
+
+
+class EmbedRequest(BaseModel):
+    """Body of `POST /embed`."""
+    texts: List[str] = Field(min_length=1)
+
+
+class JobRequest(BaseModel):
+    """Body of `POST /jobs`."""
+    topic: str = Field(min_length=1)
+    configurable: Dict[str, Any] = Field(default_factory=dict)
+    priority: Literal["interactive", "batch"] = "interactive"
+
+
+class ResearchRequest(BaseModel):
+    """Body of `POST /research/stream`."""
+    topic: str = Field(min_length=1)
+    configurable: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ViewportRestaurant(BaseModel):
+    """A restaurant visible on the map."""
+    id: Optional[str] = None
+    name: str
+    lat: float
+    lon: float
+    address: Optional[str] = None
+    cuisine: Optional[str] = None
+    website: Optional[str] = None
+
+
+class BoundingBox(BaseModel):
+    """Visible map area in degrees."""
+    south: float
+    west: float
+    north: float
+    east: float
+
+
+class Coordinates(BaseModel):
+    """A point on the map."""
+    lat: float
+    lon: float
+
+
+class PrefetchRequest(BaseModel):
+    """Body of `POST /prefetch`: the session's current viewport."""
+    session_id: str = Field(min_length=1)
+    restaurants: List[ViewportRestaurant] = Field(default_factory=list)
+    bbox: Optional[BoundingBox] = None
+    center: Optional[Coordinates] = None
+    limit: Optional[int] = Field(default=None, ge=1)
+    configurable: Dict[str, Any] = Field(default_factory=dict)
+
+
+class WritebackAnswer(BaseModel):
+    """A finalized research answer about one restaurant."""
+    restaurant_name: str = Field(min_length=1)
+    answer: str = Field(min_length=1)
+    restaurant_address: Optional[str] = None
+    interaction_id: Optional[UUID] = None
+
+
+class WritebackRequest(BaseModel):
+    """Body of `POST /writeback`."""
+    items: List[WritebackAnswer] = Field(min_length=1)
+
+
+class IndexedEmbedding(BaseModel):
+    """An embedding to add to the search index."""
+    id: str
+    embedding: List[float]
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class IndexRequest(BaseModel):
+    """Body of `POST /search/index`."""
+    items: List[IndexedEmbedding]
+
+
 @app.get("/ping")
 def ping():
-    return {"message": "pong"}
\ No newline at end of file
+    return {"message": "pong"}
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Counters, timers and reports of every registered component."""
+    return metrics.snapshot()
+
+
+@app.post("/search")
+def search(request: SearchRequest, user_id: str = Depends(require_user)):
+    """Approximate drop-in for the `match_documents` SQL function, for signed-in users."""
+    try:
+        matches = vector_index.search(
+            request.query_embedding,
+            match_count=request.match_count,
+            match_threshold=request.match_threshold,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"matches": matches}
+
+
+@app.post("/search/index", dependencies=[Depends(require_index_admin)])
+def index_embeddings(request: IndexRequest):
+    """Incrementally insert or replace embeddings in the shared search index."""
+    if not request.items:
+        return {"indexed": 0, "size": len(vector_index)}
+    try:
+        vector_index.add(
+            [item.id for item in request.items],
+            [item.embedding for item in request.items],
+            [item.metadata for item in request.items],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"indexed": len(request.items), "size": len(vector_index)}
+
+
+@app.post("/embed")
+def embed(request: EmbedRequest):
+    """Embed many texts, streaming one NDJSON line per text as vectors arrive."""
+    service = _get_embedding_service()
+
+    def stream():
+        for position, vector in service.embed_stream(request.texts):
+            yield json.dumps({"index": position, "embedding": vector}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/research/stream")
+def stream_research(request: ResearchRequest, http_request: Request, user_id: Optional[str] = Depends(optional_user)):
+    """Run research in this process and stream its progress as server-sent events.
+
+    `progress` events carry the generated queries, each finished search with
+    its sources and every reflection decision; a final `answer` event carries
+    the answer and the cited sources.
+    """
+    from langchain_core.messages import HumanMessage
+
+    from agent.graph import graph
+
+    # Checked like the server's auth handler does, so admins can profile this run too
+    configurable = run_configurable(request.configurable, user_id)
+    if "x-profile" in http_request.headers:
+        configurable["x-profile"] = http_request.headers["x-profile"]
+    configurable["langgraph_auth_permissions"] = profile_permissions(http_request.headers.get("x-profile-token"))
+    chunks = graph.stream(
+        {"messages": [HumanMessage(content=request.topic)]},
+        {"configurable": configurable},
+        stream_mode=["custom", "values"],
+    )
+    return StreamingResponse(sse_events(chunks), media_type="text/event-stream")
+
+
+@app.post("/jobs", status_code=202)
+def create_job(request: JobRequest, user_id: Optional[str] = Depends(optional_user)):
+    """Queue a research run for the worker pool instead of running it here."""
+    configurable = run_configurable(request.configurable, user_id)
+    job_id = _get_job_queue().enqueue(request.topic, configurable, request.priority)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, wait: float = 0):
+    """Poll a job, optionally long-polling up to `wait` seconds for it to finish."""
+    queue = _get_job_queue()
+    if wait > 0:
+        status = queue.wait(job_id, timeout=min(wait, 60))
+    else:
+        status = queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@app.post("/prefetch", status_code=202)
+def prefetch(request: PrefetchRequest, user_id: Optional[str] = Depends(optional_user)):
+    """Queue low-priority research for the restaurants most likely to be opened.
+
+    Each call replaces the session's previous viewport; queued runs for
+    restaurants that dropped out of it are cancelled.
+    """
+    return _get_prefetcher().schedule(
+        request.session_id,
+        [restaurant.model_dump() for restaurant in request.restaurants],
+        bbox=request.bbox.model_dump() if request.bbox else None,
+        center=request.center.model_dump() if request.center else None,
+        limit=request.limit,
+        configurable=run_configurable(request.configurable, user_id),
+    )
+
+
+@app.delete("/prefetch/{session_id}")
+def cancel_prefetch(session_id: str):
+    """Cancel every queued prefetch run of a session."""
+    return {"cancelled": _get_prefetcher().cancel(session_id)}
+
+
+@app.post("/writeback", status_code=202)
+def writeback(request: WritebackRequest, response: Response, user_id: str = Depends(require_user)):
+    """Queue the authenticated user's finalized answers for a bulk write-back.
+
+    When the buffer is full the rejected items are reported back and the
+    client should retry them after `Retry-After` seconds.
+    """
+    pipeline = _get_writeback_pipeline()
+    rejected = [
+        index
+        for index, item in enumerate(request.items)
+        if not pipeline.submit(WritebackItem(user_id=user_id, **item.model_dump(mode="json")))
+    ]
+    if len(rejected) == len(request.items):
+        raise HTTPException(status_code=503, detail="Write-back queue is full", headers={"Retry-After": "5"})
+    if rejected:
+        response.headers["Retry-After"] = "5"
+    return {"accepted": len(request.items) - len(rejected), "rejected": rejected}
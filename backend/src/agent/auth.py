@@ -0,0 +1,136 @@
+"""Supabase access-token authentication for the HTTP routes and the graph runs.
+
+The mobile app signs users in with Supabase, so a request can carry the user's
+access token as `Authorization: Bearer <jwt>`. The token is an HS256 JWT
+signed with the project's JWT secret (`SUPABASE_JWT_SECRET`), and its `sub`
+claim is the user id that `user_restaurant_interactions.user_id` references.
+
+- `require_user` is the FastAPI dependency for routes that write a user's data.
+- `require_index_admin` guards the shared search index, which only the
+  holder of `INDEX_ADMIN_TOKEN` (sent as `X-Index-Token`) may change.
+- `auth` is the LangGraph server's handler, registered in `langgraph.json`.
+  The server puts the verified user id in the run's `langgraph_auth_user_id`,
+  a key clients cannot set themselves.
+- `run_configurable` does the same for the runs started from `app.py`.
+
+The handler also grants the profiling permission for a valid `X-Profile-Token`
+header (see `request_profiler`) and drops that token from any run's
+`configurable` before the run is stored.
+
+Nodes read the run's user with `authenticated_user`. Without
+`SUPABASE_JWT_SECRET` the server accepts anonymous runs, which have no user.
+"""
+
+import hmac
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi import HTTPException, Request
+from langgraph_sdk import Auth
+
+from agent.request_profiler import profile_permissions
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS = "anonymous"
+USER_KEY = "langgraph_auth_user_id"
+# Set by the server, never taken from a client's configurable
+RESERVED_KEYS = ("langgraph_auth_user", USER_KEY, "langgraph_auth_permissions")
+# Credentials that must never be stored with a run
+SECRET_KEYS = ("x-profile-token", "profile_token")
+
+
+def verify_token(authorization: Optional[str]) -> str:
+    """User id of a Supabase bearer token.
+
+    Raises:
+        HTTPException: 401 for a missing or invalid token, 503 when
+            `SUPABASE_JWT_SECRET` isn't set.
+    """
+    secret = os.getenv("SUPABASE_JWT_SECRET")
+    if not secret:
+        raise HTTPException(status_code=503, detail="Authentication is not configured")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = jwt.decode(token, secret, algorithms=["HS256"], audience="authenticated")
+    except jwt.InvalidTokenError as e:
+        logger.info("Rejected access token: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    if not claims.get("sub"):
+        raise HTTPException(status_code=401, detail="Token has no subject", headers={"WWW-Authenticate": "Bearer"})
+    return claims["sub"]
+
+
+def require_user(request: Request) -> str:
+    """FastAPI dependency returning the authenticated user's id."""
+    return verify_token(request.headers.get("authorization"))
+
+
+def require_index_admin(request: Request) -> None:
+    """FastAPI dependency accepting only requests with the index admin token.
+
+    Raises:
+        HTTPException: 401 for a missing or wrong `X-Index-Token`, 503 when
+            `INDEX_ADMIN_TOKEN` isn't set.
+    """
+    admin_token = os.getenv("INDEX_ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=503, detail="Index administration is not configured")
+    token = request.headers.get("x-index-token", "")
+    if not hmac.compare_digest(token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid index token")
+
+
+def optional_user(request: Request) -> Optional[str]:
+    """FastAPI dependency returning the user's id, or None without a token."""
+    if "authorization" not in request.headers:
+        return None
+    return verify_token(request.headers["authorization"])
+
+
+def run_configurable(configurable: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+    """Return a client's configurable with the run's user set from the request."""
+    configurable = {
+        key: value for key, value in configurable.items() if key not in RESERVED_KEYS and key not in SECRET_KEYS
+    }
+    if user_id:
+        configurable[USER_KEY] = user_id
+    return configurable
+
+
+def authenticated_user(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Return the verified user id of a graph run, or None for anonymous runs."""
+    user_id = ((config or {}).get("configurable") or {}).get(USER_KEY)
+    return user_id if user_id and user_id != ANONYMOUS else None
+
+
+auth = Auth()
+
+
+@auth.authenticate
+async def authenticate(
+    authorization: Optional[str], headers: Optional[Dict[bytes, bytes]] = None
+) -> Auth.types.MinimalUserDict:
+    """Authenticate LangGraph server requests with the same Supabase tokens."""
+    profile_token = (headers or {}).get(b"x-profile-token")
+    permissions = profile_permissions(profile_token.decode() if profile_token else None)
+    if not os.getenv("SUPABASE_JWT_SECRET"):
+        return {"identity": ANONYMOUS, "is_authenticated": False, "permissions": permissions}
+    try:
+        return {"identity": verify_token(authorization), "permissions": permissions}
+    except HTTPException as e:
+        raise Auth.exceptions.HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@auth.on.threads.create_run
+async def drop_secrets(ctx: Auth.types.AuthContext, value: Auth.types.RunsCreate) -> None:
+    """Remove credentials from a new run's configurable before it is stored."""
+    config = (value.get("kwargs") or {}).get("config") or {}
+    for section in (config.get("configurable"), (value.get("kwargs") or {}).get("context")):
+        for key in SECRET_KEYS:
+            if isinstance(section, dict):
+                section.pop(key, None)
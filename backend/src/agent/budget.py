@@ -0,0 +1,238 @@
+"""Token and cost budgets per run and per tenant.
+
+The cost of a run grows with its query count and loop count, and with the
+summaries that `reflection` and `finalize_answer` include in every prompt.
+Usage is read from the usage metadata of each model call and grounded search.
+Each node returns it in the `usage` state key, and the run's total is summed
+there and returned with the answer:
+
+    {"input_tokens": 1234, "output_tokens": 321, "total_tokens": 1555,
+     "cost_usd": 0.0731, "llm_calls": 4, "searches": 2}
+
+Usage is also charged to the run's tenant, the user its access token was
+verified for, over a sliding window. Once the run or its tenant reaches a
+token or cost budget, `reflection` skips its model call and
+`evaluate_research` sends the run straight to `finalize_answer`. Research
+already in flight still completes, so the budget can be overshot by at most
+one loop. The budgets are server settings read from the environment, never
+from a run's `configurable`:
+
+    RUN_TOKEN_BUDGET, RUN_COST_BUDGET_USD, TENANT_TOKEN_BUDGET,
+    TENANT_COST_BUDGET_USD, TENANT_BUDGET_WINDOW_SECONDS (default one day)
+
+A budget of 0 means no limit.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from agent.metrics import metrics
+
+# USD per million (input, output) tokens, matched by model name prefix
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+# Unknown models are priced like the most expensive flash model
+DEFAULT_PRICE = (0.30, 2.50)
+# Grounding with Google Search is billed per request on top of tokens
+SEARCH_COST_USD = 0.035
+
+USAGE_KEYS = ("input_tokens", "output_tokens", "total_tokens", "llm_calls", "searches")
+
+
+def empty_usage() -> Dict[str, Any]:
+    """Usage with every count at zero."""
+    return {**dict.fromkeys(USAGE_KEYS, 0), "cost_usd": 0.0}
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """USD cost of a call to `model`, priced by the longest matching prefix."""
+    prefix = max((name for name in MODEL_PRICES if model.startswith(name)), key=len, default=None)
+    input_price, output_price = MODEL_PRICES[prefix] if prefix else DEFAULT_PRICE
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def add_usage(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """State reducer: sum usage, starting over when a new run begins.
+
+    `generate_query` tags its usage with the run id, so a thread's next turn
+    does not inherit the previous run's totals (or budget).
+    """
+    if not right:
+        return left or empty_usage()
+    if not left or (right.get("run") and right["run"] != left.get("run")):
+        return {**empty_usage(), **right}
+    total = {key: left.get(key, 0) + right.get(key, 0) for key in USAGE_KEYS}
+    total["cost_usd"] = round(left.get("cost_usd", 0.0) + right.get("cost_usd", 0.0), 6)
+    if left.get("run"):
+        total["run"] = left["run"]
+    return total
+
+
+def model_usage(model: str, input_tokens: int, output_tokens: int, **counts: int) -> Dict[str, Any]:
+    """Usage of one model call, with any extra counts such as `llm_calls`."""
+    return {
+        **empty_usage(),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "cost_usd": round(estimate_cost(model, input_tokens, output_tokens), 6),
+        **counts,
+    }
+
+
+def search_usage(model: str, response: Any) -> Dict[str, Any]:
+    """Usage of a grounded `generate_content` search from its `usage_metadata`."""
+    metadata = getattr(response, "usage_metadata", None)
+    counts = [getattr(metadata, name, None) for name in ("prompt_token_count", "candidates_token_count")]
+    input_tokens, output_tokens = (count if isinstance(count, int) else 0 for count in counts)
+    usage = model_usage(model, input_tokens, output_tokens, searches=1)
+    usage["cost_usd"] = round(usage["cost_usd"] + SEARCH_COST_USD, 6)
+    return usage
+
+
+class UsageTracker(BaseCallbackHandler):
+    """Callback that sums the usage metadata of the chat model calls it sees.
+
+    Pass it as `config={"callbacks": [tracker]}` to `invoke`. That includes
+    structured-output runnables, whose inner chat model reports the usage.
+
+    Args:
+        model: Name used for pricing when a response doesn't report its model.
+    """
+
+    def __init__(self, model: str):
+        """Create a tracker with no usage yet."""
+        self.model = model
+        self.usage = empty_usage()
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        """Add the usage metadata of every generation in `response`."""
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "usage_metadata", None) or {}
+                model = (getattr(message, "response_metadata", None) or {}).get("model_name") or self.model
+                usage = model_usage(
+                    model, metadata.get("input_tokens", 0), metadata.get("output_tokens", 0), llm_calls=1
+                )
+                with self._lock:
+                    self.usage = add_usage(self.usage, usage)
+
+
+class TenantLedger:
+    """Usage charged to each tenant over a sliding window."""
+
+    def __init__(self):
+        """Create an empty ledger."""
+        self._charges: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def charge(self, tenant: str, usage: Dict[str, Any]) -> None:
+        """Record `usage` against `tenant` now."""
+        with self._lock:
+            self._charges[tenant].append((time.monotonic(), usage["total_tokens"], usage["cost_usd"]))
+
+    def spent(self, tenant: str, window: float) -> Dict[str, float]:
+        """Tokens and cost `tenant` was charged within the last `window` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            charges = self._charges.get(tenant)
+            if not charges:
+                return {"total_tokens": 0, "cost_usd": 0.0}
+            while charges and now - charges[0][0] > window:
+                charges.popleft()
+            return {
+                "total_tokens": sum(tokens for _, tokens, _ in charges),
+                "cost_usd": round(sum(cost for _, _, cost in charges), 6),
+            }
+
+    def tenants(self) -> list:
+        """Tenants charged since start."""
+        with self._lock:
+            return list(self._charges)
+
+
+tenant_ledger = TenantLedger()
+
+
+@dataclass(frozen=True)
+class BudgetLimits:
+    """Token and cost limits of a run and of a tenant's window. 0 means no limit."""
+
+    run_tokens: int = 0
+    run_cost_usd: float = 0.0
+    tenant_tokens: int = 0
+    tenant_cost_usd: float = 0.0
+    window_seconds: float = 86400.0
+
+
+def limits_from_env() -> BudgetLimits:
+    """Read the budgets from the server environment."""
+    return BudgetLimits(
+        run_tokens=int(os.getenv("RUN_TOKEN_BUDGET", "0")),
+        run_cost_usd=float(os.getenv("RUN_COST_BUDGET_USD", "0")),
+        tenant_tokens=int(os.getenv("TENANT_TOKEN_BUDGET", "0")),
+        tenant_cost_usd=float(os.getenv("TENANT_COST_BUDGET_USD", "0")),
+        window_seconds=float(os.getenv("TENANT_BUDGET_WINDOW_SECONDS", "86400")),
+    )
+
+
+def record_usage(usage: Dict[str, Any], tenant: Optional[str]) -> Dict[str, Any]:
+    """Charge a node's usage to the run's tenant and return it for the state update."""
+    metrics.increment("budget.total_tokens", usage["total_tokens"])
+    metrics.increment("budget.cost_usd", usage["cost_usd"])
+    if tenant:
+        tenant_ledger.charge(tenant, usage)
+    return usage
+
+
+def exhausted_budget(
+    usage: Optional[Dict[str, Any]], tenant: Optional[str], limits: Optional[BudgetLimits] = None
+) -> Optional[str]:
+    """Name of the first budget the run has used up, or None."""
+    usage = usage or empty_usage()
+    limits = limits or limits_from_env()
+    checks = [
+        ("run_tokens", usage.get("total_tokens", 0), limits.run_tokens),
+        ("run_cost", usage.get("cost_usd", 0.0), limits.run_cost_usd),
+    ]
+    if tenant and (limits.tenant_tokens or limits.tenant_cost_usd):
+        spent = tenant_ledger.spent(tenant, limits.window_seconds)
+        checks += [
+            ("tenant_tokens", spent["total_tokens"], limits.tenant_tokens),
+            ("tenant_cost", spent["cost_usd"], limits.tenant_cost_usd),
+        ]
+    for name, used, limit in checks:
+        if limit and used >= limit:
+            metrics.increment(f"budget.exhausted.{name}")
+            return name
+    return None
+
+
+def budget_report() -> dict:
+    """Usage and budget stops since start."""
+    return {
+        "total_tokens": metrics.counter("budget.total_tokens"),
+        "cost_usd": round(metrics.counter("budget.cost_usd"), 6),
+        "exhausted": {
+            name: metrics.counter(f"budget.exhausted.{name}")
+            for name in ("run_tokens", "run_cost", "tenant_tokens", "tenant_cost")
+        },
+        "tenants": len(tenant_ledger.tenants()),
+    }
+
+
+metrics.register_report("budget", budget_report)
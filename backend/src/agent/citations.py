@@ -0,0 +1,59 @@
+"""Compact citation tokens for the reflection and answer prompts.
+
+`web_research` summaries cite sources as `[label](https://vertexaisearch.cloud.google.com/id/3-12)`,
+and every summary is re-sent to `reflection` and `finalize_answer` on each
+loop. Before a prompt is built the links are replaced by tokens such as
+`[c3.12]`; the table built along the way maps every token back to its label
+and short URL, so the model's answer can be expanded to the exact markdown
+links it would otherwise have copied.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from agent.metrics import metrics
+
+CITATION_LINK = re.compile(
+    r"\[(?P<label>[^\[\]]*)\]\((?P<url>https://vertexaisearch\.cloud\.google\.com/id/(?P<id>\d+)-(?P<idx>\d+))\)"
+)
+CITATION_TOKEN = re.compile(r"\[c(?P<id>\d+)\.(?P<idx>\d+)\]")
+
+# token -> (label, short url)
+CitationTable = Dict[str, Tuple[str, str]]
+
+
+def compact_citations(texts: List[str]) -> Tuple[List[str], CitationTable]:
+    """Replace citation links in `texts` with tokens and return the token table."""
+    table: CitationTable = {}
+
+    def to_token(match: re.Match) -> str:
+        token = f"[c{match.group('id')}.{match.group('idx')}]"
+        table.setdefault(token, (match.group("label"), match.group("url")))
+        return token
+
+    return [CITATION_LINK.sub(to_token, text) for text in texts], table
+
+
+def expand_citations(text: str, table: CitationTable) -> str:
+    """Turn tokens back into `[label](short_url)` links.
+
+    Tokens missing from the table were made up by the model and are dropped.
+    """
+
+    def to_link(match: re.Match) -> str:
+        citation = table.get(match.group(0))
+        if citation is None:
+            metrics.increment("citations.unknown_tokens")
+            return ""
+        label, url = citation
+        return f"[{label}]({url})"
+
+    return CITATION_TOKEN.sub(to_link, text)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE-style token count: words split into 4-character pieces plus punctuation."""
+    return sum(
+        max(1, -(-len(piece) // 4)) if piece[0].isalnum() else 1
+        for piece in re.findall(r"\w+|[^\w\s]", text)
+    )
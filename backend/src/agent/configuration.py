@@ -39,6 +39,184 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    graph_profile: str = Field(
+        default="full",
+        metadata={
+            "description": "Research profile of the run: \"full\" for the complete research loop or \"lite\" for a single search and a short summary, e.g. for list-view previews."
+        },
+    )
+
+    adaptive_depth: bool = Field(
+        default=True,
+        metadata={
+            "description": "Reduce the number of initial queries and research loops while the service is overloaded, down to the configured minimums."
+        },
+    )
+
+    min_initial_queries: int = Field(
+        default=1,
+        metadata={"description": "The fewest initial search queries a run is reduced to under load."},
+    )
+
+    min_research_loops: int = Field(
+        default=1,
+        metadata={"description": "The fewest research loops a run is reduced to under load."},
+    )
+
+    target_in_flight_runs: int = Field(
+        default=16,
+        metadata={
+            "description": "Concurrent research runs above which research depth starts to be reduced."
+        },
+    )
+
+    target_upstream_latency_seconds: float = Field(
+        default=20.0,
+        metadata={
+            "description": "Mean upstream call latency above which research depth starts to be reduced."
+        },
+    )
+
+    enable_query_fast_path: bool = Field(
+        default=True,
+        metadata={
+            "description": "Plan queries from templates for simple restaurant lookups instead of calling the query generator model."
+        },
+    )
+
+    reflection_cascade: bool = Field(
+        default=False,
+        metadata={
+            "description": "Let a cheaper model make the reflection decision first and only escalate to the reflection model when it is unsure."
+        },
+    )
+
+    reflection_cascade_model: str = Field(
+        default="gemini-2.0-flash-lite",
+        metadata={
+            "description": "The name of the cheaper language model used first in the reflection cascade."
+        },
+    )
+
+    reflection_cascade_threshold: float = Field(
+        default=0.7,
+        metadata={
+            "description": "Minimum confidence of the cascade model's decision below which reflection escalates to the reflection model."
+        },
+    )
+
+    coverage_check: bool = Field(
+        default=False,
+        metadata={
+            "description": "Score the summaries against the answer's sections locally and skip the reflection model when the result is already clear."
+        },
+    )
+
+    coverage_min_sentences: int = Field(
+        default=2,
+        metadata={
+            "description": "Number of summary sentences about an answer section needed for the coverage check to count it as covered."
+        },
+    )
+
+    enable_hedging: bool = Field(
+        default=False,
+        metadata={
+            "description": "Issue a duplicate web search when a call outlives the model's observed latency quantile."
+        },
+    )
+
+    hedge_quantile: float = Field(
+        default=0.95,
+        metadata={
+            "description": "Latency quantile of previous calls after which a hedged web search is issued."
+        },
+    )
+
+    hedge_budget_ratio: float = Field(
+        default=0.05,
+        metadata={
+            "description": "Maximum share of web searches that may be hedged."
+        },
+    )
+
+    upstream_timeout_seconds: float = Field(
+        default=60.0,
+        metadata={
+            "description": "Seconds a model or web search call may take before it counts as a failure."
+        },
+    )
+
+    circuit_failure_threshold: int = Field(
+        default=5,
+        metadata={
+            "description": "Consecutive failures of a model after which its circuit breaker opens."
+        },
+    )
+
+    circuit_reset_seconds: float = Field(
+        default=30.0,
+        metadata={
+            "description": "Seconds an open circuit breaker waits before letting a probe call through."
+        },
+    )
+
+    conversation_window_messages: int = Field(
+        default=6,
+        metadata={
+            "description": "Number of most recent messages included verbatim in prompts; older messages are replaced by a rolling summary."
+        },
+    )
+
+    conversation_summary_model: str = Field(
+        default="gemini-2.0-flash-lite",
+        metadata={
+            "description": "The name of the language model used to summarise older conversation turns."
+        },
+    )
+
+    compact_citations: bool = Field(
+        default=True,
+        metadata={
+            "description": "Send citations to the reflection and answer models as compact tokens like [c3.12] and expand them into links in the final answer."
+        },
+    )
+
+    writeback_answers: bool = Field(
+        default=True,
+        metadata={
+            "description": "Queue the final answer of an authenticated single-restaurant run for the summary and embedding write-back, when write-back is configured."
+        },
+    )
+
+    enable_memory_profiling: bool = Field(
+        default=False,
+        metadata={
+            "description": "Record tracemalloc peaks, allocation sites and serialized state size for every node on /metrics."
+        },
+    )
+
+    state_size_budget_bytes: int = Field(
+        default=0,
+        metadata={
+            "description": "Serialized state size above which nodes warn or compact their input; 0 disables the budget."
+        },
+    )
+
+    state_budget_action: str = Field(
+        default="warn",
+        metadata={
+            "description": "What to do when the state exceeds its budget: 'warn' or 'compact'."
+        },
+    )
+
+    profile_run: bool = Field(
+        default=False,
+        metadata={
+            "description": "Profile this run with a sampling profiler and attach a per-node breakdown and flamegraph to its state. Requires the admin token in the X-Profile-Token header."
+        },
+    )
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
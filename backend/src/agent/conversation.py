@@ -0,0 +1,128 @@
+"""Bounded conversation context for the research prompts.
+
+`get_research_topic` renders the whole transcript, including every earlier
+markdown answer, so prompts grow with each turn. The context built here keeps
+the most recent messages verbatim and replaces older ones with a rolling
+summary. Summaries are cached by a digest of the messages they cover; when
+more messages leave the window, the longest cached summary is extended with
+just the newly dropped messages instead of re-summarising the transcript.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+
+from agent.metrics import metrics
+from agent.prompts import conversation_summary_instructions
+from agent.utils import get_research_topic
+
+logger = logging.getLogger(__name__)
+
+# prompt -> summary text
+Summarize = Callable[[str], str]
+
+
+def render_messages(messages: List[AnyMessage]) -> str:
+    """Render a conversation as `User:`/`Assistant:` lines for a prompt."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage) and message.content:
+            lines.append(f"User: {message.content}")
+        elif isinstance(message, AIMessage) and message.content:
+            lines.append(f"Assistant: {message.content}")
+    return "\n".join(lines)
+
+
+def prefix_digests(messages: List[AnyMessage]) -> List[str]:
+    """Digest of every prefix of `messages`; entry `i` covers `messages[:i + 1]`."""
+    digests = []
+    running = hashlib.sha1()
+    for message in messages:
+        running.update(type(message).__name__.encode())
+        running.update(str(message.content).encode("utf-8"))
+        running.update(b"\0")
+        digests.append(running.copy().hexdigest())
+    return digests
+
+
+class SummaryCache:
+    """Small LRU of rolling summaries keyed by the digest of what they cover."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the summary stored for `digest`, marking it recently used."""
+        with self._lock:
+            summary = self._entries.get(digest)
+            if summary is not None:
+                self._entries.move_to_end(digest)
+            return summary
+
+    def put(self, digest: str, summary: str) -> None:
+        """Store a summary, evicting the least recently used past `max_entries`."""
+        with self._lock:
+            self._entries[digest] = summary
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+summary_cache = SummaryCache()
+
+
+def rolling_summary(older: List[AnyMessage], summarize: Summarize) -> str:
+    """Summary of `older`, extending the longest cached summary of a prefix."""
+    digests = prefix_digests(older)
+    cached = summary_cache.get(digests[-1])
+    if cached is not None:
+        metrics.increment("conversation.summary_cache_hits")
+        return cached
+
+    previous, covered = "", 0
+    for index in range(len(digests) - 2, -1, -1):
+        summary = summary_cache.get(digests[index])
+        if summary is not None:
+            previous, covered = summary, index + 1
+            break
+
+    prompt = conversation_summary_instructions.format(
+        summary=previous or "(none)",
+        messages=render_messages(older[covered:]),
+    )
+    try:
+        with metrics.timer("conversation.summary_seconds"):
+            summary = summarize(prompt).strip()
+    except Exception as e:
+        logger.warning("Error summarizing conversation: %s", e)
+        # The user's own questions carry most of the context and are short
+        questions = render_messages([m for m in older[covered:] if isinstance(m, HumanMessage)])
+        return "\n".join(part for part in (previous, questions) if part)
+    metrics.increment("conversation.summaries")
+    summary_cache.put(digests[-1], summary)
+    return summary
+
+
+def get_conversation_context(
+    messages: List[AnyMessage], summarize: Summarize, window: int = 6
+) -> str:
+    """Research context with the last `window` messages and a summary of the rest.
+
+    Conversations that fit in the window are rendered exactly like
+    `get_research_topic`, so single-turn requests are unchanged.
+    """
+    if len(messages) <= window:
+        return get_research_topic(messages)
+
+    older, recent = messages[:-window], messages[-window:]
+    summary = rolling_summary(older, summarize)
+    return (
+        f"Summary of the earlier conversation:\n{summary}\n\n"
+        f"Recent messages:\n{render_messages(recent)}\n"
+    )
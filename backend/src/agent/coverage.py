@@ -0,0 +1,124 @@
+"""Local coverage check that stands in for the reflection model when it can.
+
+`answer_instructions` asks for six sections: menu, pricing, reviews, updates,
+dietary and others. Before calling the reflection model, the collected
+summaries are split into sentences and each section is scored by how many
+sentences carry its keywords. Sentences that only say nothing was found do
+not count. The reflection call is then skipped in three cases:
+- every section is covered, so the research is sufficient;
+- this is the last allowed loop, so nothing the model says changes the route;
+- the topic is a simple restaurant lookup, so follow-up queries for just the
+  missing sections come from templates. A section whose templated query has
+  already run without covering it is not searched again, and once every
+  missing section has been, research stops.
+
+Otherwise the model is still called, but it is told which sections are
+missing.
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from agent.metrics import metrics
+from agent.query_planner import parse_lookup
+from agent.research_cache import SECTION_KEYWORDS
+from agent.tools_and_schemas import Reflection
+
+SECTIONS = ("menu", "pricing", "reviews", "updates", "dietary", "others")
+
+SECTION_SIGNALS = {
+    **SECTION_KEYWORDS,
+    "others": [
+        "opening hours", "open daily", "hours", "reservation", "booking", "parking", "located",
+        "address", "ambience", "ambiance", "atmosphere", "seating", "delivery", "takeaway", "contact",
+    ],
+}
+
+FOLLOW_UP_TEMPLATES = {
+    "menu": "{target} menu signature dishes",
+    "pricing": "{target} price range",
+    "reviews": "{target} customer reviews and ratings",
+    "updates": "{target} latest promotions and news",
+    "dietary": "{target} halal vegetarian and allergen options",
+    "others": "{target} opening hours reservations and location",
+}
+
+NOTHING_FOUND = re.compile(
+    r"\b(?:no (?:information|details|mention|data)|not (?:found|available|mentioned)|"
+    r"(?:unable|could not|couldn't) (?:to )?find)\b",
+    re.IGNORECASE,
+)
+MARKDOWN_LINK = re.compile(r"\[[^\]]*\]\([^)]*\)")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def analyze_coverage(summaries: List[str], min_sentences: int = 2) -> Dict[str, float]:
+    """Score each answer section from 0 to 1 by the sentences supporting it."""
+    evidence = dict.fromkeys(SECTIONS, 0)
+    for summary in summaries:
+        for sentence in SENTENCE_END.split(MARKDOWN_LINK.sub("", summary)):
+            if not sentence.strip() or NOTHING_FOUND.search(sentence):
+                continue
+            text = f" {sentence.lower()} "
+            for section, keywords in SECTION_SIGNALS.items():
+                if any(keyword in text for keyword in keywords):
+                    evidence[section] += 1
+    return {section: min(1.0, count / max(1, min_sentences)) for section, count in evidence.items()}
+
+
+def local_reflection(
+    summaries: List[str],
+    research_topic: str,
+    last_loop: bool,
+    max_follow_ups: int,
+    min_sentences: int = 2,
+    searched: Sequence[str] = (),
+) -> Tuple[Optional[Reflection], List[str]]:
+    """Reflection decided without a model call, or None, plus the missing sections.
+
+    `searched` holds the queries already run, so follow-ups never repeat them.
+    """
+    coverage = analyze_coverage(summaries, min_sentences)
+    missing = [section for section in SECTIONS if coverage[section] < 1.0]
+    gap = f"No coverage yet for: {', '.join(missing)}" if missing else ""
+
+    if not missing:
+        reason, result = "covered", Reflection(is_sufficient=True, knowledge_gap="", follow_up_queries=[])
+    elif last_loop:
+        # evaluate_research finalizes after this loop whatever the model says
+        reason, result = "last_loop", Reflection(is_sufficient=False, knowledge_gap=gap, follow_up_queries=[])
+    elif (lookup := parse_lookup(research_topic)) is not None:
+        target = " ".join(part for part in lookup if part)
+        follow_ups = [
+            query
+            for query in (FOLLOW_UP_TEMPLATES[section].format(target=target) for section in missing)
+            if query not in searched
+        ][:max(1, max_follow_ups)]
+        # Sections already searched without gaining coverage won't get any better
+        reason = "targeted" if follow_ups else "exhausted"
+        result = Reflection(is_sufficient=False, knowledge_gap=gap, follow_up_queries=follow_ups)
+    else:
+        metrics.increment("coverage.model_reflections")
+        return None, missing
+
+    metrics.increment("coverage.reflections_avoided")
+    metrics.increment(f"coverage.reflections_avoided.{reason}")
+    return result, missing
+
+
+def coverage_report() -> dict:
+    """Summarize how often the local check replaced the reflection model."""
+    avoided = metrics.counter("coverage.reflections_avoided")
+    total = avoided + metrics.counter("coverage.model_reflections")
+    return {
+        "reflections_avoided": avoided,
+        "avoided_covered": metrics.counter("coverage.reflections_avoided.covered"),
+        "avoided_last_loop": metrics.counter("coverage.reflections_avoided.last_loop"),
+        "avoided_targeted": metrics.counter("coverage.reflections_avoided.targeted"),
+        "avoided_exhausted": metrics.counter("coverage.reflections_avoided.exhausted"),
+        "model_reflections": metrics.counter("coverage.model_reflections"),
+        "avoided_rate": avoided / total if total else 0.0,
+    }
+
+
+metrics.register_report("coverage", coverage_report)
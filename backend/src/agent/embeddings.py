@@ -0,0 +1,220 @@
+"""Batched, cached embedding pipeline.
+
+The `embed` edge function embeds one text per HTTP call. This pipeline takes
+many texts at once, deduplicates them by content hash, serves repeats from a
+persistent cache, and sends only the remaining unique texts to the provider in
+bulk requests, streaming vectors back as each batch completes.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider(Protocol):
+    """Anything that can embed a batch of texts in one upstream call."""
+
+    model: str
+    dim: int
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed `texts` in one upstream call, in order."""
+        ...
+
+
+class OpenAIEmbeddingProvider:
+    """Embeds texts through the OpenAI embeddings API, many inputs per request."""
+
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        dim: int = 1536,
+        api_key: Optional[str] = None,
+        base_url: str = "https://api.openai.com/v1",
+        timeout: float = 60.0,
+    ):
+        """Create a provider with its own HTTP client; the key defaults to `OPENAI_API_KEY`."""
+        self.model = model
+        self.dim = dim
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"},
+        )
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed `texts` with one `/embeddings` request."""
+        response = self._client.post(
+            "/embeddings", json={"model": self.model, "input": list(texts)}
+        )
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+
+class FakeEmbeddingProvider:
+    """Deterministic local provider for tests and offline runs.
+
+    The same text always maps to the same unit vector, and every call is
+    recorded in `calls` so tests can assert on batching behaviour.
+    """
+
+    def __init__(self, dim: int = 1536, model: str = "fake-embedding"):
+        """Create a provider of `dim`-dimensional vectors."""
+        self.model = model
+        self.dim = dim
+        self.calls: List[List[str]] = []
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed `texts` as seeded random unit vectors."""
+        self.calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+            vector = np.random.default_rng(seed).standard_normal(self.dim)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+
+class InMemoryEmbeddingCache:
+    """Process-local cache, mainly for tests and single-process tools."""
+
+    def __init__(self):
+        """Create an empty cache."""
+        self._store: Dict[str, List[float]] = {}
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return the cached vectors of `keys`, with None for misses."""
+        return [self._store.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        """Cache the vectors of `items`."""
+        self._store.update(items)
+
+
+class RedisEmbeddingCache:
+    """Persistent cache storing vectors as packed float32 bytes in Redis."""
+
+    def __init__(self, client, prefix: str = "embedding", ttl: Optional[int] = None):
+        """Create a cache on `client`; vectors never expire without `ttl`."""
+        self._client = client
+        self._prefix = prefix
+        self._ttl = ttl
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return the cached vectors of `keys` in one MGET, with None for misses or errors."""
+        if not keys:
+            return []
+        try:
+            raw = self._client.mget([f"{self._prefix}:{key}" for key in keys])
+        except Exception as e:
+            logger.warning("Error reading embedding cache: %s", e)
+            return [None] * len(keys)
+        return [
+            np.frombuffer(value, dtype=np.float32).tolist() if value else None
+            for value in raw
+        ]
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        """Cache the vectors of `items` in one pipelined round trip."""
+        if not items:
+            return
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, vector in items.items():
+                pipe.set(
+                    f"{self._prefix}:{key}",
+                    np.asarray(vector, dtype=np.float32).tobytes(),
+                    ex=self._ttl,
+                )
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Error writing embedding cache: %s", e)
+
+
+def content_hash(model: str, text: str) -> str:
+    """Cache key for a text, scoped to the model that embedded it."""
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+class EmbeddingService:
+    """Deduplicating, caching, micro-batching front end for a provider.
+
+    Args:
+        provider: The upstream embedding provider.
+        cache: Any object with `get_many`/`set_many`; defaults to in-memory.
+        batch_size: Maximum number of texts sent in one provider call.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, cache=None, batch_size: int = 256):
+        """Create a service on `provider`, with an in-memory cache by default."""
+        self.provider = provider
+        self.cache = cache if cache is not None else InMemoryEmbeddingCache()
+        self.batch_size = batch_size
+        self.stats = {"texts": 0, "cache_hits": 0, "embedded": 0, "provider_calls": 0}
+
+    def embed_stream(self, texts: Iterable[str]) -> Iterator[Tuple[int, List[float]]]:
+        """Yield `(position, vector)` pairs, cached ones first, then per batch."""
+        texts = list(texts)
+        self.stats["texts"] += len(texts)
+
+        positions: Dict[str, List[int]] = {}
+        unique_texts: Dict[str, str] = {}
+        for position, text in enumerate(texts):
+            key = content_hash(self.provider.model, text)
+            positions.setdefault(key, []).append(position)
+            unique_texts.setdefault(key, text)
+
+        keys = list(unique_texts)
+        missing = []
+        for key, vector in zip(keys, self.cache.get_many(keys)):
+            if vector is None:
+                missing.append(key)
+                continue
+            self.stats["cache_hits"] += len(positions[key])
+            for position in positions[key]:
+                yield position, vector
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            vectors = self.provider.embed_batch([unique_texts[key] for key in batch])
+            self.stats["provider_calls"] += 1
+            self.stats["embedded"] += len(batch)
+            self.cache.set_many(dict(zip(batch, vectors)))
+            for key, vector in zip(batch, vectors):
+                for position in positions[key]:
+                    yield position, vector
+
+    def embed(self, texts: Iterable[str]) -> List[List[float]]:
+        """Embed texts and return the vectors in input order."""
+        texts = list(texts)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for position, vector in self.embed_stream(texts):
+            vectors[position] = vector
+        return vectors
+
+
+def get_embedding_service(redis_client=None) -> EmbeddingService:
+    """Build the service from the environment.
+
+    `EMBEDDING_PROVIDER=fake` selects the deterministic local provider so the
+    backend can run without an OpenAI key.
+    """
+    if os.getenv("EMBEDDING_PROVIDER", "openai") == "fake":
+        provider = FakeEmbeddingProvider()
+    else:
+        provider = OpenAIEmbeddingProvider(
+            model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        )
+    cache = RedisEmbeddingCache(redis_client) if redis_client is not None else None
+    return EmbeddingService(
+        provider,
+        cache=cache,
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "256")),
+    )
@@ -1,22 +1,55 @@
+import functools
+import logging
 import os
 
-import redis
 from dotenv import load_dotenv
 from google.genai import Client
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import END, START, StateGraph
 from langgraph.types import Send
 
+from agent.auth import authenticated_user
+from agent.budget import (
+    UsageTracker,
+    add_usage,
+    exhausted_budget,
+    record_usage,
+    search_usage,
+)
+from agent.citations import compact_citations, expand_citations
 from agent.configuration import Configuration
+from agent.conversation import get_conversation_context
+from agent.coverage import local_reflection
+from agent.hedging import hedged_call
+from agent.load_control import depth_controller
+from agent.memory_profiler import profiled
+from agent.metrics import metrics
+from agent.profiles import PROFILES, GraphProfile, apply_profile, get_profile
+from agent.progress import emit, source_list
 from agent.prompts import (
     answer_instructions,
+    compact_citation_instructions,
+    coverage_gap_instructions,
     get_current_date,
     query_writer_instructions,
+    quick_summary_instructions,
     reflection_instructions,
     web_searcher_instructions,
 )
+from agent.query_planner import plan_queries
+from agent.reflection_cascade import cascade_reflection
+from agent.request_profiler import request_profiled
+from agent.research_cache import (
+    classify_query,
+    get_research_cache,
+    merge_results,
+    rebase_result,
+    restaurant_key,
+)
+from agent.resilience import CircuitOpenError, UpstreamTimeoutError, guarded_call
+from agent.sources import empty_sources, resolve_citations, sources_from_segments
 from agent.state import (
     OverallState,
     QueryGenerationState,
@@ -24,18 +57,24 @@ from agent.state import (
     WebSearchState,
 )
 from agent.tools_and_schemas import Reflection, SearchQueryList
+from agent.tracing import setup_tracing, span, traced
 from agent.utils import (
     get_citations,
     get_research_topic,
     insert_citation_markers,
     resolve_urls,
 )
+from agent.writeback import queue_answer
 
 load_dotenv()
 
 if os.getenv("GEMINI_API_KEY") is None:
     raise ValueError("GEMINI_API_KEY is not set")
 
+setup_tracing()
+
+logger = logging.getLogger(__name__)
+
 # Used for Google Search API
 genai_client = Client(api_key=os.getenv("GEMINI_API_KEY"))
 
@@ -45,7 +84,12 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
     """LangGraph node that generates a search queries based on the User's question.
 
     Uses Gemini 2.0 Flash to create an optimized search query for web research based on
-    the User's question.
+    the User's question. Simple restaurant lookups skip the model and are planned
+    from templates instead. Long conversations are condensed to the recent messages
+    plus a rolling summary, which later nodes reuse from `research_context`. The
+    query count and loop limit are reduced while the service is overloaded and
+    capped by the run's graph profile, and the depth used is recorded in
+    `research_depth`.
 
     Args:
         state: Current graph state containing the User's question
@@ -56,86 +100,277 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
     """
     configurable = Configuration.from_runnable_config(config)
 
-    # check for custom initial search query count
-    if state.get("initial_search_query_count") is None:
-        state["initial_search_query_count"] = configurable.number_of_initial_queries
+    # check for custom initial search query count and loop limit, then adapt them to load
+    depth = depth_controller.choose(*requested_depth(state, configurable), configurable)
+    apply_profile(depth, get_profile(configurable))
+    depth["run_id"] = depth_controller.run_started(run_id(config))
+    # Later nodes release a failed run through `releases_run`
+    try:
+        state["initial_search_query_count"] = depth["initial_queries"]
+        run_depth = {
+            "initial_search_query_count": depth["initial_queries"],
+            "max_research_loops": depth["max_research_loops"],
+            "research_depth": depth,
+        }
 
-    # init Gemini 2.0 Flash
-    llm = ChatGoogleGenerativeAI(
-        model=configurable.query_generator_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+        tracker = UsageTracker(configurable.query_generator_model)
+        research_topic = conversation_context(state["messages"], configurable, tracker)
+        query_list = None
+        if configurable.enable_query_fast_path:
+            query_list = plan_queries(research_topic, state["initial_search_query_count"])
+        if query_list is not None:
+            return planned_research(state, query_list, research_topic, run_depth, tracker, authenticated_user(config))
+
+        # init Gemini 2.0 Flash
+        llm = ChatGoogleGenerativeAI(
+            model=configurable.query_generator_model,
+            temperature=1.0,
+            max_retries=2,
+            api_key=os.getenv("GEMINI_API_KEY"),
+        )
+        structured_llm = llm.with_structured_output(SearchQueryList)
+
+        # Format the prompt
+        current_date = get_current_date()
+        formatted_prompt = query_writer_instructions.format(
+            current_date=current_date,
+            research_topic=research_topic,
+            number_queries=state["initial_search_query_count"],
+        )
+        # Generate the search queries
+        try:
+            with metrics.timer("query_planner.llm_seconds"):
+                result = guarded(
+                    lambda: structured_llm.invoke(formatted_prompt, config={"callbacks": [tracker]}),
+                    configurable.query_generator_model,
+                    configurable,
+                    purpose="query_generation",
+                )
+            query_list = result.query
+        except (CircuitOpenError, UpstreamTimeoutError) as e:
+            # Search the question as asked so web_research can still serve cached sections
+            logger.warning("Query generation unavailable, searching the question instead: %s", e)
+            query_list = [get_research_topic(state["messages"][-1:])]
+        return planned_research(state, query_list, research_topic, run_depth, tracker, authenticated_user(config))
+    except BaseException:
+        depth_controller.run_finished(depth["run_id"])
+        raise
+
+
+def planned_research(
+    state: OverallState,
+    query_list: list[str],
+    research_topic: str,
+    run_depth: dict,
+    tracker: UsageTracker,
+    tenant: str | None,
+) -> dict:
+    """State update of `generate_query`, announced to progress listeners.
+
+    Its usage is tagged with the run id, which starts the run's usage totals over.
+    """
+    plan = plan_cached_research(state, query_list)
+    usage = {**record_usage(tracker.usage, tenant), "run": run_depth["research_depth"]["run_id"]}
+    emit(
+        "queries_generated",
+        queries=plan["query_list"],
+        cached_queries=plan.get("search_query", []),
+        initial_queries=run_depth["initial_search_query_count"],
+        max_research_loops=run_depth["max_research_loops"],
     )
-    structured_llm = llm.with_structured_output(SearchQueryList)
+    return {**plan, "research_context": research_topic, **run_depth, "usage": usage, "budget_exhausted": ""}
 
-    # Format the prompt
-    current_date = get_current_date()
-    formatted_prompt = query_writer_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        number_queries=state["initial_search_query_count"],
+
+def requested_depth(state: OverallState, configurable: Configuration) -> tuple[int, int]:
+    """Query count and loop limit asked for by the input or the configuration.
+
+    Values a previous turn wrote back after reducing them are ignored, so a
+    thread recovers its full depth once the load drops.
+    """
+    previous = state.get("research_depth") or {}
+    queries = state.get("initial_search_query_count")
+    if queries is None or queries == previous.get("initial_queries"):
+        queries = previous.get("requested_queries") or configurable.number_of_initial_queries
+    loops = state.get("max_research_loops")
+    if loops is None or loops == previous.get("max_research_loops"):
+        loops = previous.get("requested_loops") or configurable.max_research_loops
+    return queries, loops
+
+
+def run_id(config: RunnableConfig) -> str | None:
+    """Return the LangGraph run id, when the graph runs under the API server."""
+    config = config or {}
+    return (config.get("metadata") or {}).get("run_id") or config.get("run_id")
+
+
+def releases_run(node):
+    """Wrap a node so a run that fails in it stops counting as in flight.
+
+    Runs are otherwise only released by `finalize_answer`, and a failed run
+    would keep raising the load until `max_run_seconds` passed.
+    """
+
+    @functools.wraps(node)
+    def wrapper(state, config):
+        try:
+            return node(state, config)
+        except BaseException:
+            depth_controller.run_finished((state.get("research_depth") or {}).get("run_id") or run_id(config))
+            raise
+
+    return wrapper
+
+
+def conversation_context(messages: list, configurable: Configuration, tracker: UsageTracker | None = None) -> str:
+    """Recent messages plus a rolling summary of older turns for the prompts."""
+    callbacks = [tracker] if tracker is not None else []
+
+    def summarize(prompt: str) -> str:
+        llm = ChatGoogleGenerativeAI(
+            model=configurable.conversation_summary_model,
+            temperature=0,
+            max_retries=2,
+            api_key=os.getenv("GEMINI_API_KEY"),
+        )
+        return guarded(
+            lambda: llm.invoke(prompt, config={"callbacks": callbacks}).content,
+            configurable.conversation_summary_model,
+            configurable,
+        )
+
+    return get_conversation_context(
+        messages, summarize, window=configurable.conversation_window_messages
     )
-    # Generate the search queries
-    result = structured_llm.invoke(formatted_prompt)
-    return {"query_list": result.query}
 
 
-def continue_to_web_research(state: QueryGenerationState):
+def plan_cached_research(state: OverallState, query_list: list[str]) -> dict:
+    """Reuse fresh cached sections and keep only the queries for stale ones.
+
+    Cached results are added to the state straight away (rebased onto fresh
+    search ids), while queries whose section is still fresh are dropped. The
+    restaurant comes from the latest question, so earlier turns of the
+    conversation don't change the key. Questions that aren't a lookup of a
+    single restaurant are neither served from nor written to the cache.
+    """
+    question = next(
+        (message.content for message in reversed(state["messages"]) if isinstance(message, HumanMessage)),
+        "",
+    )
+    restaurant = restaurant_key(question) if isinstance(question, str) else None
+    if restaurant is None:
+        return {"query_list": query_list, "restaurant_key": ""}
+    cached_sections = get_research_cache().get_sections(restaurant)
+
+    cached_results = [
+        rebase_result(result, idx)
+        for idx, result in enumerate(
+            result for results in cached_sections.values() for result in results
+        )
+    ]
+    stale_queries = [
+        query for query in query_list if classify_query(query) not in cached_sections
+    ]
+    metrics.increment(
+        "research_cache.lookup_misses" if stale_queries else "research_cache.lookup_hits"
+    )
+    return {
+        "query_list": stale_queries,
+        "restaurant_key": restaurant,
+        **merge_results(*cached_results),
+    }
+
+
+def continue_to_web_research(state: QueryGenerationState, config: RunnableConfig = None):
     """
     LangGraph node that sends the search queries to the web research node.
     """
+    if not state["query_list"]:
+        # Every section was served from the research cache
+        return continue_to_reflection(state, config)
+    # Offset the ids past any cached results so short urls stay unique
+    first_id = len(state.get("search_query") or [])
     return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
+        Send(
+            "web_research",
+            {
+                "search_query": search_query,
+                "id": first_id + int(idx),
+                "restaurant_key": state.get("restaurant_key"),
+                "trace_parent": state.get("trace_dispatch"),
+            },
+        )
         for idx, search_query in enumerate(state["query_list"])
     ]
 
 
+def continue_to_reflection(state: OverallState, config: RunnableConfig = None) -> str:
+    """LangGraph routing function that skips reflection for profiles without it."""
+    if get_profile(Configuration.from_runnable_config(config)).reflection:
+        return "reflection"
+    return "finalize_answer"
+
+
 def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """LangGraph node that performs web research using the native Google Search API tool.
 
     Executes a web search using the native Google Search API tool in combination with Gemini 2.0 Flash.
+    With `enable_hedging`, a search that outlives the observed latency quantile is duplicated.
+    Searches go through the model's circuit breaker; when it is open or the search fails,
+    the last known cached result for the query's section is served instead.
 
     Args:
         state: Current graph state containing the search query and research loop count
         config: Configuration for the runnable, including search API settings
 
     Returns:
-        Dictionary with state update, including sources_gathered, research_loop_count, and web_research_results
+        Dictionary with state update, including sources, research_loop_count, and web_research_results
     """
 
     configurable = Configuration.from_runnable_config(config)
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    r = redis.Redis.from_url(redis_url)
-    cache_key = f"websearch:{state['search_query']}"
-    cached = r.get(cache_key)
-    if cached:
-        import json
-        return json.loads(cached)
+    tenant = authenticated_user(config)
 
     formatted_prompt = web_searcher_instructions.format(
         current_date=get_current_date(),
         research_topic=state["search_query"],
     )
 
+    usage = None
     try:
         # Uses the google genai client as the langchain client doesn't return grounding metadata
-        response = genai_client.models.generate_content(
-            model=configurable.query_generator_model,
-            contents=formatted_prompt,
-            config={
-                "tools": [{"google_search": {}}],
-                "temperature": 0,
-            },
-        )
-        
+        def search():
+            return genai_client.models.generate_content(
+                model=configurable.query_generator_model,
+                contents=formatted_prompt,
+                config={
+                    "tools": [{"google_search": {}}],
+                    "temperature": 0,
+                },
+            )
+
+        if configurable.enable_hedging:
+            def call():
+                return hedged_call(
+                    search,
+                    configurable.query_generator_model,
+                    quantile=configurable.hedge_quantile,
+                    budget_ratio=configurable.hedge_budget_ratio,
+                    # The losing search is billed too, so charge it to the tenant when it ends
+                    on_discarded=lambda discarded: record_usage(
+                        search_usage(configurable.query_generator_model, discarded), tenant
+                    ),
+                )
+        else:
+            call = search
+        response = guarded(call, configurable.query_generator_model, configurable)
+        usage = record_usage(search_usage(configurable.query_generator_model, response), tenant)
+
         if not response or not response.candidates or len(response.candidates) == 0:
             raise ValueError("Invalid response from Gemini API")
             
         candidate = response.candidates[0]
         if not hasattr(candidate, 'grounding_metadata') or not candidate.grounding_metadata:
             modified_text = response.text
-            sources_gathered = []
+            sources = empty_sources()
         else:
             # resolve the urls to short urls for saving tokens and time
             resolved_urls = resolve_urls(
@@ -144,33 +379,72 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
             # citations
             citations = get_citations(response, resolved_urls)
             modified_text = insert_citation_markers(response.text, citations)
-            sources_gathered = [item for citation in citations for item in citation["segments"]]
+            sources = sources_from_segments(
+                segment for citation in citations for segment in citation["segments"]
+            )
 
         result = {
-            "sources_gathered": sources_gathered,
+            "sources": sources,
             "search_query": [state["search_query"]],
             "web_research_result": [modified_text],
         }
-        # Cache for 1 hour
-        r.setex(cache_key, 3600, __import__('json').dumps(result))
-        return result
-        
+        if state.get("restaurant_key"):
+            get_research_cache().add_result(
+                state["restaurant_key"], classify_query(state["search_query"]), result
+            )
+        stale = False
+
     except Exception as e:
-        print(f"Error in web_research: {e}")
-        # Return a fallback result
+        logger.warning("Error in web_research: %s", e)
+        result, stale = stale_research(state), True
+
+    emit(
+        "branch_completed",
+        id=state["id"],
+        query=state["search_query"],
+        sources=source_list(result["sources"]),
+        stale=stale,
+    )
+    return {**result, "usage": usage} if usage else result
+
+
+def stale_research(state: WebSearchState) -> dict:
+    """Fallback for a failed search: the last known result for its section.
+
+    Prefers the cached entry for the exact query, otherwise the most recent one
+    in the same section. Without any cached result the branch contributes no
+    summary rather than an error message the answer model would repeat.
+    """
+    entries = []
+    if state.get("restaurant_key"):
+        entries = get_research_cache().get_stale(
+            state["restaurant_key"], classify_query(state["search_query"])
+        )
+    if not entries:
         return {
-            "sources_gathered": [],
+            "sources": empty_sources(),
             "search_query": [state["search_query"]],
-            "web_research_result": [f"Error occurred during web research: {str(e)}"],
+            "web_research_result": [],
         }
 
+    entry = next(
+        (entry for entry in entries if entry["search_query"] == [state["search_query"]]),
+        entries[-1],
+    )
+    metrics.increment("resilience.stale_served")
+    return {**rebase_result(entry, state["id"]), "search_query": [state["search_query"]]}
+
 
 def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
     """LangGraph node that identifies knowledge gaps and generates potential follow-up queries.
 
     Analyzes the current summary to identify areas for further research and generates
     potential follow-up queries. Uses structured output to extract
-    the follow-up query in JSON format.
+    the follow-up query in JSON format. With `coverage_check` enabled, a local keyword
+    check over the answer sections decides first when it can (see `agent.coverage`).
+    With `reflection_cascade` enabled, a cheaper model answers first and the reflection
+    model is only called when it is unsure. Once the run or its tenant has used up a
+    token or cost budget, no model is called and `budget_exhausted` ends the research.
 
     Args:
         state: Current graph state containing the running summary and research topic
@@ -180,34 +454,63 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
         Dictionary with state update, including search_query key containing the generated follow-up query
     """
     configurable = Configuration.from_runnable_config(config)
+    tenant = authenticated_user(config)
     # Increment the research loop count and get the reasoning model
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
     reflection_model = state.get("reflection_model") or configurable.reflection_model
 
+    summaries = state["web_research_result"]
+    if configurable.compact_citations:
+        summaries, _ = compact_citations(summaries)
+
+    tracker = UsageTracker(reflection_model)
+    research_topic = state.get("research_context") or conversation_context(state["messages"], configurable, tracker)
+    local_result, missing = None, []
+    exhausted = exhausted_budget(state.get("usage"), tenant)
+    if exhausted:
+        local_result = Reflection(
+            is_sufficient=False, knowledge_gap=f"Research stopped: {exhausted} budget reached", follow_up_queries=[]
+        )
+    elif configurable.coverage_check:
+        max_research_loops = (
+            state.get("max_research_loops")
+            if state.get("max_research_loops") is not None
+            else configurable.max_research_loops
+        )
+        local_result, missing = local_reflection(
+            state["web_research_result"],
+            research_topic,
+            last_loop=state["research_loop_count"] >= max_research_loops,
+            max_follow_ups=state.get("initial_search_query_count") or configurable.number_of_initial_queries,
+            min_sentences=configurable.coverage_min_sentences,
+            searched=state.get("search_query") or [],
+        )
+
     # Format the prompt
     current_date = get_current_date()
     formatted_prompt = reflection_instructions.format(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
-    )
-    # init Reasoning Model
-    llm = ChatGoogleGenerativeAI(
-        model=reflection_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+        research_topic=research_topic,
+        summaries="\n\n---\n\n".join(summaries),
     )
-    
+    if missing:
+        formatted_prompt += coverage_gap_instructions.format(sections=", ".join(missing))
     try:
-        result = llm.with_structured_output(Reflection).invoke(formatted_prompt)
-        
+        def invoke(model: str, prompt: str, schema: type):
+            return guarded(lambda: invoke_structured(model, prompt, schema, callbacks=[tracker]), model, configurable)
+
+        result = local_result
+        if result is None and configurable.reflection_cascade:
+            result = cascade_reflection(formatted_prompt, configurable, invoke)
+        if result is None:
+            result = invoke(reflection_model, formatted_prompt, Reflection)
+
         # Ensure follow_up_queries is always a list
         follow_up_queries = result.follow_up_queries if hasattr(result, 'follow_up_queries') else []
         if not isinstance(follow_up_queries, list):
             follow_up_queries = []
         
-        return {
+        decision = {
             "is_sufficient": result.is_sufficient if hasattr(result, 'is_sufficient') else True,
             "knowledge_gap": result.knowledge_gap if hasattr(result, 'knowledge_gap') else "No additional information needed",
             "follow_up_queries": follow_up_queries,
@@ -215,14 +518,49 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
             "number_of_ran_queries": len(state["search_query"]),
         }
     except Exception as e:
-        print("reflection Error occurred")
-        return {
+        logger.warning("Error in reflection: %s", e)
+        decision = {
             "is_sufficient": True,
             "knowledge_gap": "Error occurred during reflection",
             "follow_up_queries": [],
             "research_loop_count": state["research_loop_count"],
             "number_of_ran_queries": len(state["search_query"]),
         }
+    decision["usage"] = record_usage(tracker.usage, tenant)
+    if not exhausted:
+        exhausted = exhausted_budget(add_usage(state.get("usage"), decision["usage"]), tenant)
+    decision["budget_exhausted"] = exhausted or ""
+    emit(
+        "reflection",
+        research_loop_count=decision["research_loop_count"],
+        is_sufficient=decision["is_sufficient"],
+        knowledge_gap=decision["knowledge_gap"],
+        follow_up_queries=decision["follow_up_queries"],
+    )
+    return decision
+
+
+def guarded(fn, model: str, configurable: Configuration, purpose: str | None = None):
+    """Call `fn` through `model`'s circuit breaker with the configured timeout."""
+    with span("upstream_call", model=model, purpose=purpose):
+        return guarded_call(
+            fn,
+            model,
+            timeout=configurable.upstream_timeout_seconds,
+            failure_threshold=configurable.circuit_failure_threshold,
+            reset_timeout=configurable.circuit_reset_seconds,
+        )
+
+
+def invoke_structured(model: str, prompt: str, schema: type, callbacks: list | None = None):
+    """Invoke a reasoning model with structured output for the given schema."""
+    llm = ChatGoogleGenerativeAI(
+        model=model,
+        temperature=1.0,
+        max_retries=2,
+        api_key=os.getenv("GEMINI_API_KEY"),
+    )
+    return llm.with_structured_output(schema).invoke(prompt, config={"callbacks": callbacks or []})
 
 
 def evaluate_research(
@@ -233,6 +571,7 @@ def evaluate_research(
 
     Controls the research loop by deciding whether to continue gathering information
     or to finalize the summary based on the configured maximum number of research loops.
+    Runs that have used up a token or cost budget always finalize.
 
     Args:
         state: Current graph state containing the research loop count
@@ -247,21 +586,33 @@ def evaluate_research(
         if state.get("max_research_loops") is not None
         else configurable.max_research_loops
     )
+    decision = {
+        "research_loop_count": state["research_loop_count"],
+        "max_research_loops": max_research_loops,
+    }
+    if state.get("budget_exhausted"):
+        emit("research_decision", action="finalize", budget_exhausted=state["budget_exhausted"], **decision)
+        return ["finalize_answer"]
     if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
+        emit("research_decision", action="finalize", **decision)
         return ["finalize_answer"]
     else:
         # Ensure follow_up_queries is a list and not None
         follow_up_queries = state.get("follow_up_queries", [])
         if not isinstance(follow_up_queries, list) or not follow_up_queries:
             # If no follow-up queries or invalid data, finalize the answer
+            emit("research_decision", action="finalize", **decision)
             return ["finalize_answer"]
-        
+
+        emit("research_decision", action="continue", **decision)
         return [
             Send(
                 "web_research",
                 {
                     "search_query": follow_up_query,
                     "id": state["number_of_ran_queries"] + int(idx),
+                    "restaurant_key": state.get("restaurant_key"),
+                    "trace_parent": state.get("trace_dispatch"),
                 },
             )
             for idx, follow_up_query in enumerate(follow_up_queries)
@@ -273,7 +624,10 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
 
     Prepares the final output by deduplicating and formatting sources, then
     combining them with the running summary to create a well-structured
-    research report with proper citations.
+    research report with proper citations. Profiles with `quick_answer` write a
+    short preview instead of the full report. The answer's usage is added to the
+    run's `usage` totals, which are returned with it. The answer of an
+    authenticated run about a single restaurant is queued for write-back.
 
     Args:
         state: Current graph state containing the running summary and sources gathered
@@ -283,14 +637,25 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     """
     configurable = Configuration.from_runnable_config(config)
     answer_model = state.get("answer_model") or configurable.answer_model
+    tracker = UsageTracker(answer_model)
+    depth_controller.run_finished((state.get("research_depth") or {}).get("run_id"))
+    emit("answer_started", sources=len((state.get("sources") or {}).get("urls", [])))
+
+    summaries, citation_table = state["web_research_result"], {}
+    if configurable.compact_citations:
+        summaries, citation_table = compact_citations(summaries)
 
     # Format the prompt
     current_date = get_current_date()
-    formatted_prompt = answer_instructions.format(
+    instructions = quick_summary_instructions if get_profile(configurable).quick_answer else answer_instructions
+    formatted_prompt = instructions.format(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n---\n\n".join(state["web_research_result"]),
+        research_topic=state.get("research_context")
+        or conversation_context(state["messages"], configurable, tracker),
+        summaries="\n---\n\n".join(summaries),
     )
+    if citation_table:
+        formatted_prompt += compact_citation_instructions
 
     llm = ChatGoogleGenerativeAI(
         model=answer_model,
@@ -298,46 +663,95 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
         max_retries=5,
         api_key=os.getenv("GEMINI_API_KEY"),
     )
-    result = llm.invoke(formatted_prompt)
-
-    # Replace the short urls with the original urls and add all used urls to the sources_gathered
-    unique_sources = []
-    for source in state["sources_gathered"]:
-        if source["short_url"] in result.content:
-            result.content = result.content.replace(
-                source["short_url"], source["value"]
-            )
-            unique_sources.append(source)
+    # Raises straight away while the answer model's breaker is open
+    result = guarded(
+        lambda: llm.invoke(formatted_prompt, config={"callbacks": [tracker]}),
+        answer_model,
+        configurable,
+        purpose="answer",
+    )
+    if citation_table:
+        result.content = expand_citations(result.content, citation_table)
+
+    # Replace the short urls with the original urls and list the cited sources in sources_gathered
+    result.content, cited_sources = resolve_citations(result.content, state.get("sources"))
+    if configurable.writeback_answers:
+        queue_answer(authenticated_user(config), get_research_topic(state["messages"]), result.content)
 
     return {
         "messages": [AIMessage(content=result.content)],
-        "sources_gathered": unique_sources,
+        "sources_gathered": cited_sources,
+        "usage": record_usage(tracker.usage, authenticated_user(config)),
     }
 
 
-# Create our Agent Graph
-builder = StateGraph(OverallState, config_schema=Configuration)
+def build_graph(profile: GraphProfile):
+    """Compile the agent graph with the topology of `profile`.
 
-# Define the nodes we will cycle between
-builder.add_node("generate_query", generate_query)
-builder.add_node("web_research", web_research)
-builder.add_node("reflection", reflection)
-builder.add_node("finalize_answer", finalize_answer)
+    Profiles without reflection get a graph without the reflection node, where
+    every search goes straight to the answer.
+    """
+    # Create our Agent Graph
+    builder = StateGraph(OverallState, config_schema=Configuration)
+
+    # Define the nodes we will cycle between
+    builder.add_node(
+        "generate_query",
+        traced(
+            "generate_query",
+            request_profiled("generate_query", profiled("generate_query", generate_query), starts=True),
+            dispatches=True,
+        ),
+    )
+    builder.add_node(
+        "web_research",
+        traced("web_research", request_profiled("web_research", profiled("web_research", releases_run(web_research)))),
+    )
+    if profile.reflection:
+        builder.add_node(
+            "reflection",
+            traced(
+                "reflection",
+                request_profiled("reflection", profiled("reflection", releases_run(reflection))),
+                dispatches=True,
+            ),
+        )
+    builder.add_node(
+        "finalize_answer",
+        traced(
+            "finalize_answer",
+            request_profiled("finalize_answer", profiled("finalize_answer", finalize_answer), finishes=True),
+        ),
+    )
+
+    # Set the entrypoint as `generate_query`
+    # This means that this node is the first one called
+    builder.add_edge(START, "generate_query")
+    if profile.reflection:
+        # Add conditional edge to continue with search queries in a parallel branch
+        builder.add_conditional_edges(
+            "generate_query", continue_to_web_research, ["web_research", "reflection", "finalize_answer"]
+        )
+        # Reflect on the web research, unless the run's profile skips it
+        builder.add_conditional_edges(
+            "web_research", continue_to_reflection, ["reflection", "finalize_answer"]
+        )
+        # Evaluate the research
+        builder.add_conditional_edges(
+            "reflection", evaluate_research, ["web_research", "finalize_answer"]
+        )
+    else:
+        # Without a reflection node every route that would reflect answers instead
+        to_answer = {"web_research": "web_research", "reflection": "finalize_answer", "finalize_answer": "finalize_answer"}
+        builder.add_conditional_edges("generate_query", continue_to_web_research, to_answer)
+        builder.add_edge("web_research", "finalize_answer")
+    # Finalize the answer
+    builder.add_edge("finalize_answer", END)
+
+    suffix = "" if profile.name == "full" else f"-{profile.name}"
+    return builder.compile(name=f"pro-search-agent{suffix}")
 
-# Set the entrypoint as `generate_query`
-# This means that this node is the first one called
-builder.add_edge(START, "generate_query")
-# Add conditional edge to continue with search queries in a parallel branch
-builder.add_conditional_edges(
-    "generate_query", continue_to_web_research, ["web_research"]
-)
-# Reflect on the web research
-builder.add_edge("web_research", "reflection")
-# Evaluate the research
-builder.add_conditional_edges(
-    "reflection", evaluate_research, ["web_research", "finalize_answer"]
-)
-# Finalize the answer
-builder.add_edge("finalize_answer", END)
 
-graph = builder.compile(name="pro-search-agent")
+graph = build_graph(PROFILES["full"])
+# Registered as `agent-lite` in langgraph.json
+lite_graph = build_graph(PROFILES["lite"]).with_config(configurable={"graph_profile": "lite"})
@@ -0,0 +1,163 @@
+"""Hedged upstream calls to cut `web_research` tail latency.
+
+`reflection` waits for every parallel search branch, so one slow grounded
+search holds up the whole fan-out. A hedged call starts the request, waits
+for the observed p95 latency of that model, and if it still has not returned
+issues a duplicate and takes whichever finishes first. A token budget keeps
+hedges to a small share of traffic.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+import numpy as np
+
+from agent.metrics import metrics
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Sliding window of call latencies per key (usually the model name)."""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        """Add one call's latency to the window for `key`."""
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, key: str, q: float, min_samples: Optional[int] = None) -> Optional[float]:
+        """Latency quantile for `key`, or None until enough samples exist."""
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if not samples or len(samples) < (self.min_samples if min_samples is None else min_samples):
+            return None
+        return float(np.quantile(samples, q))
+
+    def keys(self):
+        """List the keys with recorded latencies."""
+        with self._lock:
+            return list(self._samples)
+
+
+class HedgeBudget:
+    """Token bucket allowing hedges for roughly `ratio` of requests."""
+
+    def __init__(self, burst: float = 5.0):
+        self.burst = burst
+        self._tokens = 1.0
+        self._lock = threading.Lock()
+
+    def on_request(self, ratio: float) -> None:
+        """Earn `ratio` of a hedge token for an incoming request."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + ratio)
+
+    def try_acquire(self) -> bool:
+        """Spend a hedge token if one is available."""
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedged-call")
+attempt_latency = LatencyTracker()
+# Latency of the first attempt alone approximates the unhedged distribution
+primary_latency = LatencyTracker(window=2000, min_samples=1)
+observed_latency = LatencyTracker(window=2000, min_samples=1)
+budget = HedgeBudget()
+
+
+def hedged_call(
+    fn: Callable[[], T],
+    key: str,
+    quantile: float = 0.95,
+    budget_ratio: float = 0.05,
+    on_discarded: Optional[Callable[[T], None]] = None,
+) -> T:
+    """Call `fn`, issuing one duplicate if it outlives the `quantile` latency.
+
+    Every attempt's own latency feeds the hedge delay for `key`. The primary
+    attempt is always recorded once it finishes, even after a hedge won, so
+    its distribution approximates the unhedged latency and can be compared
+    with the latency seen by the caller on `/metrics`.
+
+    The losing attempt still runs to completion upstream and is billed. Pass
+    `on_discarded` to be called with its result when it succeeds, usually
+    after this call has returned.
+    """
+    metrics.increment("hedging.requests")
+    budget.on_request(budget_ratio)
+    delay = attempt_latency.quantile(key, quantile)
+    started = time.perf_counter()
+
+    def attempt(is_primary: bool) -> T:
+        attempt_started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            elapsed = time.perf_counter() - attempt_started
+            attempt_latency.record(key, elapsed)
+            if is_primary:
+                primary_latency.record(key, elapsed)
+
+    primary = _executor.submit(attempt, True)
+    try:
+        done, _ = wait([primary], timeout=delay)
+        if done or not budget.try_acquire():
+            return primary.result()
+
+        metrics.increment("hedging.hedges")
+        hedge = _executor.submit(attempt, False)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), next(iter(done)))
+            # Fall through to the other attempt if the first one failed
+            if winner.exception() is None or not pending:
+                if winner is hedge and winner.exception() is None:
+                    metrics.increment("hedging.hedge_wins")
+                if on_discarded:
+                    for loser in (done | pending) - {winner}:
+                        loser.add_done_callback(partial(_discarded, on_discarded))
+                return winner.result()
+    finally:
+        observed_latency.record(key, time.perf_counter() - started)
+
+
+def _discarded(callback: Callable[[T], None], future: Future) -> None:
+    if future.exception() is None:
+        callback(future.result())
+
+
+def hedging_report() -> dict:
+    """Summarize hedges sent and won, with the tracked latency quantiles."""
+    requests = metrics.counter("hedging.requests")
+    hedges = metrics.counter("hedging.hedges")
+    report = {
+        "requests": requests,
+        "hedges": hedges,
+        "hedge_wins": metrics.counter("hedging.hedge_wins"),
+        "hedge_rate": hedges / requests if requests else 0.0,
+        "models": {},
+    }
+    for key in observed_latency.keys():
+        report["models"][key] = {
+            "p99_unhedged_seconds": primary_latency.quantile(key, 0.99),
+            "p99_observed_seconds": observed_latency.quantile(key, 0.99),
+        }
+    return report
+
+
+metrics.register_report("hedging", hedging_report)
@@ -0,0 +1,420 @@
+"""Redis Streams job queue for running research outside the API process.
+
+The API enqueues a research job (topic + `Configuration`) onto a stream and
+returns immediately. Workers in a consumer group claim jobs, run the graph,
+and acknowledge them; entries left pending by a crashed worker are reclaimed
+with XAUTOCLAIM once idle, and failed jobs are retried up to `max_attempts`.
+A worker keeps its running job's entry fresh with `heartbeat`, so jobs that
+run longer than the idle time are not handed to a second worker.
+Results are stored on the job hash and announced on a pub/sub channel, so
+callers can either poll or subscribe.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class JobQueue:
+    """Research job queue on top of a Redis Stream and consumer group.
+
+    Args:
+        client: A `redis.Redis` client or an `InMemoryStreamClient`.
+        stream: Stream the jobs are appended to.
+        group: Consumer group shared by all research workers.
+        max_attempts: Deliveries allowed before a job is marked failed.
+        claim_idle_ms: Idle time after which another worker reclaims a job.
+        result_ttl: Seconds job status and results are kept after completion.
+    """
+
+    def __init__(
+        self,
+        client,
+        stream: str = "research:jobs",
+        group: str = "research-workers",
+        max_attempts: int = 3,
+        claim_idle_ms: int = 5 * 60 * 1000,
+        result_ttl: int = 24 * 3600,
+    ):
+        """Create a queue on `stream`; the consumer group is created on first use."""
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.max_attempts = max_attempts
+        self.claim_idle_ms = claim_idle_ms
+        self.result_ttl = result_ttl
+        self._group_ready = False
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.stream}:job:{job_id}"
+
+    def channel(self, job_id: str) -> str:
+        """Pub/sub channel notified when a job finishes."""
+        return f"{self.stream}:done:{job_id}"
+
+    def ensure_group(self) -> None:
+        """Create the consumer group and the stream if they don't exist yet."""
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def enqueue(
+        self,
+        topic: str,
+        configurable: Optional[Dict[str, Any]] = None,
+        priority: str = "interactive",
+    ) -> str:
+        """Add a research job to the stream and return its id."""
+        self.ensure_group()
+        job_id = uuid.uuid4().hex
+        payload = json.dumps({"topic": topic, "configurable": configurable or {}, "priority": priority})
+        self.client.hset(
+            self._job_key(job_id),
+            mapping={"status": "queued", "payload": payload, "attempts": 0, "enqueued_at": time.time()},
+        )
+        self.client.xadd(self.stream, {"job_id": job_id})
+        return job_id
+
+    def claim(
+        self, consumer: str, count: int = 1, block_ms: Optional[int] = 5000
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Claim jobs for a worker: first stalled ones, then new ones.
+
+        `block_ms=None` returns straight away when no job is waiting.
+        Returns a list of `(entry_id, job_id, payload)`.
+        """
+        self.ensure_group()
+        _, entries, *_ = self.client.xautoclaim(
+            self.stream, self.group, consumer, min_idle_time=self.claim_idle_ms, start_id="0-0", count=count
+        )
+        if not entries:
+            response = self.client.xreadgroup(
+                self.group, consumer, {self.stream: ">"}, count=count, block=block_ms
+            )
+            entries = [entry for _, stream_entries in response or [] for entry in stream_entries]
+
+        jobs = []
+        for entry_id, fields in entries:
+            if not fields:
+                # Trimmed or deleted entry
+                self.client.xack(self.stream, self.group, entry_id)
+                continue
+            entry_id = _text(entry_id)
+            job_id = _text(fields.get(b"job_id", fields.get("job_id")))
+            key = self._job_key(job_id)
+            if _text(self.client.hget(key, "status")) == "cancelled":
+                self.client.xack(self.stream, self.group, entry_id)
+                continue
+            attempts = self.client.hincrby(key, "attempts", 1)
+            if attempts > self.max_attempts:
+                self._finish(entry_id, job_id, "failed", error="Exceeded maximum attempts")
+                continue
+            self.client.hset(key, mapping={"status": "running", "worker": consumer})
+            payload = json.loads(_text(self.client.hget(key, "payload")))
+            jobs.append((entry_id, job_id, payload))
+        return jobs
+
+    def touch(self, consumer: str, entry_id: str) -> None:
+        """Reset the idle time of a pending entry the consumer is still running."""
+        self.client.xclaim(self.stream, self.group, consumer, 0, [entry_id], justid=True)
+
+    @contextmanager
+    def heartbeat(self, consumer: str, entry_id: str) -> Iterator[None]:
+        """Touch the entry every third of `claim_idle_ms` while the block runs."""
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(self.claim_idle_ms / 3000):
+                try:
+                    self.touch(consumer, entry_id)
+                except Exception as e:
+                    logger.warning("Error refreshing research job %s: %s", entry_id, e)
+
+        thread = threading.Thread(target=beat, name="job-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, entry_id: str, job_id: str, result: Dict[str, Any]) -> None:
+        """Store a job's result and acknowledge its stream entry."""
+        self._finish(entry_id, job_id, "done", result=result)
+
+    def fail(self, entry_id: str, job_id: str, error: str) -> None:
+        """Re-queue a failed job, or mark it failed once out of attempts."""
+        attempts = int(_text(self.client.hget(self._job_key(job_id), "attempts")) or 0)
+        if attempts < self.max_attempts:
+            self.client.hset(self._job_key(job_id), mapping={"status": "queued", "error": error})
+            self.client.xadd(self.stream, {"job_id": job_id})
+            self.client.xack(self.stream, self.group, entry_id)
+        else:
+            self._finish(entry_id, job_id, "failed", error=error)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that no worker has claimed yet.
+
+        Returns whether the job was cancelled; running and finished jobs are
+        left alone. The stream entry is acknowledged when it is next claimed.
+        """
+        key = self._job_key(job_id)
+        if _text(self.client.hget(key, "status")) != "queued":
+            return False
+        self.client.hset(key, mapping={"status": "cancelled", "finished_at": time.time()})
+        self.client.expire(key, self.result_ttl)
+        self.client.publish(self.channel(job_id), "cancelled")
+        return True
+
+    def _finish(self, entry_id: str, job_id: str, status: str, result=None, error=None) -> None:
+        key = self._job_key(job_id)
+        mapping = {"status": status, "finished_at": time.time()}
+        if result is not None:
+            mapping["result"] = json.dumps(result)
+        if error is not None:
+            mapping["error"] = error
+        self.client.hset(key, mapping=mapping)
+        self.client.expire(key, self.result_ttl)
+        self.client.xack(self.stream, self.group, entry_id)
+        self.client.publish(self.channel(job_id), status)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job's status, attempts, and result or error if finished."""
+        raw = self.client.hgetall(self._job_key(job_id))
+        if not raw:
+            return None
+        job = {_text(k): _text(v) for k, v in raw.items()}
+        status = {"job_id": job_id, "status": job["status"], "attempts": int(job.get("attempts", 0))}
+        if "result" in job:
+            status["result"] = json.loads(job["result"])
+        if "error" in job:
+            status["error"] = job["error"]
+        return status
+
+    def wait(self, job_id: str, timeout: float = 30.0, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes or the timeout passes, then return its status.
+
+        Subscribes to the job's completion channel when the client supports
+        pub/sub and falls back to polling otherwise.
+        """
+        deadline = time.monotonic() + timeout
+        pubsub = self.client.pubsub() if hasattr(self.client, "pubsub") else None
+        try:
+            if pubsub is not None:
+                pubsub.subscribe(self.channel(job_id))
+            while True:
+                status = self.status(job_id)
+                if status is None or status["status"] in ("done", "failed", "cancelled"):
+                    return status
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return status
+                if pubsub is not None:
+                    pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, poll_interval * 10))
+                else:
+                    time.sleep(min(remaining, poll_interval))
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
+    def depth(self) -> int:
+        """Jobs waiting in the stream or claimed but not yet acknowledged."""
+        self.ensure_group()
+        groups = self.client.xinfo_groups(self.stream)
+        for group in groups:
+            if _text(group.get("name", group.get(b"name"))) == self.group:
+                pending = int(group.get("pending", group.get(b"pending", 0)))
+                lag = group.get("lag", group.get(b"lag")) or 0
+                return pending + int(lag)
+        return 0
+
+
+class InMemoryStreamClient:
+    """Single-process stand-in for the Redis commands used by `JobQueue`.
+
+    Useful for tests and local development without a Redis server; workers
+    must run in the same process as the API (see `agent.worker`).
+    """
+
+    def __init__(self):
+        """Create an empty set of streams, groups and hashes."""
+        self._lock = threading.Condition()
+        self._streams: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._hashes: Dict[str, Dict[str, Any]] = {}
+        self._sequence = 0
+
+    def xgroup_create(self, name, groupname, id="0", mkstream=False):
+        """Redis `XGROUP CREATE`, raising BUSYGROUP for an existing group."""
+        with self._lock:
+            if (name, groupname) in self._groups:
+                raise redis.ResponseError("BUSYGROUP Consumer Group name already exists")
+            self._streams.setdefault(name, [])
+            self._groups[(name, groupname)] = {"next": 0, "pending": {}}
+            return True
+
+    def xadd(self, name, fields):
+        """Redis `XADD` with an auto-generated entry id."""
+        with self._lock:
+            self._sequence += 1
+            entry_id = f"{int(time.time() * 1000)}-{self._sequence}"
+            self._streams.setdefault(name, []).append((entry_id, dict(fields)))
+            self._lock.notify_all()
+            return entry_id
+
+    def xreadgroup(self, groupname, consumername, streams, count=None, block=None):
+        """Redis `XREADGROUP` for new (`>`) entries, waiting up to `block` ms."""
+        (name, _), = streams.items()
+        deadline = time.monotonic() + (block or 0) / 1000
+        with self._lock:
+            group = self._groups[(name, groupname)]
+            while group["next"] >= len(self._streams[name]):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._lock.wait(remaining)
+            entries = self._streams[name][group["next"]:group["next"] + (count or len(self._streams[name]))]
+            group["next"] += len(entries)
+            for entry_id, _ in entries:
+                group["pending"][entry_id] = {"consumer": consumername, "delivered_at": time.monotonic()}
+            return [[name, [(entry_id, dict(fields)) for entry_id, fields in entries]]]
+
+    def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id="0-0", count=100):
+        """Redis `XAUTOCLAIM` of entries idle for at least `min_idle_time` ms."""
+        with self._lock:
+            group = self._groups[(name, groupname)]
+            now = time.monotonic()
+            fields_by_id = dict(self._streams[name])
+            claimed = []
+            for entry_id, pending in group["pending"].items():
+                if len(claimed) >= count:
+                    break
+                if (now - pending["delivered_at"]) * 1000 >= min_idle_time:
+                    pending.update(consumer=consumername, delivered_at=now)
+                    claimed.append((entry_id, dict(fields_by_id[entry_id])))
+            return ["0-0", claimed, []]
+
+    def xclaim(self, name, groupname, consumername, min_idle_time, message_ids, justid=False):
+        """Redis `XCLAIM` of pending entries idle for at least `min_idle_time` ms."""
+        with self._lock:
+            group = self._groups[(name, groupname)]
+            now = time.monotonic()
+            claimed = []
+            for entry_id in map(_text, message_ids):
+                pending = group["pending"].get(entry_id)
+                if pending and (now - pending["delivered_at"]) * 1000 >= min_idle_time:
+                    pending.update(consumer=consumername, delivered_at=now)
+                    claimed.append(entry_id)
+            if justid:
+                return claimed
+            fields_by_id = dict(self._streams[name])
+            return [(entry_id, dict(fields_by_id[entry_id])) for entry_id in claimed]
+
+    def xack(self, name, groupname, *ids):
+        """Redis `XACK`."""
+        with self._lock:
+            pending = self._groups[(name, groupname)]["pending"]
+            return sum(pending.pop(_text(entry_id), None) is not None for entry_id in ids)
+
+    def xinfo_groups(self, name):
+        """Redis `XINFO GROUPS`, reporting pending and lag per group."""
+        with self._lock:
+            return [
+                {
+                    "name": groupname,
+                    "pending": len(group["pending"]),
+                    "lag": len(self._streams[stream]) - group["next"],
+                }
+                for (stream, groupname), group in self._groups.items()
+                if stream == name
+            ]
+
+    def hset(self, name, mapping):
+        """Redis `HSET` with a mapping."""
+        with self._lock:
+            self._hashes.setdefault(name, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def hget(self, name, key):
+        """Redis `HGET`."""
+        with self._lock:
+            return self._hashes.get(name, {}).get(key)
+
+    def hgetall(self, name):
+        """Redis `HGETALL`."""
+        with self._lock:
+            return dict(self._hashes.get(name, {}))
+
+    def hincrby(self, name, key, amount=1):
+        """Redis `HINCRBY`."""
+        with self._lock:
+            values = self._hashes.setdefault(name, {})
+            values[key] = str(int(values.get(key, 0)) + amount)
+            return int(values[key])
+
+    def expire(self, name, seconds):
+        """Redis `EXPIRE`; entries never expire in memory."""
+        return True
+
+    def publish(self, channel, message):
+        """Redis `PUBLISH`; wakes up every waiting reader."""
+        with self._lock:
+            self._lock.notify_all()
+            return 0
+
+
+_job_queue: Optional[JobQueue] = None
+_prefetch_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Shared queue built from the environment.
+
+    `JOB_QUEUE_BACKEND=memory` uses the in-process stand-in instead of Redis.
+    """
+    global _job_queue
+    if _job_queue is None:
+        if os.getenv("JOB_QUEUE_BACKEND", "redis") == "memory":
+            client = InMemoryStreamClient()
+        else:
+            client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        _job_queue = JobQueue(
+            client,
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            claim_idle_ms=int(os.getenv("JOB_CLAIM_IDLE_MS", str(5 * 60 * 1000))),
+        )
+    return _job_queue
+
+
+def get_prefetch_queue() -> JobQueue:
+    """Separate low-priority stream for prefetch runs, on the job queue's client.
+
+    Workers only claim from it when the main queue has nothing waiting.
+    """
+    global _prefetch_queue
+    if _prefetch_queue is None:
+        _prefetch_queue = JobQueue(
+            get_job_queue().client,
+            stream="research:prefetch",
+            max_attempts=1,
+            claim_idle_ms=int(os.getenv("JOB_CLAIM_IDLE_MS", str(5 * 60 * 1000))),
+            result_ttl=3600,
+        )
+    return _prefetch_queue
@@ -0,0 +1,138 @@
+"""Load-adaptive research depth.
+
+`number_of_initial_queries` and `max_research_loops` decide how many upstream
+calls a run makes. When the process is busy, upstream calls are slow or the
+provider is rate limiting, the controller turns a combined pressure score
+into a smaller depth for new runs. The depth never drops below the configured
+floor. Pressure is measured over a sliding window, so depth recovers on its
+own once the load drops. The depth each run actually used is recorded in its
+`research_depth` state key.
+"""
+
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Optional
+
+from agent.metrics import metrics
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an upstream error is the provider asking us to slow down."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "rate limit" in message.lower()
+
+
+class DepthController:
+    """Tracks load signals and picks the research depth for new runs.
+
+    Args:
+        window: Seconds of upstream latency and rate-limit history considered.
+        max_run_seconds: Runs not finished after this long stop counting as
+            in flight, for runs cancelled between nodes that neither fail in
+            a node nor reach `finalize_answer`.
+    """
+
+    def __init__(self, window: float = 60.0, max_run_seconds: float = 600.0):
+        self.window = window
+        self.max_run_seconds = max_run_seconds
+        self._runs: Dict[str, float] = {}
+        self._latencies: deque = deque()
+        self._rate_limits: deque = deque()
+        self._lock = threading.Lock()
+
+    def run_started(self, run_id: Optional[str] = None) -> str:
+        """Mark a run as in flight and return its id."""
+        run_id = run_id or str(uuid.uuid4())
+        with self._lock:
+            self._runs[run_id] = time.monotonic()
+        return run_id
+
+    def run_finished(self, run_id: Optional[str]) -> None:
+        """Stop counting a run as in flight."""
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def record_upstream(self, seconds: float, error: Optional[BaseException] = None) -> None:
+        """Record an upstream model call's latency and whether it was rate limited."""
+        now = time.monotonic()
+        with self._lock:
+            self._latencies.append((now, seconds))
+            if error is not None and is_rate_limited(error):
+                self._rate_limits.append(now)
+                metrics.increment("load_control.rate_limits")
+
+    def _expire(self, now: float) -> None:
+        while self._latencies and now - self._latencies[0][0] > self.window:
+            self._latencies.popleft()
+        while self._rate_limits and now - self._rate_limits[0] > self.window:
+            self._rate_limits.popleft()
+        for run_id, started in list(self._runs.items()):
+            if now - started > self.max_run_seconds:
+                del self._runs[run_id]
+
+    def signals(self) -> Dict[str, float]:
+        """Return the current load signals over the window."""
+        with self._lock:
+            self._expire(time.monotonic())
+            latencies = [seconds for _, seconds in self._latencies]
+            return {
+                "in_flight": len(self._runs),
+                "upstream_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+                "rate_limits": len(self._rate_limits),
+            }
+
+    def pressure(self, target_in_flight: int, target_latency: float) -> float:
+        """Load relative to the targets; above 1 means overloaded."""
+        signals = self.signals()
+        return max(
+            signals["in_flight"] / max(1, target_in_flight),
+            signals["upstream_latency"] / max(1e-9, target_latency),
+            # Each recent 429 halves, then thirds, ... the depth
+            1.0 + signals["rate_limits"] if signals["rate_limits"] else 0.0,
+        )
+
+    def choose(self, initial_queries: int, research_loops: int, configurable) -> Dict[str, Any]:
+        """Depth for a new run that asked for `initial_queries` and `research_loops`."""
+        pressure = 0.0
+        if configurable.adaptive_depth:
+            pressure = self.pressure(
+                configurable.target_in_flight_runs, configurable.target_upstream_latency_seconds
+            )
+
+        def scale(requested: int, floor: int) -> int:
+            if pressure <= 1.0 or requested <= floor:
+                return requested
+            return max(floor, math.floor(requested / pressure))
+
+        depth = {
+            "initial_queries": scale(initial_queries, configurable.min_initial_queries),
+            "max_research_loops": scale(research_loops, configurable.min_research_loops),
+            "requested_queries": initial_queries,
+            "requested_loops": research_loops,
+            "pressure": round(pressure, 2),
+        }
+        depth["reduced"] = (depth["initial_queries"], depth["max_research_loops"]) != (initial_queries, research_loops)
+        if depth["reduced"]:
+            metrics.increment("load_control.reduced_runs")
+        return depth
+
+
+depth_controller = DepthController()
+
+
+def load_control_report() -> dict:
+    """Summarize the load signals and how many runs were reduced."""
+    return {
+        **depth_controller.signals(),
+        "reduced_runs": metrics.counter("load_control.reduced_runs"),
+        "rate_limits_total": metrics.counter("load_control.rate_limits"),
+    }
+
+
+metrics.register_report("load_control", load_control_report)
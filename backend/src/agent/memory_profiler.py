@@ -0,0 +1,214 @@
+"""Opt-in memory profiling and state-size budgets for graph nodes.
+
+Every node is wrapped with `profiled`. With `enable_memory_profiling` the
+wrapper records the node's tracemalloc peak, net allocations and top
+allocation sites, together with the serialized size of the state it was
+given, under the "memory" report on `/metrics`. With a
+`state_size_budget_bytes`, nodes receiving a state above the budget log a
+warning and, when `state_budget_action` is "compact", see a compacted copy
+with uncited sources removed and research summaries trimmed to fit.
+
+tracemalloc only tracks the whole process. Parallel `web_research` branches
+run at the same time, so the peak and allocations of a call that overlapped
+another profiled node include that node's memory too. Such calls are counted
+as `concurrent_calls`; the figures are exact only for nodes that ran alone.
+
+Both are off by default, in which case the wrapper only reads the config.
+"""
+
+import functools
+import itertools
+import json
+import logging
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+from agent.sources import cited_sources
+
+logger = logging.getLogger(__name__)
+
+TRACE_FRAMES = 10
+
+
+class MemoryProfile:
+    """Per-node memory statistics aggregated across runs."""
+
+    def __init__(self, top_n: int = 5):
+        self.top_n = top_n
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        node: str,
+        peak_bytes: int,
+        allocated_bytes: int,
+        state_bytes: int,
+        top_allocations: List[str],
+        concurrent: bool = False,
+    ) -> None:
+        """Add one node execution's memory figures."""
+        with self._lock:
+            stats = self._nodes.setdefault(
+                node,
+                {"calls": 0, "concurrent_calls": 0, "peak_bytes_max": 0, "peak_bytes_total": 0,
+                 "allocated_bytes_total": 0, "state_bytes_max": 0},
+            )
+            stats["calls"] += 1
+            stats["concurrent_calls"] += int(concurrent)
+            stats["peak_bytes_max"] = max(stats["peak_bytes_max"], peak_bytes)
+            stats["peak_bytes_total"] += peak_bytes
+            stats["allocated_bytes_total"] += allocated_bytes
+            stats["state_bytes_max"] = max(stats["state_bytes_max"], state_bytes)
+            stats["top_allocations"] = top_allocations[:self.top_n]
+
+    def report(self) -> Dict[str, Any]:
+        """Return per-node memory statistics, heaviest peak first."""
+        with self._lock:
+            nodes = {
+                node: {
+                    "calls": stats["calls"],
+                    "concurrent_calls": stats["concurrent_calls"],
+                    "peak_bytes_max": stats["peak_bytes_max"],
+                    "peak_bytes_mean": stats["peak_bytes_total"] / stats["calls"],
+                    "allocated_bytes_mean": stats["allocated_bytes_total"] / stats["calls"],
+                    "state_bytes_max": stats["state_bytes_max"],
+                    "top_allocations": stats["top_allocations"],
+                }
+                for node, stats in self._nodes.items()
+            }
+        return {
+            "nodes": nodes,
+            "budget_exceeded": metrics.counter("memory.budget_exceeded"),
+            "compactions": metrics.counter("memory.compactions"),
+        }
+
+    def reset(self) -> None:
+        """Forget all recorded executions."""
+        with self._lock:
+            self._nodes.clear()
+
+
+profile = MemoryProfile()
+
+# Parallel `web_research` branches run in threads; tracing stays on while any
+# profiled call is running and is stopped by the last one to finish. Each
+# running call maps to whether another one overlapped it.
+_tracing_lock = threading.Lock()
+_active: Dict[int, bool] = {}
+_call_ids = itertools.count()
+_started_tracing = False
+
+
+def _start_tracing() -> Tuple[int, int]:
+    """Register a profiled call, returning its id and the traced memory so far.
+
+    The peak is only reset when no other profiled call is running, since
+    resetting it would corrupt theirs.
+    """
+    global _started_tracing
+    with _tracing_lock:
+        if not _active and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            _started_tracing = True
+        if _active:
+            _active.update(dict.fromkeys(_active, True))
+        else:
+            tracemalloc.reset_peak()
+        call_id = next(_call_ids)
+        _active[call_id] = bool(_active)
+        baseline, _ = tracemalloc.get_traced_memory()
+        return call_id, baseline
+
+
+def _overlapped(call_id: int) -> bool:
+    """Whether another profiled call has run alongside `call_id` so far."""
+    with _tracing_lock:
+        return _active[call_id]
+
+
+def _stop_tracing(call_id: int) -> None:
+    global _started_tracing
+    with _tracing_lock:
+        del _active[call_id]
+        if not _active and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def state_size(state: Dict[str, Any]) -> int:
+    """Approximate serialized size of a state in bytes."""
+    return len(json.dumps(state, default=str).encode("utf-8"))
+
+
+def compact_state(state: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Copy of `state` trimmed towards `budget` bytes.
+
+    Drops sources that no research summary cites and truncates each research
+    summary to an equal share of whatever the rest of the state leaves of the
+    budget. Only the node's input is compacted; the checkpointed state keeps
+    everything, so later nodes may exceed the budget again.
+    """
+    compacted = dict(state)
+    results = state.get("web_research_result") or []
+    if state.get("sources"):
+        compacted["sources"] = cited_sources(state["sources"], results)
+
+    if results:
+        overhead = state_size({**compacted, "web_research_result": []})
+        # Quotes and separators add a few bytes per serialized summary
+        share = max(0, budget - overhead - 4 * len(results)) // len(results)
+        compacted["web_research_result"] = [
+            result if len(result.encode("utf-8")) <= share
+            else result.encode("utf-8")[:share].decode("utf-8", "ignore")
+            for result in results
+        ]
+    return compacted
+
+
+def profiled(name: str, node: Callable) -> Callable:
+    """Wrap a `(state, config)` node with memory profiling and budget checks."""
+
+    @functools.wraps(node)
+    def wrapper(state, config):
+        configurable = Configuration.from_runnable_config(config)
+        budget = configurable.state_size_budget_bytes
+        if not configurable.enable_memory_profiling and not budget:
+            return node(state, config)
+
+        state_bytes = state_size(state)
+        if budget and state_bytes > budget:
+            metrics.increment("memory.budget_exceeded")
+            logger.warning("State of %d bytes exceeds the %d byte budget in %s", state_bytes, budget, name)
+            if configurable.state_budget_action == "compact":
+                metrics.increment("memory.compactions")
+                state = compact_state(state, budget)
+        if not configurable.enable_memory_profiling:
+            return node(state, config)
+
+        call_id, baseline = _start_tracing()
+        try:
+            before = tracemalloc.take_snapshot()
+            try:
+                return node(state, config)
+            finally:
+                current, peak = tracemalloc.get_traced_memory()
+                top = tracemalloc.take_snapshot().compare_to(before, "lineno")[:profile.top_n]
+                profile.record(
+                    name,
+                    peak_bytes=max(0, peak - baseline),
+                    allocated_bytes=current - baseline,
+                    state_bytes=state_bytes,
+                    top_allocations=[str(stat) for stat in top],
+                    concurrent=_overlapped(call_id),
+                )
+        finally:
+            _stop_tracing(call_id)
+
+    return wrapper
+
+
+metrics.register_report("memory", profile.report)
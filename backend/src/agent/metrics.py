@@ -0,0 +1,89 @@
+"""Process-local counters and timings exposed on the `/metrics` route."""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+
+class Metrics:
+    """Thread-safe counters and timing aggregates.
+
+    Components can also register a report callback that derives rates or
+    estimates from the raw numbers; reports are included in `snapshot`.
+    """
+
+    def __init__(self):
+        """Create empty counters, timings, gauges and reports."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+        self._reports: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add `value` to the counter `name`."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one timing of `seconds` under `name`."""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total_seconds": 0.0})
+            timing["count"] += 1
+            timing["total_seconds"] += seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        """Context manager that observes the duration of its block under `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        """Return the current value of the counter `name`, 0 if never incremented."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def mean(self, name: str) -> float:
+        """Mean of the timings observed under `name`, 0 if none."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if not timing or not timing["count"]:
+                return 0.0
+            return timing["total_seconds"] / timing["count"]
+
+    def gauge(self, name: str, read: Callable[[], Any]) -> None:
+        """Register a value that is read at snapshot time (e.g. a queue depth)."""
+        self._gauges[name] = read
+
+    def register_report(self, name: str, report: Callable[[], Dict[str, Any]]) -> None:
+        """Register a callback whose result is included in `snapshot` under `name`."""
+        self._reports[name] = report
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every counter, timing, gauge and report, as served on `/metrics`."""
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {
+                name: {**timing, "mean_seconds": timing["total_seconds"] / timing["count"]}
+                for name, timing in self._timings.items()
+                if timing["count"]
+            }
+        return {
+            "counters": counters,
+            "timings": timings,
+            "gauges": {name: read() for name, read in self._gauges.items()},
+            "reports": {name: report() for name, report in self._reports.items()},
+        }
+
+    def reset(self) -> None:
+        """Clear counters and timings; gauges and reports stay registered."""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,234 @@
+"""Viewport-based prefetching of restaurant research.
+
+The map screen knows which restaurants are on screen long before the user
+taps one. The app posts the visible restaurants (and optionally the map's
+bounding box) to `/prefetch`; the prefetcher ranks them by how likely they
+are to be opened, skips those whose sections are already fresh in the
+research cache for the query path the tap will take, and queues low-priority research runs for the rest on the
+prefetch stream. The runs fill the research cache so the tap itself mostly
+finds every section fresh. When the same session posts a new viewport, its
+queued runs that are no longer wanted are cancelled.
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from agent.configuration import Configuration
+from agent.jobs import JobQueue
+from agent.metrics import metrics
+from agent.query_planner import QUERY_TEMPLATES, parse_lookup
+from agent.research_cache import (
+    SECTION_TTLS,
+    ResearchCache,
+    classify_query,
+    restaurant_key,
+)
+
+
+def lookup_sections(topic: str, configurable: Optional[Dict[str, Any]] = None) -> Set[str]:
+    """Sections the tap's research run for `topic` will search, i.e. what a prefetch has to fill.
+
+    With the query fast path the run searches the planner's templates. When
+    the fast path is off, or the planner would leave the topic to the LLM, the
+    generated queries can land in any section, so every section has to be
+    fresh before the tap is sure to be served from the cache.
+    """
+    config = Configuration.from_runnable_config({"configurable": configurable or {}})
+    if not config.enable_query_fast_path or parse_lookup(topic) is None:
+        return set(SECTION_TTLS)
+    templates = QUERY_TEMPLATES[:max(1, config.number_of_initial_queries)]
+    return {classify_query(template.format(target="")) for template in templates}
+
+
+def lookup_prompt(name: str, address: Optional[str] = None) -> str:
+    """Build the research prompt the mobile app sends when a restaurant is opened.
+
+    Prefetch runs must use the same text so they populate the cache entries
+    the tap will look up.
+    """
+    location = f" located at {address}" if address else ""
+    return (
+        f"Research about {name or ''} restaurant/amenity {location}. "
+        "Provide food and user reviews, what the menu entails, and the price range."
+    )
+
+
+def _in_bbox(restaurant: Dict[str, Any], bbox: Dict[str, float]) -> bool:
+    return (
+        bbox["south"] <= restaurant["lat"] <= bbox["north"]
+        and bbox["west"] <= restaurant["lon"] <= bbox["east"]
+    )
+
+
+def rank_restaurants(
+    restaurants: List[Dict[str, Any]],
+    bbox: Optional[Dict[str, float]] = None,
+    center: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """Order candidates by how likely they are to be opened.
+
+    Restaurants near the centre of the map (or the user's position when
+    given) score highest; named places with an address, cuisine or website
+    get a small boost because they show richer callouts. Unnamed places and
+    those outside the bounding box are dropped.
+    """
+    candidates = [
+        restaurant for restaurant in restaurants
+        if restaurant.get("name") and restaurant["name"] != "Unnamed"
+        and (bbox is None or _in_bbox(restaurant, bbox))
+    ]
+    if not candidates:
+        return []
+
+    if center is None and bbox is not None:
+        center = {"lat": (bbox["south"] + bbox["north"]) / 2, "lon": (bbox["west"] + bbox["east"]) / 2}
+    if center is None:
+        center = {
+            "lat": sum(r["lat"] for r in candidates) / len(candidates),
+            "lon": sum(r["lon"] for r in candidates) / len(candidates),
+        }
+
+    scale = math.cos(math.radians(center["lat"]))
+
+    def distance(restaurant: Dict[str, Any]) -> float:
+        return math.hypot(restaurant["lat"] - center["lat"], (restaurant["lon"] - center["lon"]) * scale)
+
+    farthest = max(distance(restaurant) for restaurant in candidates) or 1.0
+    ranked = []
+    for restaurant in candidates:
+        proximity = 1.0 - distance(restaurant) / farthest
+        details = sum(bool(restaurant.get(key)) for key in ("address", "cuisine", "website")) / 3
+        ranked.append({**restaurant, "score": round(0.8 * proximity + 0.2 * details, 4)})
+    return sorted(ranked, key=lambda restaurant: restaurant["score"], reverse=True)
+
+
+class Prefetcher:
+    """Schedules and cancels prefetch research runs per client session.
+
+    Args:
+        queue: Low-priority job queue the runs are added to.
+        cache: Research cache consulted to skip restaurants that are fresh.
+        max_per_viewport: Runs scheduled at most for one viewport.
+        max_queue_depth: Prefetch backlog above which no new runs are queued.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        cache: ResearchCache,
+        max_per_viewport: int = 5,
+        max_queue_depth: int = 100,
+    ):
+        self.queue = queue
+        self.cache = cache
+        self.max_per_viewport = max_per_viewport
+        self.max_queue_depth = max_queue_depth
+        self._lock = threading.Lock()
+        # session -> restaurant key -> job id
+        self._sessions: Dict[str, Dict[str, str]] = {}
+        # restaurant key -> (job id, sessions wanting it)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def schedule(
+        self,
+        session_id: str,
+        restaurants: List[Dict[str, Any]],
+        bbox: Optional[Dict[str, float]] = None,
+        center: Optional[Dict[str, float]] = None,
+        limit: Optional[int] = None,
+        configurable: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Replace the session's prefetch set with the top candidates of a viewport."""
+        limit = min(limit or self.max_per_viewport, self.max_per_viewport)
+        scheduled, cached = [], []
+        wanted: Dict[str, str] = {}
+        backlog = self.queue.depth()
+
+        with self._lock:
+            for restaurant in rank_restaurants(restaurants, bbox, center):
+                if len(wanted) >= limit:
+                    break
+                topic = lookup_prompt(restaurant["name"], restaurant.get("address"))
+                key = restaurant_key(topic)
+                if key is None:
+                    # The run's results wouldn't be cached, so prefetching gains nothing
+                    continue
+                if lookup_sections(topic, configurable) <= set(self.cache.get_sections(key)):
+                    metrics.increment("prefetch.already_cached")
+                    cached.append(restaurant.get("id"))
+                    continue
+
+                job_id = self._active_job(key)
+                if job_id is None:
+                    if backlog >= self.max_queue_depth:
+                        metrics.increment("prefetch.skipped_backpressure")
+                        continue
+                    # Prefetched runs are shared by sessions and are not a user's interaction
+                    job_id = self.queue.enqueue(
+                        topic, {**(configurable or {}), "writeback_answers": False}, priority="batch"
+                    )
+                    self._jobs[key] = {"job_id": job_id, "sessions": set()}
+                    backlog += 1
+                    metrics.increment("prefetch.scheduled")
+                self._jobs[key]["sessions"].add(session_id)
+                wanted[key] = job_id
+                scheduled.append({
+                    "id": restaurant.get("id"),
+                    "name": restaurant["name"],
+                    "job_id": job_id,
+                    "score": restaurant["score"],
+                })
+
+            previous = self._sessions.get(session_id, {})
+            cancelled = self._release(session_id, set(previous) - set(wanted))
+            self._sessions[session_id] = wanted
+
+        return {"scheduled": scheduled, "cached": cached, "cancelled": cancelled}
+
+    def cancel(self, session_id: str) -> int:
+        """Drop every prefetch of a session (e.g. the map screen was closed)."""
+        with self._lock:
+            keys = set(self._sessions.pop(session_id, {}))
+            return self._release(session_id, keys)
+
+    def _active_job(self, key: str) -> Optional[str]:
+        job = self._jobs.get(key)
+        if job is None:
+            return None
+        status = self.queue.status(job["job_id"])
+        if status is None or status["status"] not in ("queued", "running"):
+            del self._jobs[key]
+            return None
+        return job["job_id"]
+
+    def _release(self, session_id: str, keys: Set[str]) -> int:
+        """Stop wanting `keys` for a session, cancelling runs nobody wants anymore."""
+        cancelled = 0
+        for key in keys:
+            job = self._jobs.get(key)
+            if job is None:
+                continue
+            job["sessions"].discard(session_id)
+            if not job["sessions"]:
+                del self._jobs[key]
+                if self.queue.cancel(job["job_id"]):
+                    cancelled += 1
+                    metrics.increment("prefetch.cancelled")
+        return cancelled
+
+
+def prefetch_report() -> dict:
+    """Summarize prefetch scheduling and the cache hits it produced."""
+    hits = metrics.counter("research_cache.lookup_hits")
+    misses = metrics.counter("research_cache.lookup_misses")
+    return {
+        "scheduled": metrics.counter("prefetch.scheduled"),
+        "cancelled": metrics.counter("prefetch.cancelled"),
+        "already_cached": metrics.counter("prefetch.already_cached"),
+        "skipped_backpressure": metrics.counter("prefetch.skipped_backpressure"),
+        "lookup_hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+metrics.register_report("prefetch", prefetch_report)
@@ -0,0 +1,65 @@
+"""Graph profiles that trade research depth for latency.
+
+The full profile runs the usual query generation, parallel search and
+reflection loop, then writes the six-section answer. The lite profile is
+meant for list-view previews. It runs a single search, never reflects, and
+writes a short summary with `quick_summary_instructions`.
+
+A request picks its profile with `graph_profile` in `configurable`.
+`langgraph.json` also registers the lite topology as the `agent-lite` graph,
+which has no reflection node and uses the lite profile by default.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GraphProfile:
+    """How much research a run does and how it answers.
+
+    Attributes:
+        name: Value of `graph_profile` that selects the profile.
+        max_initial_queries: Cap on the initial search queries, or None for
+            the configured count.
+        reflection: Whether the run reflects and loops on its research.
+        quick_answer: Whether the answer is a short summary instead of the
+            six-section report.
+    """
+
+    name: str
+    max_initial_queries: Optional[int] = None
+    reflection: bool = True
+    quick_answer: bool = False
+
+
+PROFILES = {
+    "full": GraphProfile("full"),
+    "lite": GraphProfile("lite", max_initial_queries=1, reflection=False, quick_answer=True),
+}
+
+
+def get_profile(configurable: Configuration) -> GraphProfile:
+    """Return the profile a run asked for, falling back to the full profile."""
+    profile = PROFILES.get(configurable.graph_profile)
+    if profile is None:
+        logger.warning("Unknown graph profile %r, using the full profile", configurable.graph_profile)
+        return PROFILES["full"]
+    return profile
+
+
+def apply_profile(depth: dict, profile: GraphProfile) -> dict:
+    """Limit a run's chosen depth to what its profile allows. Mutates `depth`."""
+    if profile.max_initial_queries is not None:
+        depth["initial_queries"] = min(depth["initial_queries"], profile.max_initial_queries)
+    if not profile.reflection:
+        depth["max_research_loops"] = 0
+    depth["profile"] = profile.name
+    metrics.increment(f"profiles.runs.{profile.name}")
+    return depth
@@ -0,0 +1,77 @@
+"""Progress events emitted while a research run is still working.
+
+Nodes report what they have done so far as LangGraph custom stream events.
+These are the generated queries, each finished search branch with its sources,
+and each reflection decision with the loop count. Clients of the LangGraph
+API receive them with `stream_mode="custom"` on `/runs/stream`. Clients of
+this app receive them as server-sent events from `POST /research/stream`.
+
+Every event is a dict with an `event` name and a unix timestamp `ts`:
+
+    {"event": "queries_generated", "queries": [...], "cached_queries": [...],
+     "initial_queries": 3, "max_research_loops": 3}
+    {"event": "branch_completed", "id": 1, "query": "...", "sources": [{"label", "url"}], "stale": false}
+    {"event": "reflection", "research_loop_count": 1, "is_sufficient": false,
+     "knowledge_gap": "...", "follow_up_queries": [...]}
+    {"event": "research_decision", "action": "continue" | "finalize",
+     "research_loop_count": 1, "max_research_loops": 3, "budget_exhausted": "run_tokens"?}
+    {"event": "answer_started", "sources": 12}
+"""
+
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from langgraph.config import get_stream_writer
+
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def emit(event: str, **data: Any) -> None:
+    """Send a progress event to the run's custom stream.
+
+    Does nothing outside a graph run, e.g. when a node is called directly.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"event": event, "ts": round(time.time(), 3), **data})
+    metrics.increment(f"progress.{event}")
+
+
+def source_list(table: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """List the sources of an interned table as `{label, url}` pairs, for display."""
+    if not table:
+        return []
+    return [{"label": label, "url": url} for url, label in zip(table["urls"], table["labels"])]
+
+
+def sse_events(chunks: Iterable) -> Iterator[str]:
+    """Format `graph.stream(..., stream_mode=["custom", "values"])` chunks as SSE.
+
+    Progress events are sent as they arrive. The last state is sent once as
+    an `answer` event with the final message, cited sources and usage totals.
+    """
+    final = None
+    try:
+        for mode, chunk in chunks:
+            if mode == "custom":
+                yield f"event: progress\ndata: {json.dumps(chunk)}\n\n"
+            elif mode == "values":
+                final = chunk
+    except Exception as e:
+        logger.warning("Error streaming research run: %s", e)
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        return
+    if final is not None and final.get("messages"):
+        answer = {
+            "answer": final["messages"][-1].content,
+            "sources_gathered": final.get("sources_gathered", []),
+            "research_depth": final.get("research_depth"),
+            "usage": final.get("usage"),
+        }
+        yield f"event: answer\ndata: {json.dumps(answer, default=str)}\n\n"
@@ -83,6 +83,14 @@ Summaries:
 {summaries}
 """
 
+coverage_gap_instructions = """
+Note: a keyword check found little or nothing in the summaries about these sections of the final answer: {sections}. Focus any follow-up queries on them.
+"""
+
+reflection_confidence_instructions = """
+Also include a "confidence" key: a number between 0 and 1 describing how certain you are that your "is_sufficient" decision is correct. Use a low value if the summaries are ambiguous, contradictory or you are unsure which sections are still missing.
+"""
+
 answer_instructions = """Generate a high-quality answer to the user's question based on the provided summaries.
 
 Instructions:
@@ -121,3 +129,48 @@ User Context:
 Summaries:
 {summaries}
 """
+
+quick_summary_instructions = """Write a short preview of the restaurant the user asked about, based on the provided summaries.
+
+Instructions:
+- The current date is {current_date}.
+- You are a restaurant research assistant writing a preview for a list of results.
+- Focus on the SPECIFIC LOCATION mentioned in the user's query.
+- Write at most 3 sentences: what the restaurant is known for, its typical price range, and how diners rate it.
+- Leave out anything the summaries don't mention. Do not use headings.
+- You MUST include the citations from the summaries for the information you use.
+
+User Context:
+- {research_topic}
+
+Summaries:
+{summaries}
+"""
+
+compact_citation_instructions = """
+Citations in the summaries are written as compact tokens such as [c3.12]. Keep each token exactly as written, directly after the information it supports, and do not turn tokens into links or invent new ones.
+"""
+
+
+conversation_summary_instructions = """Condense the earlier part of a conversation between a user and a restaurant research assistant.
+
+Instructions:
+- Extend the existing summary with the new messages; never drop facts from the existing summary.
+- Keep the restaurants, locations and aspects (menu, pricing, reviews, updates, dietary needs) the user asked about, plus any preferences or constraints they stated.
+- Keep only the key conclusions of the assistant's answers, not their full text or citations.
+- Write at most 8 short bullet points.
+
+Existing summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+writeback_summary_instructions = """Write a concise, one-sentence summary describing the food, atmosphere, or unique qualities of the restaurant in each of the {count} research answers below.
+
+Instructions:
+- Return exactly {count} summaries, in the same order as the answers.
+- Each summary is a single sentence of plain text without citations or links.
+
+{answers}"""
@@ -0,0 +1,126 @@
+"""Template-based query planner for simple restaurant lookups.
+
+Most requests are "tell me about <restaurant> at <location>", for which the
+`generate_query` LLM call always produces the same handful of queries. This
+planner recognises those shapes and emits the queries directly, leaving the
+LLM for multi-turn or multi-aspect questions.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from agent.metrics import metrics
+
+# Prompt sent by the mobile app's restaurant-info screen
+APP_PROMPT_PATTERN = re.compile(
+    r"^research about (?P<name>.+?) restaurant/amenity"
+    r"(?:\s+located at (?P<location>.+?))?\s*\."
+    r"\s*provide food and user reviews, what the menu entails, and the price range\.?$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Free-form lookups typed by users. They need an explicit lookup verb: a bare
+# "<name> at|in <location>" also matches sentences like "I am in a hurry",
+# whose topic would then key the research cache and the write-back.
+LOOKUP_PATTERNS = [
+    re.compile(
+        r"^(?:please\s+)?(?:tell me about|research(?: about)?|look up|what about|info on|information (?:on|about)|reviews? (?:of|for))\s+"
+        r"(?P<name>.+?)(?:\s+(?:at|in|located at|on)\s+(?P<location>.+?))?\s*[.?!]?$",
+        re.IGNORECASE,
+    ),
+]
+
+# Signals that the question is more than a plain lookup
+COMPLEX_MARKERS = re.compile(
+    r"\b(?:compare|comparison|versus|vs\.?|better than|difference|between|"
+    r"which|recommend|best|cheapest|nearby|near me|alternatives?|instead|and then)\b",
+    re.IGNORECASE,
+)
+OPEN_QUESTION = re.compile(
+    r"^(?!what about\b)(?:what|where|how|why|when|who|is|are|can|should|do|does)\b",
+    re.IGNORECASE,
+)
+
+# A free-form "name" or "location" with these asks about an aspect of a
+# restaurant ("the vegan options at ..."), not just the restaurant
+ASPECT_WORDS = re.compile(
+    r"\b(?:prices?|pricing|costs?|menus?|dishes|hours|opening|vegan|vegetarian|halal|"
+    r"dietary|gluten|allergens?|options|reviews?|ratings?|parking|reservations?|and)\b",
+    re.IGNORECASE,
+)
+# ... and a free-form "name" with these is a category search ("Italian
+# restaurants in ...", "good coffee in ..."), not a restaurant
+CATEGORY_WORDS = re.compile(
+    r"\b(?:restaurants|food|places|spots|cafes|eateries|cuisine|"
+    r"good|great|nice|cheap|affordable|popular|top)\b",
+    re.IGNORECASE,
+)
+
+MAX_SIMPLE_TOPIC_LENGTH = 250
+
+QUERY_TEMPLATES = [
+    "{target} customer reviews",
+    "{target} menu popular dishes and prices",
+]
+
+
+def parse_lookup(research_topic: str) -> Optional[Tuple[str, str]]:
+    """Return `(restaurant, location)` if the topic is a simple lookup."""
+    topic = " ".join(research_topic.split())
+    if (
+        not topic
+        or "\n" in research_topic.strip()
+        or len(topic) > MAX_SIMPLE_TOPIC_LENGTH
+        or COMPLEX_MARKERS.search(topic)
+        or OPEN_QUESTION.match(topic)
+    ):
+        return None
+    match = APP_PROMPT_PATTERN.match(topic)
+    if match:
+        return _lookup(match)
+    for pattern in LOOKUP_PATTERNS:
+        match = pattern.match(topic)
+        if match:
+            lookup = _lookup(match)
+            if lookup is None or ASPECT_WORDS.search(" ".join(lookup)) or CATEGORY_WORDS.search(lookup[0]):
+                return None
+            return lookup
+    return None
+
+
+def _lookup(match: re.Match) -> Optional[Tuple[str, str]]:
+    name = match.group("name").strip(" ,.")
+    location = (match.group("location") or "").strip(" ,.")
+    return (name, location) if name else None
+
+
+def plan_queries(research_topic: str, number_queries: int) -> Optional[List[str]]:
+    """Build `query_list` for simple lookups, or return None to use the LLM."""
+    lookup = parse_lookup(research_topic)
+    if lookup is None:
+        metrics.increment("query_planner.llm_fallback")
+        return None
+    metrics.increment("query_planner.fast_path")
+    target = " ".join(part for part in lookup if part)
+    return [
+        template.format(target=target)
+        for template in QUERY_TEMPLATES[:max(1, number_queries)]
+    ]
+
+
+def fast_path_report() -> dict:
+    """How often the fast path fires and the LLM latency it avoided."""
+    fast_path = metrics.counter("query_planner.fast_path")
+    fallback = metrics.counter("query_planner.llm_fallback")
+    total = fast_path + fallback
+    mean_llm_seconds = metrics.mean("query_planner.llm_seconds")
+    return {
+        "fast_path": fast_path,
+        "llm_fallback": fallback,
+        "fast_path_rate": fast_path / total if total else 0.0,
+        "mean_llm_seconds": mean_llm_seconds,
+        "estimated_seconds_saved": fast_path * mean_llm_seconds,
+    }
+
+
+metrics.register_report("query_planner", fast_path_report)
@@ -0,0 +1,64 @@
+"""Cheap-model-first cascade for the reflection step.
+
+A smaller model makes the `is_sufficient` decision together with a confidence
+score. Only when that confidence is below the configured threshold, or the
+output does not validate against the schema, is the prompt escalated to the
+stronger `reflection_model`.
+"""
+
+import logging
+from typing import Callable, Optional
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+from agent.prompts import reflection_confidence_instructions
+from agent.tools_and_schemas import CascadeReflection, Reflection
+
+logger = logging.getLogger(__name__)
+
+# (model, prompt, schema) -> parsed structured output
+StructuredInvoke = Callable[[str, str, type], Optional[Reflection]]
+
+
+def cascade_reflection(
+    prompt: str, configurable: Configuration, invoke: StructuredInvoke
+) -> Optional[Reflection]:
+    """Return the cheap model's reflection, or None if it must be escalated."""
+    metrics.increment("reflection_cascade.calls")
+    try:
+        result = invoke(
+            configurable.reflection_cascade_model,
+            prompt + reflection_confidence_instructions,
+            CascadeReflection,
+        )
+    except Exception as e:
+        logger.warning("Reflection cascade model failed: %s", e)
+        result = None
+
+    confidence = getattr(result, "confidence", None)
+    if confidence is None:
+        metrics.increment("reflection_cascade.escalations.invalid_output")
+    elif confidence < configurable.reflection_cascade_threshold:
+        metrics.increment("reflection_cascade.escalations.low_confidence")
+    else:
+        metrics.increment("reflection_cascade.accepted")
+        return result
+    metrics.increment("reflection_cascade.escalations")
+    return None
+
+
+def cascade_report() -> dict:
+    """Summarize how often the cheap reflection model escalated."""
+    calls = metrics.counter("reflection_cascade.calls")
+    escalations = metrics.counter("reflection_cascade.escalations")
+    return {
+        "calls": calls,
+        "accepted": metrics.counter("reflection_cascade.accepted"),
+        "escalations": escalations,
+        "escalated_low_confidence": metrics.counter("reflection_cascade.escalations.low_confidence"),
+        "escalated_invalid_output": metrics.counter("reflection_cascade.escalations.invalid_output"),
+        "escalation_rate": escalations / calls if calls else 0.0,
+    }
+
+
+metrics.register_report("reflection_cascade", cascade_report)
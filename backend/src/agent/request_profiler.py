@@ -0,0 +1,240 @@
+"""On-demand sampling profiler for a single research run.
+
+Slow restaurant queries are hard to reproduce, so an admin can profile one
+production run. Send the `PROFILING_ADMIN_TOKEN` in the `X-Profile-Token`
+header and ask for profiling with `X-Profile: 1` (or `profile_run`). The
+server's auth handler checks the token and grants the run the
+`PROFILE_PERMISSION`, which clients cannot set themselves; the token itself
+is never forwarded into `configurable`, where it would be stored with the
+run. A sampler thread then records the stacks of the threads running that
+run's nodes. The run's final state gets a `profile` key with:
+- a per-node wall and CPU time breakdown;
+- the sampled stacks in collapsed format, which flamegraph.pl and speedscope
+  can read;
+- the path of the `.collapsed` artifact, when `PROFILE_DIR` is set.
+
+Runs are told apart by their trace id, which every node span of a run
+shares. Without a token configured, or when a run doesn't ask for profiling,
+each node only does one empty-dict check.
+"""
+
+import functools
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import trace
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Safety net for runs that never reach finalize_answer
+MAX_PROFILE_SECONDS = 300.0
+SKIPPED_FILES = {"threading.py", "thread.py", "request_profiler.py"}
+PROFILE_PERMISSION = "profile:runs"
+
+
+class RunProfiler:
+    """Samples the stacks of the threads currently running a run's nodes.
+
+    Args:
+        interval: Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.stacks: Counter = Counter()
+        self.nodes: Dict[str, Dict[str, float]] = {}
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="run-profiler", daemon=True)
+        self._sampler.start()
+
+    def expired(self) -> bool:
+        """Check whether the run has been profiled for too long."""
+        return time.monotonic() - self.started > MAX_PROFILE_SECONDS
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.expired():
+                return
+            frames = sys._current_frames()
+            with self._lock:
+                threads = dict(self._threads)
+            for thread_id, node in threads.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[";".join([node, *collapse(frame)])] += 1
+
+    def node_of(self, thread_id: int) -> Optional[str]:
+        """Return the node the thread `thread_id` is running, if any."""
+        return self._threads.get(thread_id)
+
+    def enter(self, node: str) -> None:
+        """Start sampling the current thread as `node`."""
+        with self._lock:
+            self._threads[threading.get_ident()] = node
+
+    def leave(self, node: str, wall: Optional[float] = None, cpu: Optional[float] = None) -> None:
+        """Stop sampling the current thread and add the node's timings."""
+        with self._lock:
+            self._threads.pop(threading.get_ident(), None)
+            if wall is None:
+                return
+            stats = self.nodes.setdefault(node, {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            stats["calls"] += 1
+            stats["wall_ms"] += wall * 1000
+            stats["cpu_ms"] += cpu * 1000
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and aggregate the samples into a report."""
+        self._stop.set()
+        self._sampler.join()
+        samples: Counter = Counter()
+        for stack, count in self.stacks.items():
+            samples[stack.split(";", 1)[0]] += count
+        nodes = {
+            node: {
+                "calls": stats["calls"],
+                "wall_ms": round(stats["wall_ms"], 1),
+                "cpu_ms": round(stats["cpu_ms"], 1),
+                "samples": samples[node],
+            }
+            for node, stats in self.nodes.items()
+        }
+        return {
+            "wall_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "interval_ms": self.interval * 1000,
+            "nodes": nodes,
+            "flamegraph": "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()),
+        }
+
+
+def collapse(frame) -> list:
+    """Outermost-first `module:function` names of a stack, without thread plumbing."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        if filename not in SKIPPED_FILES:
+            names.append(f"{os.path.splitext(filename)[0]}:{code.co_name}")
+        frame = frame.f_back
+    return names[::-1]
+
+
+_active: Dict[int, RunProfiler] = {}
+_active_lock = threading.Lock()
+
+
+def profile_permissions(token: Optional[str]) -> list:
+    """Permissions granted by an `X-Profile-Token` header value."""
+    admin_token = os.getenv("PROFILING_ADMIN_TOKEN")
+    if not admin_token or not token:
+        return []
+    if not hmac.compare_digest(token.encode(), admin_token.encode()):
+        metrics.increment("profiling.unauthorized")
+        logger.warning("Ignoring profiling request without a valid admin token")
+        return []
+    return [PROFILE_PERMISSION]
+
+
+def authorized(config: Dict[str, Any]) -> bool:
+    """Whether the run asked for profiling and was granted the permission."""
+    if not os.getenv("PROFILING_ADMIN_TOKEN"):
+        return False
+    configurable = (config or {}).get("configurable") or {}
+    requested = (
+        Configuration.from_runnable_config(config).profile_run
+        or str(configurable.get("x-profile", "")).lower() in ("1", "true")
+    )
+    return bool(requested) and PROFILE_PERMISSION in (configurable.get("langgraph_auth_permissions") or ())
+
+
+def bind(fn: Callable) -> Callable:
+    """Attribute `fn` to the calling thread's node when it runs on another thread.
+
+    Upstream calls run on a pool (see `guarded_call`) while the node thread
+    only waits for them, so their stacks are sampled under the same node.
+    """
+    if not _active:
+        return fn
+    caller = threading.get_ident()
+    for profiler in list(_active.values()):
+        node = profiler.node_of(caller)
+        if node is not None:
+            break
+    else:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        profiler.enter(node)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.leave(node)
+
+    return run
+
+
+def write_artifact(run: int, flamegraph: str) -> Optional[str]:
+    """Write a run's collapsed stacks under `PROFILE_DIR`, returning the path."""
+    directory = os.getenv("PROFILE_DIR")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{run:032x}.collapsed")
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(flamegraph + "\n")
+    return path
+
+
+def request_profiled(name: str, node: Callable, starts: bool = False, finishes: bool = False) -> Callable:
+    """Wrap a `(state, config)` node so it is sampled when its run is profiled.
+
+    Must run inside the node's span (i.e. be wrapped by `traced`). The
+    `starts` node creates the profiler for its run if the run asked for one,
+    and the `finishes` node stops it and adds the report to its update.
+    """
+
+    @functools.wraps(node)
+    def wrapper(state, config):
+        if not _active and not starts:
+            return node(state, config)
+        run = trace.get_current_span().get_span_context().trace_id
+        if starts and authorized(config):
+            with _active_lock:
+                for abandoned in [key for key, profiler in _active.items() if profiler.expired()]:
+                    _active.pop(abandoned).stop()
+                _active[run] = RunProfiler(float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005")))
+            metrics.increment("profiling.runs")
+        profiler = _active.get(run)
+        if profiler is None:
+            return node(state, config)
+
+        wall, cpu = time.perf_counter(), time.thread_time()
+        profiler.enter(name)
+        try:
+            update = node(state, config)
+        finally:
+            profiler.leave(name, time.perf_counter() - wall, time.thread_time() - cpu)
+        if finishes:
+            with _active_lock:
+                _active.pop(run, None)
+            report = profiler.stop()
+            report["artifact"] = write_artifact(run, report["flamegraph"])
+            trace.get_current_span().set_attribute("profile.wall_ms", report["wall_ms"])
+            if isinstance(update, dict):
+                update = {**update, "profile": report}
+        return update
+
+    return wrapper
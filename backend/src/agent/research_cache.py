@@ -0,0 +1,222 @@
+"""Per-restaurant, per-section cache of `web_research` results.
+
+The final answer is split into the six sections of `answer_instructions`, and
+they age at very different rates: a menu rarely changes while promotions turn
+over weekly. Each search query is classified into the section it serves and
+its result is cached under (restaurant, section) with that section's TTL, so a
+repeat lookup only re-searches the sections that have gone stale. The
+restaurant is identified by its normalised name and location, so the cache is
+shared by every conversation and turn that looks the same restaurant up.
+
+Each section is a Redis hash with one field per query, written with
+HSET + EXPIRE in one transaction, so parallel search branches of a run never
+drop each other's results. A second, capped copy of every section outlives its
+TTL (`stale_ttl`) so that, while the upstream model is failing,
+`web_research` can still serve the last known result instead of an error.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from agent.query_planner import parse_lookup
+from agent.sources import (
+    empty_sources,
+    merge_sources,
+    rebase_sources,
+    sources_from_segments,
+)
+from agent.tracing import span
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+SECTION_TTLS = {
+    "menu": 7 * DAY,
+    "pricing": 3 * DAY,
+    "reviews": DAY,
+    "updates": 6 * HOUR,
+    "dietary": 7 * DAY,
+    "others": HOUR,
+}
+
+# How long expired results are kept for the stale-while-error fallback
+STALE_TTL = 30 * DAY
+# Most recent results kept per section for that fallback
+STALE_MAX_ENTRIES = 8
+
+SECTION_KEYWORDS = {
+    "menu": ["menu", "dish", "dishes", "signature", "popular items", "best items", "must try", "must-try", "specialt", "food"],
+    "pricing": ["price", "pricing", "cost", "budget", "expensive", "cheap", "affordable", "$"],
+    "reviews": ["review", "rating", "feedback", "experience", "opinion", "recommend"],
+    "updates": ["promotion", "promo", "deal", "discount", "new ", "latest", "recent", "update", "news", "opening", "closing", "closed"],
+    "dietary": ["dietary", "allergen", "allergy", "vegan", "vegetarian", "halal", "gluten", "kosher", "nuts", "dairy"],
+}
+
+SHORT_URL_ID = re.compile(r"(https://vertexaisearch\.cloud\.google\.com/id/)\d+-")
+
+
+def classify_query(query: str) -> str:
+    """Return the answer section a search query mostly serves."""
+    text = f" {query.lower()} "
+    scores = {
+        section: sum(keyword in text for keyword in keywords)
+        for section, keywords in SECTION_KEYWORDS.items()
+    }
+    best = max(scores, key=scores.get)
+    return best if scores[best] else "others"
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase `text` and collapse punctuation and whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def restaurant_key(question: str) -> Optional[str]:
+    """Stable key for the restaurant a lookup question is about, or None.
+
+    Only questions `parse_lookup` recognises are about a single restaurant;
+    the key comes from its normalised name and location, not the wording.
+    """
+    lookup = parse_lookup(question)
+    if lookup is None:
+        return None
+    name, location = (normalize_name(part) for part in lookup)
+    return hashlib.sha1(f"{name}|{location}".encode()).hexdigest()[:16]
+
+
+def empty_result() -> Dict[str, Any]:
+    """Return a research result with nothing in it."""
+    return {"search_query": [], "web_research_result": [], "sources": empty_sources()}
+
+
+def result_sources(result: Dict[str, Any]):
+    """Source table of a cached result, converting entries cached as segment lists."""
+    if "sources" in result:
+        return result["sources"]
+    return sources_from_segments(result.get("sources_gathered") or [])
+
+
+def merge_results(*results: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine `web_research` outputs the way the state reducers would."""
+    merged = empty_result()
+    for result in results:
+        merged["search_query"].extend(result.get("search_query", []))
+        merged["web_research_result"].extend(result.get("web_research_result", []))
+        merged["sources"] = merge_sources(merged["sources"], result_sources(result))
+    return merged
+
+
+def rebase_result(result: Dict[str, Any], new_id: int) -> Dict[str, Any]:
+    """Rewrite a cached result's short URLs to a fresh search id.
+
+    Short URLs embed the id of the `web_research` branch that produced them,
+    so cached results from different runs could otherwise collide with each
+    other or with the branches of the current run.
+    """
+    replacement = rf"\g<1>{new_id}-"
+    return {
+        "search_query": list(result["search_query"]),
+        "web_research_result": [
+            SHORT_URL_ID.sub(replacement, text) for text in result["web_research_result"]
+        ],
+        "sources": rebase_sources(result_sources(result), new_id),
+    }
+
+
+class ResearchCache:
+    """Redis-backed store of research results keyed by restaurant and section."""
+
+    def __init__(
+        self,
+        client,
+        prefix: str = "research",
+        ttls: Optional[Dict[str, int]] = None,
+        stale_ttl: int = STALE_TTL,
+        stale_max_entries: int = STALE_MAX_ENTRIES,
+    ):
+        self._client = client
+        self._prefix = prefix
+        self.ttls = {**SECTION_TTLS, **(ttls or {})}
+        self.stale_ttl = stale_ttl
+        self.stale_max_entries = stale_max_entries
+
+    def _key(self, restaurant: str, section: str) -> str:
+        return f"{self._prefix}:{restaurant}:{section}"
+
+    def _stale_key(self, restaurant: str, section: str) -> str:
+        return f"{self._prefix}:stale:{restaurant}:{section}"
+
+    def get_sections(self, restaurant: str) -> Dict[str, List[Dict[str, list]]]:
+        """Return the fresh cached results of every section for a restaurant."""
+        sections = list(self.ttls)
+        try:
+            with span("research_cache.get_sections"):
+                pipe = self._client.pipeline(transaction=False)
+                for section in sections:
+                    pipe.hgetall(self._key(restaurant, section))
+                raw = pipe.execute()
+        except Exception as e:
+            logger.warning("Error reading research cache: %s", e)
+            return {}
+        fresh = {}
+        for section, entries in zip(sections, raw):
+            if entries:
+                fresh[section] = [json.loads(entries[query]) for query in sorted(entries)]
+        return fresh
+
+    def get_stale(self, restaurant: str, section: str) -> List[Dict[str, list]]:
+        """Return the last known results of a section, even if past their TTL."""
+        try:
+            with span("research_cache.get_stale", section=section):
+                values = self._client.lrange(self._stale_key(restaurant, section), 0, -1)
+        except Exception as e:
+            logger.warning("Error reading research cache: %s", e)
+            return []
+        # Oldest first, keeping only the latest result of each query
+        latest = {}
+        for value in values:
+            entry = json.loads(value)
+            latest.pop(json.dumps(entry["search_query"]), None)
+            latest[json.dumps(entry["search_query"])] = entry
+        return list(latest.values())
+
+    def add_result(self, restaurant: str, section: str, result: Dict[str, Any]) -> None:
+        """Store a `web_research` result in its section, resetting the section TTL.
+
+        The result replaces any earlier one for the same query. Both copies are
+        written in a single transaction, so concurrent branches don't race.
+        """
+        key = self._key(restaurant, section)
+        stale_key = self._stale_key(restaurant, section)
+        value = json.dumps(result)
+        try:
+            with span("research_cache.add_result", section=section):
+                pipe = self._client.pipeline(transaction=True)
+                pipe.hset(key, json.dumps(result["search_query"]), value)
+                pipe.expire(key, self.ttls.get(section, HOUR))
+                pipe.rpush(stale_key, value)
+                pipe.ltrim(stale_key, -self.stale_max_entries, -1)
+                pipe.expire(stale_key, self.stale_ttl)
+                pipe.execute()
+        except Exception as e:
+            logger.warning("Error writing research cache: %s", e)
+
+
+_research_cache: Optional[ResearchCache] = None
+
+
+def get_research_cache() -> ResearchCache:
+    """Shared cache instance so all nodes reuse one Redis connection pool."""
+    global _research_cache
+    if _research_cache is None:
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        _research_cache = ResearchCache(redis.Redis.from_url(redis_url))
+    return _research_cache
@@ -0,0 +1,199 @@
+"""Per-model circuit breakers and call timeouts for upstream Gemini calls.
+
+During a provider incident every call would otherwise run to its full
+timeout before failing. A breaker opens after consecutive failures so later
+calls fail immediately (letting callers fall back to stale cache entries),
+then lets a single probe through after a cool-down to detect recovery.
+
+Only errors that say the provider is unhealthy count towards opening a
+breaker: timeouts, transport errors and 5xx responses. A response that fails
+schema validation, or a 4xx, shows the provider is up.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from agent.load_control import depth_controller
+from agent.metrics import metrics
+from agent.request_profiler import bind
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose breaker is open."""
+
+
+class UpstreamTimeoutError(Exception):
+    """Raised when an upstream call exceeds its per-call timeout."""
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker.
+
+    Args:
+        failure_threshold: Consecutive failures that open the breaker.
+        reset_timeout: Seconds the breaker stays open before a probe call.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Check whether a call may go through, letting one probe out when half open."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Let another probe out after one that never reached the provider."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker past the threshold."""
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="upstream-call")
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error means the provider is unhealthy rather than the request bad.
+
+    Client libraries wrap the underlying error, so the whole cause chain is
+    checked.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, (OSError, httpx.TransportError)):
+            return True
+        code = getattr(current, "status_code", None) or getattr(current, "code", None)
+        if isinstance(code, int) and code >= 500:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+def get_breaker(model: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Return the shared breaker for a model, creating it on first use."""
+    with _breakers_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(failure_threshold, reset_timeout)
+        return _breakers[model]
+
+
+def guarded_call(
+    fn: Callable[[], T],
+    model: str,
+    timeout: float,
+    failure_threshold: int = 5,
+    reset_timeout: float = 30.0,
+) -> T:
+    """Run `fn` through the model's breaker with a per-call timeout.
+
+    `timeout` starts when the call begins running on the upstream pool, so
+    time spent queued behind other calls doesn't count against it. A call
+    that waits longer than `timeout` just to start is cancelled without
+    touching the breaker, since the provider never saw it. A call that is
+    already running can't be interrupted; it finishes in the background and
+    its result is discarded.
+
+    Raises:
+        CircuitOpenError: The breaker is open and the call was not attempted.
+        UpstreamTimeoutError: The call did not start, or did not return,
+            within `timeout`.
+    """
+    breaker = get_breaker(model, failure_threshold, reset_timeout)
+    if not breaker.allow():
+        metrics.increment("resilience.short_circuited")
+        raise CircuitOpenError(f"Circuit open for {model}")
+
+    started = threading.Event()
+    call = bind(fn)
+
+    def run() -> T:
+        started.set()
+        return call()
+
+    future = _executor.submit(run)
+    if not started.wait(timeout) and future.cancel():
+        breaker.release_probe()
+        metrics.increment("resilience.queue_timeouts")
+        raise UpstreamTimeoutError(f"{model} call waited over {timeout}s for a free worker")
+
+    began = time.monotonic()
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        breaker.record_failure()
+        depth_controller.record_upstream(timeout)
+        metrics.increment("resilience.timeouts")
+        raise UpstreamTimeoutError(f"{model} did not respond within {timeout}s")
+    except Exception as e:
+        depth_controller.record_upstream(time.monotonic() - began, e)
+        if is_upstream_failure(e):
+            breaker.record_failure()
+            metrics.increment("resilience.failures")
+        else:
+            breaker.record_success()
+            metrics.increment("resilience.request_errors")
+        raise
+    breaker.record_success()
+    depth_controller.record_upstream(time.monotonic() - began)
+    return result
+
+
+def breaker_report() -> dict:
+    """Summarize short-circuited calls and the state of each breaker."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {
+        "short_circuited": metrics.counter("resilience.short_circuited"),
+        "timeouts": metrics.counter("resilience.timeouts"),
+        "failures": metrics.counter("resilience.failures"),
+        "request_errors": metrics.counter("resilience.request_errors"),
+        "queue_timeouts": metrics.counter("resilience.queue_timeouts"),
+        "stale_served": metrics.counter("resilience.stale_served"),
+        "breakers": {
+            model: {"state": breaker.state, "failures": breaker.failures}
+            for model, breaker in breakers.items()
+        },
+    }
+
+
+metrics.register_report("resilience", breaker_report)
@@ -0,0 +1,137 @@
+"""Per-run interned source table.
+
+Every grounded `web_research` segment used to append its own
+`{label, short_url, value}` dict to `sources_gathered`. A URL cited by ten
+segments was therefore stored ten times, in every branch and loop, and
+`finalize_answer` scanned all of those dicts. The run now keeps a single table
+instead. Each distinct URL is stored once with its label. Citations refer to
+it by an integer ref, written in text as the existing short URL
+`.../id/{branch}-{index}` (ref = branch * REF_STRIDE + index). Parallel
+branches mint refs without coordinating, and `merge_sources` interns their
+tables when the `Send` results are reduced.
+
+Table layout (JSON / msgpack friendly):
+    {"urls": [url, ...], "labels": [label, ...], "refs": {ref: position in urls}}
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SHORT_URL_PREFIX = "https://vertexaisearch.cloud.google.com/id/"
+SHORT_URL = re.compile(r"https://vertexaisearch\.cloud\.google\.com/id/(\d+)-(\d+)")
+# Grounding responses carry far fewer chunks than this
+REF_STRIDE = 1000
+
+SourceTable = Dict[str, Any]
+
+
+def empty_sources() -> SourceTable:
+    """Return a source table with no sources."""
+    return {"urls": [], "labels": [], "refs": {}}
+
+
+def make_ref(branch: int, index: int) -> int:
+    """Pack a branch and a citation index into one reference number."""
+    return int(branch) * REF_STRIDE + int(index)
+
+
+def short_url(ref: int) -> str:
+    """Return the short citation URL of a reference."""
+    return f"{SHORT_URL_PREFIX}{ref // REF_STRIDE}-{ref % REF_STRIDE}"
+
+
+def parse_ref(url: Optional[str]) -> Optional[int]:
+    """Return the reference of a short citation URL, or None for other URLs."""
+    match = SHORT_URL.fullmatch(url or "")
+    return make_ref(match.group(1), match.group(2)) if match else None
+
+
+def intern_source(table: SourceTable, ref: int, url: str, label: str) -> None:
+    """Point `ref` at `url`, adding the URL to `table` if it is new. Mutates `table`."""
+    try:
+        position = table["urls"].index(url)
+    except ValueError:
+        position = len(table["urls"])
+        table["urls"].append(url)
+        table["labels"].append(label)
+    table["refs"][ref] = position
+
+
+def merge_sources(left: Optional[SourceTable], right: Optional[SourceTable]) -> SourceTable:
+    """State reducer: intern the URLs of `right` into a copy of `left`."""
+    if not right or not right.get("refs"):
+        return left or empty_sources()
+    if not left or not left.get("refs"):
+        # Refs read back from JSON (cache entries, API input) have string keys
+        return {**right, "refs": {int(ref): position for ref, position in right["refs"].items()}}
+    merged = {"urls": list(left["urls"]), "labels": list(left["labels"]), "refs": dict(left["refs"])}
+    positions = {url: position for position, url in enumerate(merged["urls"])}
+    remap = {}
+    for position, (url, label) in enumerate(zip(right["urls"], right["labels"])):
+        if url not in positions:
+            positions[url] = len(merged["urls"])
+            merged["urls"].append(url)
+            merged["labels"].append(label)
+        remap[position] = positions[url]
+    for ref, position in right["refs"].items():
+        merged["refs"][int(ref)] = remap[position]
+    return merged
+
+
+def sources_from_segments(segments: Iterable[Dict[str, Any]]) -> SourceTable:
+    """Table for citation segments in the `{label, short_url, value}` form."""
+    table = empty_sources()
+    for segment in segments:
+        ref = parse_ref(segment.get("short_url"))
+        if ref is not None and segment.get("value"):
+            intern_source(table, ref, segment["value"], segment.get("label") or "")
+    return table
+
+
+def cited_sources(table: SourceTable, texts: Iterable[str]) -> SourceTable:
+    """Copy of `table` with only the refs cited in `texts` and the URLs they use."""
+    cited = {
+        make_ref(match.group(1), match.group(2))
+        for text in texts
+        for match in SHORT_URL.finditer(text)
+    }
+    pruned = empty_sources()
+    positions: Dict[int, int] = {}
+    for ref, position in table.get("refs", {}).items():
+        if int(ref) not in cited:
+            continue
+        if position not in positions:
+            positions[position] = len(pruned["urls"])
+            pruned["urls"].append(table["urls"][position])
+            pruned["labels"].append(table["labels"][position])
+        pruned["refs"][int(ref)] = positions[position]
+    return pruned
+
+
+def rebase_sources(table: SourceTable, branch: int) -> SourceTable:
+    """Move every ref of `table` to `branch`, keeping its chunk index."""
+    return {
+        "urls": list(table["urls"]),
+        "labels": list(table["labels"]),
+        "refs": {make_ref(branch, int(ref) % REF_STRIDE): position for ref, position in table["refs"].items()},
+    }
+
+
+def resolve_citations(text: str, table: Optional[SourceTable]) -> Tuple[str, List[Dict[str, str]]]:
+    """Replace short URLs in `text` with their URLs and list the sources used.
+
+    Short URLs missing from the table are left as they are. Each URL is listed
+    once, in order of first citation.
+    """
+    refs = (table or {}).get("refs") or {}
+    used: Dict[int, Dict[str, str]] = {}
+
+    def to_url(match: re.Match) -> str:
+        position = refs.get(make_ref(match.group(1), match.group(2)))
+        if position is None:
+            return match.group(0)
+        url = table["urls"][position]
+        used.setdefault(position, {"label": table["labels"][position], "short_url": match.group(0), "value": url})
+        return url
+
+    return SHORT_URL.sub(to_url, text), list(used.values())
@@ -6,6 +6,9 @@ from typing import TypedDict
 from langgraph.graph import add_messages
 from typing_extensions import Annotated
 
+from agent.budget import add_usage
+from agent.sources import merge_sources
+
 
 import operator
 from dataclasses import dataclass, field
@@ -16,11 +19,20 @@ class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
     search_query: Annotated[list, operator.add]
     web_research_result: Annotated[list, operator.add]
+    sources: Annotated[dict, merge_sources]
     sources_gathered: Annotated[list, operator.add]
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
+    restaurant_key: str
+    research_context: str
+    research_depth: dict
+    profile: dict
+    usage: Annotated[dict, add_usage]
+    budget_exhausted: str
+    trace_root: str
+    trace_dispatch: str
 
 
 class ReflectionState(TypedDict):
@@ -29,6 +41,10 @@ class ReflectionState(TypedDict):
     follow_up_queries: Annotated[list, operator.add]
     research_loop_count: int
     number_of_ran_queries: int
+    max_research_loops: int
+    budget_exhausted: str
+    restaurant_key: str
+    trace_dispatch: str
 
 
 class Query(TypedDict):
@@ -38,11 +54,16 @@ class Query(TypedDict):
 
 class QueryGenerationState(TypedDict):
     query_list: list[Query]
+    search_query: Annotated[list, operator.add]
+    restaurant_key: str
+    trace_dispatch: str
 
 
 class WebSearchState(TypedDict):
     search_query: str
     id: str
+    restaurant_key: str
+    trace_parent: str
 
 
 @dataclass(kw_only=True)
@@ -21,3 +21,19 @@ class Reflection(BaseModel):
     follow_up_queries: List[str] = Field(
         description="A list of follow-up queries to address the knowledge gap."
     )
+
+
+class CascadeReflection(Reflection):
+    """Reflection from the cheap model, with a confidence to decide on escalation."""
+    confidence: float = Field(
+        ge=0.0,
+        le=1.0,
+        description="How confident you are in the is_sufficient decision, from 0 (guessing) to 1 (certain).",
+    )
+
+
+class BatchSummaries(BaseModel):
+    """One-sentence summaries of several previous answers."""
+    summaries: List[str] = Field(
+        description="One concise, one-sentence summary per answer, in the same order as the answers."
+    )
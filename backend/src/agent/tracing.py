@@ -0,0 +1,251 @@
+"""OpenTelemetry tracing for research runs.
+
+Each node, upstream model call and research cache operation gets a span.
+LangGraph runs `Send` branches as separate tasks, so the parent is carried in
+the state instead of relying on the current context alone:
+
+- `generate_query` picks the run's root context (the active span if the
+  caller opened one, otherwise one derived from the LangGraph run id) and
+  stores it as `trace_root`.
+- Nodes that dispatch `web_research` branches store their own span as
+  `trace_dispatch`; the edges copy it into each `Send` as `trace_parent`.
+
+Spans are exported according to `OTEL_TRACES_EXPORTER`: "otlp" (configured by
+the standard `OTEL_EXPORTER_OTLP_*` variables), "file" (JSON lines written to
+`OTEL_TRACES_FILE`, for offline work), "console", or unset to disable.
+Render a file export as per-run waterfalls with:
+
+    python -m agent.tracing traces.jsonl
+"""
+
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+tracer = trace.get_tracer("agent")
+_propagator = TraceContextTextMapPropagator()
+_setup_lock = threading.Lock()
+_configured = False
+
+
+class FileSpanExporter:
+    """Append finished spans to a file as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Any]):
+        """Write finished spans to the file."""
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            for span in spans:
+                handle.write(json.dumps(json.loads(span.to_json())) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        """Nothing to release; the file is opened per export."""
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Nothing is buffered, so there is nothing to flush."""
+        return True
+
+
+def setup_tracing(exporter=None) -> bool:
+    """Install a tracer provider once, from `exporter` or the environment.
+
+    Returns whether spans are being exported. A provider installed by the
+    host process is left alone.
+    """
+    global _configured
+    with _setup_lock:
+        if _configured:
+            return True
+        if exporter is None:
+            kind = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+            if kind == "otlp":
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                    OTLPSpanExporter,
+                )
+
+                exporter = OTLPSpanExporter()
+            elif kind == "file":
+                exporter = FileSpanExporter(os.getenv("OTEL_TRACES_FILE", "traces.jsonl"))
+            elif kind == "console":
+                from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+                exporter = ConsoleSpanExporter()
+            else:
+                return False
+
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            SimpleSpanProcessor,
+        )
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "savour-agent")})
+        )
+        # File and in-memory exporters are cheap enough to export synchronously
+        processor = BatchSpanProcessor if exporter.__class__.__name__ == "OTLPSpanExporter" else SimpleSpanProcessor
+        provider.add_span_processor(processor(exporter))
+        trace.set_tracer_provider(provider)
+        _configured = True
+        return True
+
+
+def format_context(span: trace.Span) -> str:
+    """Return the W3C `traceparent` of `span`."""
+    carrier: Dict[str, str] = {}
+    _propagator.inject(carrier, context=trace.set_span_in_context(span))
+    return carrier.get("traceparent", "")
+
+
+def parse_context(traceparent: Optional[str]) -> Optional[otel_context.Context]:
+    """Return the context of a W3C `traceparent`, or None without one."""
+    if not traceparent:
+        return None
+    return _propagator.extract({"traceparent": traceparent})
+
+
+def _remote_context(trace_id: int, span_id: int) -> otel_context.Context:
+    span_context = SpanContext(
+        trace_id=trace_id,
+        span_id=span_id or 1,
+        is_remote=True,
+        trace_flags=TraceFlags(TraceFlags.SAMPLED),
+    )
+    return trace.set_span_in_context(NonRecordingSpan(span_context))
+
+
+def run_root_context(config: Optional[Dict[str, Any]]) -> otel_context.Context:
+    """Parent for the spans of one run.
+
+    The active span when the caller traces the invocation itself, otherwise a
+    context derived from the run id so all nodes of a run share one trace.
+    """
+    current = trace.get_current_span()
+    if current.get_span_context().is_valid:
+        return trace.set_span_in_context(current)
+
+    config = config or {}
+    run_id = (
+        (config.get("metadata") or {}).get("run_id")
+        or (config.get("configurable") or {}).get("run_id")
+        or config.get("run_id")
+    )
+    try:
+        trace_id = uuid.UUID(str(run_id)).int if run_id else random.getrandbits(128)
+    except ValueError:
+        trace_id = uuid.uuid5(uuid.NAMESPACE_OID, str(run_id)).int
+    return _remote_context(trace_id, trace_id & ((1 << 64) - 1))
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[trace.Span]:
+    """Child span of the current context; None-valued attributes are skipped."""
+    with tracer.start_as_current_span(
+        name, attributes={k: v for k, v in attributes.items() if v is not None}
+    ) as current:
+        yield current
+
+
+def traced(name: str, node: Callable, dispatches: bool = False) -> Callable:
+    """Wrap a `(state, config)` node in a span parented as described above.
+
+    With `dispatches`, the node's span is returned as `trace_dispatch` so the
+    `Send` branches it leads to become its children.
+    """
+
+    @functools.wraps(node)
+    def wrapper(state, config):
+        if name == "generate_query":
+            parent = run_root_context(config)
+        else:
+            parent = (
+                parse_context(state.get("trace_parent"))
+                or parse_context(state.get("trace_root"))
+                or run_root_context(config)
+            )
+        attributes = {
+            "langgraph.node": name,
+            "research.loop": state.get("research_loop_count"),
+            "research.search_query": state.get("search_query") if isinstance(state.get("search_query"), str) else None,
+            "research.branch_id": state.get("id"),
+        }
+        with tracer.start_as_current_span(
+            name,
+            context=parent,
+            attributes={k: v for k, v in attributes.items() if v is not None},
+        ) as current:
+            update = node(state, config)
+            if isinstance(update, dict):
+                if name == "generate_query":
+                    root_span = trace.get_current_span(parent)
+                    update = {**update, "trace_root": format_context(root_span)}
+                if dispatches:
+                    update = {**update, "trace_dispatch": format_context(current)}
+            return update
+
+    return wrapper
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Read the spans a `FileSpanExporter` wrote."""
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def render_waterfall(spans: List[Dict[str, Any]], width: int = 60) -> str:
+    """Text waterfall of spans exported by `FileSpanExporter`, one block per trace."""
+    from datetime import datetime
+
+    def timestamp(value: str) -> float:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for item in spans:
+        traces.setdefault(item["context"]["trace_id"], []).append(item)
+
+    lines = []
+    for trace_id, items in traces.items():
+        by_id = {item["context"]["span_id"]: item for item in items}
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for item in items:
+            parent = item.get("parent_id")
+            children.setdefault(parent if parent in by_id else None, []).append(item)
+        start = min(timestamp(item["start_time"]) for item in items)
+        end = max(timestamp(item["end_time"]) for item in items)
+        scale = width / max(end - start, 1e-9)
+        lines.append(f"trace {trace_id} ({(end - start) * 1000:.0f} ms)")
+
+        def walk(parent: Optional[str], depth: int) -> None:
+            for item in sorted(children.get(parent, []), key=lambda s: s["start_time"]):
+                begin, finish = timestamp(item["start_time"]), timestamp(item["end_time"])
+                offset = int((begin - start) * scale)
+                bar = "#" * max(1, int((finish - begin) * scale))
+                label = ("  " * depth + item["name"])[:32]
+                lines.append(f"  {label:<32} {' ' * offset}{bar} {(finish - begin) * 1000:.0f} ms")
+                walk(item["context"]["span_id"], depth + 1)
+
+        walk(None, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(render_waterfall(load_spans(sys.argv[1] if len(sys.argv) > 1 else "traces.jsonl")))  # noqa: T201
@@ -0,0 +1,315 @@
+"""In-process approximate nearest neighbour search over restaurant embeddings.
+
+The `match_documents` SQL function filters on the cosine distance itself, which
+prevents Postgres from using an index and forces a sequential scan. This module
+keeps the embeddings in a compact quantized NumPy matrix partitioned by an IVF
+(inverted file) coarse quantizer so a query only scans a few partitions.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple
+
+import numpy as np
+
+Quantization = Literal["int8", "float16"]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows so that a dot product is the cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray, quantization: Quantization) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize normalised vectors, returning the codes and per-row scales."""
+    if quantization == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    max_abs = np.abs(vectors).max(axis=1)
+    max_abs[max_abs == 0] = 1.0
+    scales = (max_abs / 127.0).astype(np.float32)
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _kmeans(data: np.ndarray, n_clusters: int, n_iter: int, seed: int) -> np.ndarray:
+    """Spherical k-means used to train the IVF centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        empty = counts == 0
+        # Re-seed empty clusters so every list stays usable
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class _InvertedList:
+    """Growable storage for the quantized vectors assigned to one centroid."""
+
+    def __init__(self, dim: int, dtype: np.dtype, capacity: int = 64):
+        self.codes = np.empty((capacity, dim), dtype=dtype)
+        self.scales = np.empty(capacity, dtype=np.float32)
+        self.rows = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def extend(self, codes: np.ndarray, scales: np.ndarray, rows: np.ndarray) -> None:
+        needed = self.size + len(codes)
+        if needed > len(self.codes):
+            capacity = max(needed, 2 * len(self.codes))
+            self.codes = np.resize(self.codes, (capacity, self.codes.shape[1]))
+            self.scales = np.resize(self.scales, capacity)
+            self.rows = np.resize(self.rows, capacity)
+        self.codes[self.size:needed] = codes
+        self.scales[self.size:needed] = scales
+        self.rows[self.size:needed] = rows
+        self.size = needed
+
+
+class VectorIndex:
+    """IVF index over quantized, L2-normalised embeddings.
+
+    Vectors are scanned exactly until `min_train_size` vectors have been added,
+    at which point the coarse quantizer is trained and every vector is moved
+    into its inverted list. Later inserts are assigned to the nearest centroid
+    incrementally, so the index never needs a full rebuild to stay queryable.
+
+    Args:
+        dim: Embedding dimension (1536 for `text-embedding-3-small`).
+        quantization: Storage format of the vectors, "int8" or "float16".
+        n_lists: Number of IVF partitions. Defaults to ~sqrt(N) at train time.
+        n_probe: Number of partitions scanned per query.
+        min_train_size: Number of vectors required before the IVF is trained.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        quantization: Quantization = "int8",
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        min_train_size: int = 4096,
+        seed: int = 0,
+    ):
+        if quantization not in ("int8", "float16"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.dim = dim
+        self.quantization = quantization
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._dtype = np.dtype(np.int8 if quantization == "int8" else np.float16)
+        self._flat = _InvertedList(dim, self._dtype)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[_InvertedList] = []
+        self._deleted: set = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Count the vectors that haven't been deleted."""
+        return len(self.ids) - len(self._deleted)
+
+    @property
+    def is_trained(self) -> bool:
+        """Check whether the coarse quantizer has been trained."""
+        return self._centroids is not None
+
+    def add(
+        self,
+        ids: Iterable[str],
+        embeddings: Any,
+        metadata: Optional[Iterable[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """Insert or replace vectors.
+
+        Re-adding an existing id tombstones the previous row, so updated
+        embeddings for a restaurant interaction simply supersede the old one.
+        """
+        ids = [str(i) for i in ids]
+        vectors = _normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(
+                f"Expected embeddings of shape ({len(ids)}, {self.dim}), got {vectors.shape}"
+            )
+        metadata = list(metadata) if metadata is not None else [None] * len(ids)
+        codes, scales = _quantize(vectors, self.quantization)
+
+        with self._lock:
+            start = len(self.ids)
+            for offset, (item_id, meta) in enumerate(zip(ids, metadata)):
+                previous = self._row_by_id.get(item_id)
+                if previous is not None:
+                    self._deleted.add(previous)
+                self._row_by_id[item_id] = start + offset
+                self.ids.append(item_id)
+                self.metadata.append(meta or {})
+            rows = np.arange(start, start + len(ids), dtype=np.int64)
+
+            if self.is_trained:
+                self._assign(vectors, codes, scales, rows)
+            else:
+                self._flat.extend(codes, scales, rows)
+                if self._flat.size >= self.min_train_size:
+                    self.train()
+
+    def remove(self, item_id: str) -> bool:
+        """Tombstone a vector so it is no longer returned by `search`."""
+        with self._lock:
+            row = self._row_by_id.pop(str(item_id), None)
+            if row is None:
+                return False
+            self._deleted.add(row)
+            return True
+
+    def train(self, n_iter: int = 10) -> None:
+        """Train the IVF centroids on the stored vectors and partition them.
+
+        Can be called again once the index has grown well past its training
+        size to rebalance the lists; tombstoned rows are dropped in the process.
+        """
+        with self._lock:
+            rows, codes, scales = self._live_rows()
+            if not rows:
+                return
+            rows = np.asarray(rows, dtype=np.int64)
+            vectors = self._decode(codes, scales)
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(rows))))
+            n_lists = min(n_lists, len(rows))
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(len(rows), n_lists * 40)
+            sample = vectors[rng.choice(len(rows), size=sample_size, replace=False)]
+            self._centroids = _kmeans(sample, n_lists, n_iter, self.seed)
+            self._lists = [_InvertedList(self.dim, self._dtype) for _ in range(n_lists)]
+            self._assign(vectors, codes, scales, rows)
+            self._flat = _InvertedList(self.dim, self._dtype)
+
+    def search(
+        self,
+        query_embedding: Any,
+        match_count: int = 10,
+        match_threshold: float = -1.0,
+        n_probe: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the closest vectors by cosine similarity.
+
+        Mirrors `match_documents`: results below `match_threshold` are dropped
+        and at most `match_count` rows are returned, most similar first.
+        """
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Expected a query of dimension {self.dim}, got {query.shape[0]}")
+
+        with self._lock:
+            if self.is_trained:
+                probe = min(n_probe or self.n_probe, len(self._lists))
+                nearest = np.argpartition(-(self._centroids @ query), probe - 1)[:probe]
+                candidates = [self._lists[i] for i in nearest if self._lists[i].size]
+            else:
+                candidates = [self._flat] if self._flat.size else []
+
+            scored_rows = []
+            scored_values = []
+            for inverted_list in candidates:
+                size = inverted_list.size
+                scores = (inverted_list.codes[:size] @ query) * inverted_list.scales[:size]
+                scored_rows.append(inverted_list.rows[:size])
+                scored_values.append(scores)
+            if not scored_rows:
+                return []
+            rows = np.concatenate(scored_rows)
+            scores = np.concatenate(scored_values)
+
+            if self._deleted:
+                live = ~np.isin(rows, np.fromiter(self._deleted, dtype=np.int64))
+                rows, scores = rows[live], scores[live]
+            keep = scores > match_threshold
+            rows, scores = rows[keep], scores[keep]
+            if len(rows) > match_count:
+                top = np.argpartition(-scores, match_count - 1)[:match_count]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores)
+
+            return [
+                {
+                    **self.metadata[rows[i]],
+                    "id": self.ids[rows[i]],
+                    "similarity": float(scores[i]),
+                }
+                for i in order
+            ]
+
+    def save(self, path: str) -> None:
+        """Persist the raw quantized vectors to an `.npz` file."""
+        with self._lock:
+            rows, codes, scales = self._live_rows()
+            np.savez(
+                path,
+                ids=np.array([self.ids[r] for r in rows], dtype=object),
+                metadata=np.array([self.metadata[r] for r in rows], dtype=object),
+                codes=codes,
+                scales=scales,
+            )
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> "VectorIndex":
+        """Rebuild an index from a file written by `save`."""
+        data = np.load(path, allow_pickle=True)
+        codes = data["codes"]
+        quantization = "int8" if codes.dtype == np.int8 else "float16"
+        index = cls(dim=codes.shape[1], quantization=quantization, **kwargs)
+        vectors = index._decode(codes, data["scales"])
+        index.add(list(data["ids"]), vectors, list(data["metadata"]))
+        return index
+
+    def _assign(self, vectors: np.ndarray, codes: np.ndarray, scales: np.ndarray, rows: np.ndarray) -> None:
+        assignment = np.argmax(vectors @ self._centroids.T, axis=1)
+        for list_id in np.unique(assignment):
+            mask = assignment == list_id
+            self._lists[list_id].extend(codes[mask], scales[mask], rows[mask])
+
+    def _decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * scales[:, None]
+
+    def _live_rows(self) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        storages = self._lists if self.is_trained else [self._flat]
+        deleted = np.fromiter(self._deleted, dtype=np.int64)
+        rows, codes, scales = [], [], []
+        for storage in storages:
+            live = ~np.isin(storage.rows[:storage.size], deleted)
+            rows.append(storage.rows[:storage.size][live])
+            codes.append(storage.codes[:storage.size][live])
+            scales.append(storage.scales[:storage.size][live])
+        return (
+            np.concatenate(rows).tolist(),
+            np.concatenate(codes).reshape(-1, self.dim),
+            np.concatenate(scales),
+        )
+
+def brute_force_search(
+    matrix: np.ndarray,
+    query_embedding: Any,
+    match_count: int = 10,
+    match_threshold: float = -1.0,
+) -> List[Tuple[int, float]]:
+    """Exact cosine search over a float32 matrix, used as the recall baseline.
+
+    The rows of `matrix` are expected to be L2-normalised already.
+    """
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+    scores = matrix @ query
+    candidates = np.nonzero(scores > match_threshold)[0]
+    if len(candidates) > match_count:
+        top = np.argpartition(-scores[candidates], match_count - 1)[:match_count]
+        candidates = candidates[top]
+    order = candidates[np.argsort(-scores[candidates])]
+    return [(int(i), float(scores[i])) for i in order]
@@ -0,0 +1,130 @@
+"""Research worker pool consuming jobs from the `JobQueue`.
+
+Run one or more worker processes next to the API, scaling each
+independently:
+
+    python -m agent.worker --concurrency 4
+"""
+
+import argparse
+import logging
+import os
+import socket
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import HumanMessage
+
+from agent.jobs import JobQueue, get_job_queue, get_prefetch_queue
+from agent.metrics import metrics
+from agent.tracing import setup_tracing, span
+
+logger = logging.getLogger(__name__)
+
+
+def run_research(graph, topic: str, configurable: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the graph for one topic and return the serialisable answer."""
+    state = graph.invoke(
+        {"messages": [HumanMessage(content=topic)]},
+        {"configurable": configurable},
+    )
+    return {
+        "answer": state["messages"][-1].content,
+        "sources_gathered": state.get("sources_gathered", []),
+        "research_depth": state.get("research_depth"),
+        "usage": state.get("usage"),
+    }
+
+
+def run_worker(
+    queue: JobQueue,
+    graph,
+    consumer: str,
+    stop: threading.Event,
+    block_ms: int = 5000,
+    background: Optional[JobQueue] = None,
+) -> None:
+    """Claim, run and acknowledge jobs until `stop` is set.
+
+    With a `background` queue (prefetch runs), its jobs are only claimed when
+    `queue` has none waiting, and the wait for them is kept short so new
+    interactive jobs are picked up promptly.
+    """
+    while not stop.is_set():
+        source = queue
+        try:
+            if background is None:
+                jobs = queue.claim(consumer, count=1, block_ms=block_ms)
+            else:
+                jobs = queue.claim(consumer, count=1, block_ms=None)
+                if not jobs:
+                    source = background
+                    jobs = background.claim(consumer, count=1, block_ms=min(block_ms, 1000))
+        except Exception as e:
+            logger.warning("Error claiming research jobs: %s", e)
+            stop.wait(1.0)
+            continue
+        _run_jobs(source, graph, jobs, consumer)
+
+
+def _run_jobs(queue: JobQueue, graph, jobs, consumer: str) -> None:
+    for entry_id, job_id, payload in jobs:
+        try:
+            with metrics.timer("jobs.run_seconds"), span("research_job", job_id=job_id), \
+                    queue.heartbeat(consumer, entry_id):
+                result = run_research(graph, payload["topic"], payload["configurable"])
+        except Exception as e:
+            logger.warning("Error running research job %s: %s", job_id, e)
+            metrics.increment("jobs.failed_attempts")
+            queue.fail(entry_id, job_id, str(e))
+        else:
+            metrics.increment("jobs.completed")
+            queue.complete(entry_id, job_id, result)
+
+
+def start_workers(
+    queue: JobQueue,
+    graph=None,
+    concurrency: int = 1,
+    name: Optional[str] = None,
+    background: Optional[JobQueue] = None,
+) -> threading.Event:
+    """Start daemon worker threads and return the event that stops them."""
+    if graph is None:
+        from agent.graph import graph
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    stop = threading.Event()
+    for index in range(concurrency):
+        threading.Thread(
+            target=run_worker,
+            args=(queue, graph, f"{name}-{index}", stop),
+            kwargs={"background": background},
+            name=f"research-worker-{index}",
+            daemon=True,
+        ).start()
+    return stop
+
+
+def main() -> None:
+    """Run the worker until interrupted."""
+    parser = argparse.ArgumentParser(description="Consume research jobs from Redis.")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOB_WORKER_CONCURRENCY", "2")))
+    parser.add_argument("--name", default=None, help="Consumer name prefix (defaults to host-pid)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    setup_tracing()
+
+    stop = start_workers(
+        get_job_queue(),
+        concurrency=args.concurrency,
+        name=args.name,
+        background=get_prefetch_queue(),
+    )
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
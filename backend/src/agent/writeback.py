@@ -0,0 +1,412 @@
+"""Bulk write-back of research summaries and embeddings to Supabase.
+
+The mobile app fills `summary` and `embedding` on `user_restaurant_interactions`
+one row at a time, with a chat call and an embedding call per interaction.
+This pipeline takes finalized research answers instead, buffers them in a
+bounded queue (callers are told to back off when it is full), writes a
+one-sentence summary per answer with one model call per batch, embeds the
+summaries through the batched `EmbeddingService`, and fills each batch into
+the app's existing rows with COPY into a temporary table followed by a single
+`UPDATE ... FROM`. Rows are never inserted: an answer fills the row named by
+its `interaction_id`, or else every row the user has for the restaurant, and
+only rows owned by the answer's user are touched. A retried batch rewrites
+the same rows.
+
+Answers arrive from `POST /writeback`, which only accepts them for the
+authenticated user, and from `finalize_answer`, which queues the answer of
+every authenticated run about a single restaurant.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import redis
+
+from agent.embeddings import EmbeddingService, get_embedding_service
+from agent.metrics import metrics
+from agent.query_planner import parse_lookup
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_LINK = re.compile(r"\s*\[([^\]]*)\]\([^)]*\)")
+
+# answers -> one summary per answer
+Summarize = Callable[[List[str]], List[str]]
+
+
+@dataclass
+class WritebackItem:
+    """A finalized research answer to store against a user's interactions.
+
+    `interaction_id` targets one existing row; without it the answer fills
+    every row the user has for the restaurant, matching the name exactly and
+    the address by containment (both ignoring case).
+    """
+
+    user_id: str
+    restaurant_name: str
+    answer: str
+    restaurant_address: Optional[str] = None
+    interaction_id: Optional[str] = None
+
+    def key(self) -> tuple:
+        """Key of the rows this item fills, for de-duplicating a batch."""
+        if self.interaction_id:
+            return (self.user_id, self.interaction_id)
+        return (self.user_id, self.restaurant_name.casefold(), (self.restaurant_address or "").casefold())
+
+    def matches(self, row: Dict[str, Any]) -> bool:
+        """Whether this item fills `row`, as `PostgresWriter.update` decides it."""
+        if row["user_id"] != self.user_id:
+            return False
+        if self.interaction_id:
+            return row["id"] == self.interaction_id
+        return row["restaurant_name"].casefold() == self.restaurant_name.casefold() and (
+            not self.restaurant_address
+            or self.restaurant_address.casefold() in (row.get("restaurant_address") or "").casefold()
+        )
+
+
+def extractive_summary(answer: str, max_chars: int = 300) -> str:
+    """First informative sentence of an answer, without headings or links."""
+    for line in answer.splitlines():
+        text = MARKDOWN_LINK.sub("", line).strip(" -*#\t")
+        if not text or line.lstrip().startswith("#") or text.lower().startswith("no information found"):
+            continue
+        sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        return sentence[:max_chars]
+    return ""
+
+
+def gemini_summarizer(model: str) -> Summarize:
+    """Summarise a batch of answers in one structured-output call."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from agent.prompts import writeback_summary_instructions
+    from agent.tools_and_schemas import BatchSummaries
+
+    llm = ChatGoogleGenerativeAI(
+        model=model,
+        temperature=0,
+        max_retries=2,
+        api_key=os.getenv("GEMINI_API_KEY"),
+    ).with_structured_output(BatchSummaries)
+
+    def summarize(answers: List[str]) -> List[str]:
+        numbered = "\n\n".join(
+            f"Answer {index + 1}:\n{MARKDOWN_LINK.sub('', answer)}" for index, answer in enumerate(answers)
+        )
+        result = llm.invoke(writeback_summary_instructions.format(count=len(answers), answers=numbered))
+        return result.summaries
+
+    return summarize
+
+
+class PostgresWriter:
+    """Fills `summary` and `embedding` on `user_restaurant_interactions` with COPY.
+
+    Args:
+        dsn: Postgres connection string (the Supabase database URL, or a
+            local Postgres with the migrations applied).
+        table: Target table.
+    """
+
+    COLUMNS = ("interaction_id", "user_id", "restaurant_name", "restaurant_address", "summary", "embedding")
+
+    def __init__(self, dsn: str, table: str = "public.user_restaurant_interactions"):
+        """Create a writer; the connection is opened on first use."""
+        self.dsn = dsn
+        self.table = table
+        self._conn = None
+
+    def _connection(self):
+        import psycopg
+
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg.connect(self.dsn)
+        return self._conn
+
+    def update(self, rows: List[Dict[str, Any]]) -> int:
+        """Fill the rows matched by `rows` in one transaction; returns the number updated."""
+        columns = ", ".join(self.COLUMNS)
+        conn = self._connection()
+        try:
+            with conn.transaction(), conn.cursor() as cursor:
+                cursor.execute(
+                    "CREATE TEMP TABLE writeback_rows (interaction_id uuid, user_id uuid, "
+                    "restaurant_name text, restaurant_address text, summary text, embedding text) ON COMMIT DROP"
+                )
+                with cursor.copy(f"COPY writeback_rows ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row([
+                            json.dumps(row[column]) if column == "embedding" else row[column]
+                            for column in self.COLUMNS
+                        ])
+                cursor.execute(
+                    f"UPDATE {self.table} AS t SET summary = w.summary, embedding = w.embedding::vector "
+                    f"FROM writeback_rows AS w "
+                    f"WHERE t.user_id = w.user_id AND CASE WHEN w.interaction_id IS NOT NULL "
+                    f"THEN t.id = w.interaction_id "
+                    f"ELSE lower(t.restaurant_name) = lower(w.restaurant_name) AND (w.restaurant_address IS NULL "
+                    f"OR strpos(lower(t.restaurant_address), lower(w.restaurant_address)) > 0) END"
+                )
+                return cursor.rowcount
+        except Exception:
+            # Drop a broken connection so the retry reconnects
+            conn.close()
+            raise
+
+
+class InMemoryWriter:
+    """Stand-in for `PostgresWriter` that keeps interaction rows in a dict keyed by id.
+
+    Like the Postgres update, only existing rows owned by the answer's user
+    are filled.
+    """
+
+    def __init__(self):
+        """Create an empty table."""
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.batches: List[int] = []
+
+    def update(self, rows: List[Dict[str, Any]]) -> int:
+        """Fill the rows matched by `rows` and return the number updated."""
+        updated = set()
+        for row in rows:
+            item = WritebackItem(
+                user_id=row["user_id"],
+                restaurant_name=row["restaurant_name"],
+                answer="",
+                restaurant_address=row["restaurant_address"],
+                interaction_id=row["interaction_id"],
+            )
+            for existing in self.rows.values():
+                if item.matches(existing):
+                    existing.update(summary=row["summary"], embedding=row["embedding"])
+                    updated.add(existing["id"])
+        self.batches.append(len(rows))
+        return len(updated)
+
+
+class WritebackPipeline:
+    """Bounded queue of answers flushed in batches by a background thread.
+
+    Args:
+        writer: `PostgresWriter` or `InMemoryWriter`.
+        embeddings: Service used to embed the summaries in bulk.
+        summarize: Batch summarizer; falls back to `extractive_summary`.
+        batch_size: Items written per batch.
+        max_pending: Items buffered before `submit` starts refusing work.
+        flush_interval: Seconds a partial batch waits before being written.
+        max_attempts: Attempts per batch before its rows are dropped.
+        retry_backoff: Base delay in seconds between attempts, doubled each time.
+    """
+
+    def __init__(
+        self,
+        writer,
+        embeddings: EmbeddingService,
+        summarize: Optional[Summarize] = None,
+        batch_size: int = 64,
+        max_pending: int = 1000,
+        flush_interval: float = 2.0,
+        max_attempts: int = 5,
+        retry_backoff: float = 0.5,
+    ):
+        """Create a stopped pipeline; call `start` to flush in the background."""
+        self.writer = writer
+        self.embeddings = embeddings
+        self.summarize = summarize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: queue.Queue[WritebackItem] = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        """Items waiting to be written."""
+        return self._queue.qsize()
+
+    def submit(self, item: WritebackItem, timeout: float = 0.0) -> bool:
+        """Queue an item; returns False when the buffer stays full for `timeout`."""
+        try:
+            self._queue.put(item, timeout=timeout) if timeout else self._queue.put_nowait(item)
+        except queue.Full:
+            metrics.increment("writeback.rejected")
+            return False
+        return True
+
+    def start(self) -> "WritebackPipeline":
+        """Start the background flush thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="writeback", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the background thread and write whatever is still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def flush(self) -> int:
+        """Write everything currently queued; returns the number of rows filled."""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self.process_batch(batch)
+
+    def _drain(self, limit: int) -> List[WritebackItem]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and time.monotonic() < deadline:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self.process_batch(batch)
+
+    def _summaries(self, answers: List[str]) -> List[str]:
+        if self.summarize is not None:
+            try:
+                summaries = self.summarize(answers)
+                if len(summaries) == len(answers) and all(summaries):
+                    return [summary.strip() for summary in summaries]
+                logger.warning("Batch summarizer returned the wrong number of summaries")
+            except Exception as e:
+                logger.warning("Error summarizing write-back batch: %s", e)
+            metrics.increment("writeback.summary_fallbacks")
+        return [extractive_summary(answer) for answer in answers]
+
+    def process_batch(self, items: List[WritebackItem]) -> int:
+        """Summarise, embed and write one batch, retrying failed writes.
+
+        Returns the number of existing rows filled.
+        """
+        # Later answers for the same rows win
+        latest = {item.key(): item for item in items}
+        items = list(latest.values())
+        summaries = self._summaries([item.answer for item in items])
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with metrics.timer("writeback.batch_seconds"):
+                    vectors = self.embeddings.embed(summaries)
+                    rows = [
+                        {
+                            "interaction_id": item.interaction_id,
+                            "user_id": item.user_id,
+                            "restaurant_name": item.restaurant_name,
+                            "restaurant_address": item.restaurant_address,
+                            "summary": summary,
+                            "embedding": [float(value) for value in vector],
+                        }
+                        for item, summary, vector in zip(items, summaries, vectors)
+                    ]
+                    written = self.writer.update(rows)
+            except Exception as e:
+                logger.warning("Error writing back batch (attempt %d): %s", attempt, e)
+                metrics.increment("writeback.retries")
+                if attempt < self.max_attempts:
+                    time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                continue
+            metrics.increment("writeback.batches")
+            metrics.increment("writeback.rows", written)
+            return written
+
+        metrics.increment("writeback.failed_rows", len(items))
+        return 0
+
+
+def writeback_report() -> dict:
+    """Write-back throughput, retries and failures since start."""
+    return {
+        "batches": metrics.counter("writeback.batches"),
+        "rows": metrics.counter("writeback.rows"),
+        "retries": metrics.counter("writeback.retries"),
+        "failed_rows": metrics.counter("writeback.failed_rows"),
+        "rejected": metrics.counter("writeback.rejected"),
+        "summary_fallbacks": metrics.counter("writeback.summary_fallbacks"),
+        "mean_batch_seconds": metrics.mean("writeback.batch_seconds"),
+    }
+
+
+metrics.register_report("writeback", writeback_report)
+
+
+def pipeline_from_env(embeddings: EmbeddingService) -> Optional[WritebackPipeline]:
+    """Pipeline writing to `WRITEBACK_DATABASE_URL`, or None if it isn't set.
+
+    `WRITEBACK_DATABASE_URL=memory` keeps rows in process, for local runs.
+    """
+    dsn = os.getenv("WRITEBACK_DATABASE_URL")
+    if not dsn:
+        return None
+    writer = InMemoryWriter() if dsn == "memory" else PostgresWriter(dsn)
+    return WritebackPipeline(
+        writer,
+        embeddings,
+        summarize=gemini_summarizer(os.getenv("WRITEBACK_SUMMARY_MODEL", "gemini-2.0-flash-lite")),
+        batch_size=int(os.getenv("WRITEBACK_BATCH_SIZE", "64")),
+        max_pending=int(os.getenv("WRITEBACK_MAX_PENDING", "1000")),
+        flush_interval=float(os.getenv("WRITEBACK_FLUSH_SECONDS", "2")),
+    ).start()
+
+
+_writeback_pipeline: Optional[WritebackPipeline] = None
+_writeback_lock = threading.Lock()
+
+
+def get_writeback_pipeline() -> Optional[WritebackPipeline]:
+    """Pipeline shared by the HTTP route and the graph, or None if not configured."""
+    global _writeback_pipeline
+    with _writeback_lock:
+        if _writeback_pipeline is None and os.getenv("WRITEBACK_DATABASE_URL"):
+            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            _writeback_pipeline = pipeline_from_env(get_embedding_service(redis.Redis.from_url(redis_url)))
+            metrics.gauge("writeback.pending", lambda: _writeback_pipeline.pending)
+    return _writeback_pipeline
+
+
+def queue_answer(user_id: Optional[str], research_topic: str, answer: str) -> bool:
+    """Queue a run's final answer against the user's interactions with the restaurant.
+
+    Only runs with an authenticated user about a single restaurant are queued;
+    the restaurant comes from the topic, as parsed for the lookup fast path.
+    """
+    pipeline = get_writeback_pipeline()
+    lookup = parse_lookup(research_topic)
+    if pipeline is None or not user_id or lookup is None:
+        return False
+    name, location = lookup
+    return pipeline.submit(
+        WritebackItem(user_id=user_id, restaurant_name=name, restaurant_address=location or None, answer=answer)
+    )
@@ -0,0 +1,76 @@
+import threading
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the research cache uses.
+
+    Values are stored encoded, like redis-py returns them. TTLs are recorded
+    but never expire on their own; `expire_fresh` drops every non-stale key.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        with self.lock:
+            self.store[key] = value.encode()
+            self.ttls[key] = ttl
+
+    def expire(self, key, ttl):
+        with self.lock:
+            if key in self.store:
+                self.ttls[key] = ttl
+
+    def hset(self, key, field, value):
+        with self.lock:
+            self.store.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hgetall(self, key):
+        return dict(self.store.get(key, {}))
+
+    def rpush(self, key, value):
+        with self.lock:
+            self.store.setdefault(key, []).append(value.encode())
+
+    def ltrim(self, key, start, end):
+        with self.lock:
+            values = self.store.get(key, [])
+            self.store[key] = values[start:] if end == -1 else values[start:end + 1]
+
+    def lrange(self, key, start, end):
+        values = self.store.get(key, [])
+        return list(values[start:] if end == -1 else values[start:end + 1])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def expire_fresh(self):
+        with self.lock:
+            for key in [key for key in self.store if ":stale:" not in key]:
+                del self.store[key]
+
+
+class FakePipeline:
+    """Queues commands and runs them under the client's lock, like MULTI/EXEC."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((getattr(self.client, name), args))
+            return self
+        return queue
+
+    def execute(self):
+        with self.client.lock:
+            return [command(*args) for command, args in self.commands]
@@ -0,0 +1,145 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.admission import (
+        RUN_PATHS,
+        AdmissionController,
+        AdmissionMiddleware,
+        AdmissionRejected,
+        Priority,
+    )
+
+
+async def hold(controller, priority, started, release):
+    async with controller.admit(priority):
+        started.append(priority)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admits_up_to_limit_then_queues():
+    controller = AdmissionController(max_in_flight=1, max_queue=2)
+    release = asyncio.Event()
+    started = []
+
+    first = asyncio.create_task(hold(controller, Priority.BATCH, started, release))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(hold(controller, Priority.BATCH, started, release))
+    await asyncio.sleep(0)
+
+    assert controller.in_flight == 1
+    assert controller.queue_depth == 1
+    release.set()
+    await asyncio.gather(first, second)
+    assert started == [Priority.BATCH, Priority.BATCH]
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_jumps_ahead_of_batch():
+    controller = AdmissionController(max_in_flight=1, max_queue=4)
+    release = asyncio.Event()
+    started = []
+
+    tasks = [asyncio.create_task(hold(controller, Priority.BATCH, started, release))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(hold(controller, Priority.BATCH, started, release)))
+    tasks.append(asyncio.create_task(hold(controller, Priority.INTERACTIVE, started, release)))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert started == [Priority.BATCH, Priority.INTERACTIVE, Priority.BATCH]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_and_evicts_batch():
+    controller = AdmissionController(max_in_flight=1, max_queue=1)
+    release = asyncio.Event()
+    started = []
+
+    running = asyncio.create_task(hold(controller, Priority.INTERACTIVE, started, release))
+    await asyncio.sleep(0)
+    queued_batch = asyncio.create_task(hold(controller, Priority.BATCH, started, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        async with controller.admit(Priority.BATCH):
+            pass
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    interactive = asyncio.create_task(hold(controller, Priority.INTERACTIVE, started, release))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected, match="evicted"):
+        await queued_batch
+
+    release.set()
+    await asyncio.gather(running, interactive)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_deadline():
+    controller = AdmissionController(
+        max_in_flight=1, max_queue=4, queue_timeouts={Priority.INTERACTIVE: 0.01}
+    )
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(controller, Priority.INTERACTIVE, [], release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected, match="queue_timeout"):
+        async with controller.admit(Priority.INTERACTIVE):
+            pass
+
+    release.set()
+    await running
+    assert controller.in_flight == 0
+    assert controller.queue_depth == 0
+
+
+@pytest.mark.parametrize("path, matches", [
+    ("/runs/stream", True),
+    ("/runs/wait", True),
+    ("/threads/abc/runs/wait", True),
+    ("/threads/abc/runs/stream", True),
+    # Background runs return as soon as they are queued
+    ("/runs", False),
+    ("/threads/abc/runs", False),
+    ("/runs/batch", False),
+    ("/threads/abc/runs/123", False),
+    ("/research/stream", True),
+    ("/ping", False),
+])
+def test_run_paths(path, matches):
+    assert bool(RUN_PATHS.match(path)) is matches
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_with_retry_after():
+    controller = AdmissionController(max_in_flight=0, max_queue=0)
+    calls = []
+
+    async def downstream(scope, receive, send):
+        calls.append(scope["path"])
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = AdmissionMiddleware(downstream, controller)
+    await middleware({"type": "http", "method": "POST", "path": "/runs/stream", "headers": []}, None, send)
+    await middleware({"type": "http", "method": "GET", "path": "/ping", "headers": []}, None, send)
+
+    assert calls == ["/ping"]
+    assert sent[0]["status"] == 503
+    assert (b"retry-after", b"5") in sent[0]["headers"]
@@ -1,3 +1,4 @@
+import jwt
 import pytest
 from unittest.mock import patch, Mock
 from fastapi.testclient import TestClient
@@ -9,6 +10,18 @@ with patch('google.genai.Client'), \
 
 client = TestClient(app)
 
+JWT_SECRET = "test-jwt-secret-of-at-least-32-bytes"
+USER = {"Authorization": "Bearer " + jwt.encode(
+    {"sub": "00000000-0000-0000-0000-000000000001", "aud": "authenticated"}, JWT_SECRET, algorithm="HS256"
+)}
+INDEX_ADMIN = {"X-Index-Token": "index-secret"}
+
+
+@pytest.fixture
+def search_auth(monkeypatch):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", JWT_SECRET)
+    monkeypatch.setenv("INDEX_ADMIN_TOKEN", "index-secret")
+
 def test_ping():
     response = client.get("/ping")
     assert response.status_code == 200
@@ -18,4 +31,102 @@ def test_ping_response_format():
     response = client.get("/ping")
     data = response.json()
     assert "message" in data
-    assert isinstance(data["message"], str)
\ No newline at end of file
+    assert isinstance(data["message"], str)
+
+def test_search_index_and_query(search_auth):
+    from src.agent import app as app_module
+
+    with patch.object(app_module, "vector_index", app_module.VectorIndex(dim=3)):
+        response = client.post("/search/index", headers=INDEX_ADMIN, json={"items": [
+            {"id": "r1", "embedding": [1, 0, 0], "metadata": {"restaurant_name": "Din Tai Fung"}},
+            {"id": "r2", "embedding": [0, 1, 0]},
+        ]})
+        assert response.status_code == 200
+        assert response.json() == {"indexed": 2, "size": 2}
+
+        response = client.post("/search", headers=USER, json={"query_embedding": [1, 0.1, 0], "match_count": 1})
+        assert response.status_code == 200
+        matches = response.json()["matches"]
+        assert matches[0]["id"] == "r1"
+        assert matches[0]["restaurant_name"] == "Din Tai Fung"
+
+
+def test_search_rejects_wrong_dimension(search_auth):
+    response = client.post("/search", headers=USER, json={"query_embedding": [1, 0]})
+    assert response.status_code == 400
+
+
+def test_search_routes_require_auth(search_auth, monkeypatch):
+    from src.agent import app as app_module
+
+    index = app_module.VectorIndex(dim=3)
+    items = {"items": [{"id": "r1", "embedding": [1, 0, 0]}]}
+    with patch.object(app_module, "vector_index", index):
+        assert client.post("/search", json={"query_embedding": [1, 0, 0]}).status_code == 401
+        assert client.post("/search/index", json=items).status_code == 401
+        # A signed-in user still can't change the shared index
+        assert client.post("/search/index", headers={**USER, "X-Index-Token": "guess"}, json=items).status_code == 401
+        monkeypatch.delenv("INDEX_ADMIN_TOKEN")
+        assert client.post("/search/index", headers=INDEX_ADMIN, json=items).status_code == 503
+    assert len(index) == 0
+
+
+def test_embed_streams_ndjson():
+    import json
+
+    from src.agent import app as app_module
+    from src.agent.embeddings import EmbeddingService, FakeEmbeddingProvider
+
+    service = EmbeddingService(FakeEmbeddingProvider(dim=4))
+    with patch.object(app_module, "embedding_service", service):
+        response = client.post("/embed", json={"texts": ["laksa", "satay", "laksa"]})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    by_index = {line["index"]: line["embedding"] for line in lines}
+    assert by_index[0] == by_index[2]
+    assert len(service.provider.calls) == 1
+
+
+def test_metrics_endpoint():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert {"counters", "timings", "gauges", "reports"} <= set(response.json())
+
+
+def test_jobs_enqueue_and_poll():
+    from src.agent import app as app_module
+    from src.agent.jobs import InMemoryStreamClient, JobQueue
+
+    queue = JobQueue(InMemoryStreamClient())
+    with patch.object(app_module, "job_queue", queue):
+        response = client.post("/jobs", json={"topic": "Din Tai Fung", "priority": "batch"})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        response = client.get(f"/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json()["status"] == "queued"
+
+        assert client.get("/jobs/missing").status_code == 404
+
+
+def test_prefetch_schedules_and_cancels():
+    from src.agent import app as app_module
+    from src.agent.jobs import InMemoryStreamClient, JobQueue
+    from src.agent.prefetch import Prefetcher
+
+    cache = Mock()
+    cache.get_sections.return_value = {}
+    prefetcher = Prefetcher(JobQueue(InMemoryStreamClient(), stream="research:prefetch"), cache)
+    with patch.object(app_module, "prefetcher", prefetcher):
+        response = client.post("/prefetch", json={
+            "session_id": "s1",
+            "restaurants": [{"id": "1", "name": "Din Tai Fung", "lat": 1.3, "lon": 103.8}],
+            "bbox": {"south": 1.2, "west": 103.7, "north": 1.4, "east": 103.9},
+        })
+        assert response.status_code == 202
+        assert [item["id"] for item in response.json()["scheduled"]] == ["1"]
+
+        assert client.delete("/prefetch/s1").json() == {"cancelled": 1}
@@ -0,0 +1,84 @@
+import asyncio
+import os
+from unittest.mock import Mock, patch
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from langgraph_sdk import Auth
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent import app as app_module
+    from src.agent.app import app
+    from src.agent.auth import (
+        ANONYMOUS,
+        authenticate,
+        authenticated_user,
+        drop_secrets,
+        run_configurable,
+    )
+
+USER = "00000000-0000-0000-0000-000000000001"
+OTHER_USER = "00000000-0000-0000-0000-000000000002"
+JWT_SECRET = "test-jwt-secret-of-at-least-32-bytes"
+
+
+def bearer(user_id=USER, secret=JWT_SECRET):
+    token = jwt.encode({"sub": user_id, "aud": "authenticated"}, secret, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_run_configurable_drops_client_supplied_users():
+    spoofed = {"langgraph_auth_user_id": OTHER_USER, "langgraph_auth_user": {}, "max_research_loops": 1}
+    assert run_configurable(spoofed, None) == {"max_research_loops": 1}
+    assert run_configurable(spoofed, USER) == {"langgraph_auth_user_id": USER, "max_research_loops": 1}
+
+
+def test_authenticated_user_ignores_anonymous_runs():
+    assert authenticated_user({"configurable": {"langgraph_auth_user_id": USER}}) == USER
+    assert authenticated_user({"configurable": {"langgraph_auth_user_id": ANONYMOUS}}) is None
+    assert authenticated_user(None) is None
+
+
+def test_run_routes_take_the_user_from_the_token(monkeypatch):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", JWT_SECRET)
+    queue = Mock(enqueue=Mock(return_value="job-1"))
+    client = TestClient(app)
+    with patch.object(app_module, "_get_job_queue", return_value=queue):
+        spoofed = {"langgraph_auth_user_id": OTHER_USER, "max_research_loops": 1}
+        client.post("/jobs", json={"topic": "Din Tai Fung", "configurable": spoofed})
+        client.post("/jobs", headers=bearer(), json={"topic": "Din Tai Fung", "configurable": spoofed})
+        rejected = client.post("/jobs", headers=bearer(secret="wrong-jwt-secret-of-at-least-32-bytes"), json={"topic": "Din Tai Fung"})
+    anonymous, authenticated = [call.args[1] for call in queue.enqueue.call_args_list]
+    assert anonymous == {"max_research_loops": 1}
+    assert authenticated == {"langgraph_auth_user_id": USER, "max_research_loops": 1}
+    assert rejected.status_code == 401
+
+
+def test_server_auth_handler(monkeypatch):
+    monkeypatch.delenv("SUPABASE_JWT_SECRET", raising=False)
+    assert asyncio.run(authenticate(None))["identity"] == ANONYMOUS
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", JWT_SECRET)
+    assert asyncio.run(authenticate(bearer()["Authorization"])) == {"identity": USER, "permissions": []}
+    with pytest.raises(Auth.exceptions.HTTPException):
+        asyncio.run(authenticate(None))
+
+
+def test_server_auth_handler_grants_profiling_for_the_header(monkeypatch):
+    monkeypatch.delenv("SUPABASE_JWT_SECRET", raising=False)
+    monkeypatch.setenv("PROFILING_ADMIN_TOKEN", "secret")
+    assert asyncio.run(authenticate(None, {b"x-profile-token": b"secret"}))["permissions"] == ["profile:runs"]
+    assert asyncio.run(authenticate(None, {b"x-profile-token": b"guess"}))["permissions"] == []
+
+
+def test_profile_token_is_dropped_before_the_run_is_stored():
+    configurable = {"profile_run": True, "x-profile-token": "secret", "profile_token": "secret"}
+    value = {"kwargs": {"config": {"configurable": configurable}, "context": dict(configurable)}}
+    asyncio.run(drop_secrets(None, value))
+    assert value["kwargs"]["config"]["configurable"] == {"profile_run": True}
+    assert value["kwargs"]["context"] == {"profile_run": True}
+    assert run_configurable(configurable, None) == {"profile_run": True}
@@ -0,0 +1,166 @@
+import os
+import sys
+import uuid
+from types import SimpleNamespace as NS
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.auth import USER_KEY
+    from src.agent.research_cache import ResearchCache
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+# The graph's own copy of the module, whose tenant ledger the runs charge
+budget = sys.modules[graph_module.record_usage.__module__]
+
+
+def usage_message(content, input_tokens, output_tokens):
+    return AIMessage(
+        content=content,
+        usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        response_metadata={"model_name": "gemini-2.0-flash"},
+    )
+
+
+def test_estimate_cost_matches_longest_prefix():
+    assert budget.estimate_cost("gemini-2.0-flash-lite-001", 1_000_000, 0) == pytest.approx(0.075)
+    assert budget.estimate_cost("gemini-2.0-flash", 0, 1_000_000) == pytest.approx(0.40)
+    assert budget.estimate_cost("unknown", 1_000_000, 0) == pytest.approx(budget.DEFAULT_PRICE[0])
+
+
+def test_add_usage_sums_and_starts_over_for_a_new_run():
+    first = {**budget.model_usage("gemini-2.0-flash", 100, 10, llm_calls=1), "run": "a"}
+    total = budget.add_usage(budget.add_usage(None, first), budget.search_usage("gemini-2.0-flash", None))
+    assert (total["total_tokens"], total["llm_calls"], total["searches"], total["run"]) == (110, 1, 1, "a")
+    assert total["cost_usd"] == pytest.approx(first["cost_usd"] + budget.SEARCH_COST_USD)
+
+    restarted = budget.add_usage(total, {**budget.model_usage("gemini-2.0-flash", 5, 5), "run": "b"})
+    assert (restarted["total_tokens"], restarted["searches"], restarted["run"]) == (10, 0, "b")
+
+
+def test_tracker_reads_usage_metadata():
+    tracker = budget.UsageTracker("gemini-2.5-flash")
+    tracker.on_llm_end(LLMResult(generations=[[ChatGeneration(message=usage_message("hi", 1000, 100))]]))
+    assert (tracker.usage["input_tokens"], tracker.usage["output_tokens"], tracker.usage["llm_calls"]) == (1000, 100, 1)
+    # Priced as the model the response reports
+    assert tracker.usage["cost_usd"] == pytest.approx(budget.estimate_cost("gemini-2.0-flash", 1000, 100))
+
+
+def test_search_usage_reads_genai_metadata():
+    response = NS(usage_metadata=NS(prompt_token_count=800, candidates_token_count=200))
+    usage = budget.search_usage("gemini-2.0-flash", response)
+    assert (usage["total_tokens"], usage["searches"]) == (1000, 1)
+
+
+def test_tenant_spending_expires_with_the_window():
+    ledger = budget.TenantLedger()
+    ledger.charge("t", budget.model_usage("gemini-2.0-flash", 100, 0))
+    assert ledger.spent("t", window=60)["total_tokens"] == 100
+    assert ledger.spent("t", window=0)["total_tokens"] == 0
+    assert ledger.spent("other", window=60)["total_tokens"] == 0
+
+
+@pytest.fixture(autouse=True)
+def no_budgets(monkeypatch):
+    for name in ("RUN_TOKEN_BUDGET", "RUN_COST_BUDGET_USD", "TENANT_TOKEN_BUDGET", "TENANT_COST_BUDGET_USD"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def run_graph(configurable=None, user=None):
+    """Run the graph; each search reports 1200 tokens and each reflection asks for one more."""
+    search = NS(text="Din Tai Fung summary", candidates=[NS(grounding_metadata=None)],
+                usage_metadata=NS(prompt_token_count=1000, candidates_token_count=200))
+    insufficient = Reflection(is_sufficient=False, knowledge_gap="prices", follow_up_queries=["Din Tai Fung prices"])
+    answer = Mock()
+
+    def invoke(prompt, config=None):
+        message = usage_message("Final answer", 3000, 500)
+        for callback in (config or {}).get("callbacks", []):
+            callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+        return message
+
+    answer.invoke.side_effect = invoke
+    with patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+         patch.object(graph_module.genai_client.models, "generate_content", return_value=search) as searches, \
+         patch.object(graph_module, "invoke_structured", return_value=insufficient) as reflections, \
+         patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        state = graph_module.graph.invoke(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")]},
+            {"configurable": {"max_research_loops": 3, **(configurable or {}), **({USER_KEY: user} if user else {})}},
+        )
+    return state, searches.call_count, reflections.call_count
+
+
+def test_usage_totals_are_returned_with_the_answer():
+    state, searches, reflections = run_graph()
+    usage = state["usage"]
+    # Follow-up queries accumulate across loops: 2 planned, then 1 and 2 follow-ups
+    assert (searches, reflections) == (2 + 1 + 2, 3)
+    assert usage["searches"] == 5
+    assert usage["total_tokens"] == 5 * 1200 + 3500
+    assert usage["llm_calls"] == 1
+    assert usage["cost_usd"] > 4 * budget.SEARCH_COST_USD
+    assert state["budget_exhausted"] == ""
+
+
+def test_run_token_budget_stops_research(monkeypatch):
+    monkeypatch.setenv("RUN_TOKEN_BUDGET", "2000")
+    state, searches, reflections = run_graph()
+    # The two initial searches use up the budget, so reflection is skipped and the run answers
+    assert (searches, reflections) == (2, 0)
+    assert state["budget_exhausted"] == "run_tokens"
+    assert state["messages"][-1].content == "Final answer"
+    assert state["usage"]["total_tokens"] == 2 * 1200 + 3500
+
+
+def test_run_cost_budget_stops_after_the_loop_that_reached_it(monkeypatch):
+    monkeypatch.setenv("RUN_COST_BUDGET_USD", str(3 * budget.SEARCH_COST_USD))
+    state, searches, reflections = run_graph()
+    # The follow-up search of the first loop crosses the budget, so the second reflection is skipped
+    assert (searches, reflections) == (3, 1)
+    assert state["budget_exhausted"] == "run_cost"
+
+
+def test_budgets_in_configurable_are_ignored(monkeypatch):
+    monkeypatch.setenv("RUN_TOKEN_BUDGET", "2000")
+    state, _, reflections = run_graph({"run_token_budget": 10**9, "run_cost_budget_usd": 1000.0})
+    assert (reflections, state["budget_exhausted"]) == (0, "run_tokens")
+
+
+def test_tenant_budget_spans_runs_of_the_verified_user(monkeypatch):
+    monkeypatch.setenv("TENANT_TOKEN_BUDGET", "9000")
+    user = f"user-{uuid.uuid4()}"
+    first, searches, _ = run_graph(user=user)
+    assert first["budget_exhausted"] == ""
+    assert budget.tenant_ledger.spent(user, 60)["total_tokens"] == first["usage"]["total_tokens"]
+
+    # A client-supplied tenant id neither changes nor escapes the charged tenant
+    second, searches, reflections = run_graph({"tenant_id": f"other-{uuid.uuid4()}"}, user=user)
+    assert (searches, reflections) == (2, 0)
+    assert second["budget_exhausted"] == "tenant_tokens"
+
+
+def test_anonymous_runs_are_not_charged_to_a_tenant(monkeypatch):
+    monkeypatch.setenv("TENANT_TOKEN_BUDGET", "1")
+    tenants = set(budget.tenant_ledger.tenants())
+    state, _, _ = run_graph({"tenant_id": f"tenant-{uuid.uuid4()}"}, user="anonymous")
+    assert state["budget_exhausted"] == ""
+    assert set(budget.tenant_ledger.tenants()) == tenants
+
+
+def test_limits_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("TENANT_COST_BUDGET_USD", "2.5")
+    monkeypatch.setenv("TENANT_BUDGET_WINDOW_SECONDS", "3600")
+    limits = budget.limits_from_env()
+    assert (limits.run_tokens, limits.tenant_cost_usd, limits.window_seconds) == (0, 2.5, 3600.0)
@@ -0,0 +1,64 @@
+import os
+import sys
+from unittest.mock import Mock, patch
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.citations import compact_citations, estimate_tokens, expand_citations
+
+graph_module = sys.modules["src.agent.graph"]
+
+SHORT = "https://vertexaisearch.cloud.google.com/id/"
+SUMMARY = (
+    f"Dumplings cost $12 [tripadvisor]({SHORT}3-12) [burpple]({SHORT}3-4). "
+    f"Queues are long [tripadvisor]({SHORT}3-12)."
+)
+
+
+def test_compact_citations_round_trip():
+    (compacted,), table = compact_citations([SUMMARY])
+    assert compacted == "Dumplings cost $12 [c3.12] [c3.4]. Queues are long [c3.12]."
+    assert table["[c3.12]"] == ("tripadvisor", f"{SHORT}3-12")
+    assert expand_citations(compacted, table) == SUMMARY
+
+
+def test_other_links_are_untouched():
+    text = "See [menu](https://dintaifung.com.sg/menu)."
+    assert compact_citations([text]) == ([text], {})
+
+
+def test_unknown_tokens_are_dropped():
+    _, table = compact_citations([SUMMARY])
+    assert expand_citations("Cheap [c3.4][c9.9].", table) == f"Cheap [burpple]({SHORT}3-4)."
+
+
+def test_compaction_saves_tokens():
+    (compacted,), _ = compact_citations([SUMMARY])
+    assert estimate_tokens(compacted) < estimate_tokens(SUMMARY) / 2
+
+
+def test_finalize_answer_expands_tokens_to_sources():
+    answer = Mock()
+    answer.invoke.return_value = AIMessage(content="## Pricing\nAbout $12 [c3.12].")
+    state = {
+        "messages": [HumanMessage(content="Din Tai Fung")],
+        "web_research_result": [SUMMARY],
+        "sources": {
+            "urls": ["https://tripadvisor.com/dtf", "https://burpple.com/dtf"],
+            "labels": ["tripadvisor", "burpple"],
+            "refs": {3012: 0, 3004: 1},
+        },
+    }
+    with patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        result = graph_module.finalize_answer(state, {"configurable": {}})
+
+    prompt = answer.invoke.call_args[0][0]
+    assert "[c3.12]" in prompt and SHORT not in prompt
+    assert result["messages"][0].content == "## Pricing\nAbout $12 [tripadvisor](https://tripadvisor.com/dtf)."
+    assert [source["label"] for source in result["sources_gathered"]] == ["tripadvisor"]
@@ -0,0 +1,109 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent import conversation
+    from src.agent.conversation import (
+        SummaryCache,
+        get_conversation_context,
+        prefix_digests,
+    )
+    from src.agent.utils import get_research_topic
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(conversation, "summary_cache", SummaryCache())
+    conversation.metrics.reset()
+    yield
+    conversation.metrics.reset()
+
+
+def transcript(turns):
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"Question {turn}"))
+        messages.append(AIMessage(content=f"Long answer {turn} " + "detail " * 200))
+    return messages
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+def test_short_conversation_matches_research_topic():
+    messages = transcript(2)
+    summarize = RecordingSummarizer()
+    assert get_conversation_context(messages, summarize, window=6) == get_research_topic(messages)
+    assert summarize.prompts == []
+
+
+def test_older_messages_are_summarised():
+    messages = transcript(5)
+    context = get_conversation_context(messages, RecordingSummarizer(), window=4)
+
+    assert "summary 1" in context
+    assert "Question 4" in context and "Question 3" in context
+    assert "Question 0" not in context
+
+
+def test_prompt_size_stays_flat():
+    summarize = RecordingSummarizer()
+    sizes = [
+        len(get_conversation_context(transcript(turns), summarize, window=4))
+        for turns in range(3, 12)
+    ]
+    assert max(sizes) - min(sizes) < 20
+
+
+def test_summary_is_cached_and_extended():
+    summarize = RecordingSummarizer()
+    get_conversation_context(transcript(4), summarize, window=4)
+    get_conversation_context(transcript(4), summarize, window=4)
+    assert len(summarize.prompts) == 1
+    assert conversation.metrics.counter("conversation.summary_cache_hits") == 1
+
+    get_conversation_context(transcript(5), summarize, window=4)
+    assert len(summarize.prompts) == 2
+    # Only the newly dropped turn is sent along with the previous summary
+    assert "summary 1" in summarize.prompts[1]
+    assert "Question 2" in summarize.prompts[1]
+    assert "Question 0" not in summarize.prompts[1]
+
+
+def test_summarizer_failure_keeps_user_questions():
+    def failing(prompt):
+        raise ConnectionError("down")
+
+    context = get_conversation_context(transcript(4), failing, window=4)
+    assert "Question 0" in context
+    assert "Long answer 0" not in context
+
+
+def test_prefix_digests_depend_on_content():
+    first = prefix_digests([HumanMessage(content="a"), AIMessage(content="b")])
+    second = prefix_digests([HumanMessage(content="a"), AIMessage(content="c")])
+    assert first[0] == second[0]
+    assert first[1] != second[1]
+
+
+def test_summary_cache_evicts_least_recent():
+    cache = SummaryCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
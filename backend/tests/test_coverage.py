@@ -0,0 +1,151 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.coverage import (
+        analyze_coverage,
+        coverage_report,
+        local_reflection,
+        metrics,
+    )
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+
+FULL_SUMMARY = (
+    "The menu features xiao long bao and other signature dishes. Popular items include fried rice. "
+    "Prices range from $10 to $30 per person, so it is affordable. Mains cost about $15. "
+    "Reviews praise the service and most diners recommend it. It has a 4.5 rating on Google. "
+    "A new seasonal promotion started this month. The latest update adds a weekend deal. "
+    "Vegetarian options are available. The kitchen is not halal certified but lists allergen information. "
+    "Opening hours are 11am to 10pm daily. Reservations can be made online and the outlet is located at Orchard."
+)
+MENU_ONLY = "The menu features xiao long bao [Source](https://vertexaisearch.cloud.google.com/id/0-1). Signature dishes include noodles."
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_analyze_coverage_scores_each_section():
+    coverage = analyze_coverage([MENU_ONLY, "Prices start at $12."])
+    assert coverage["menu"] == 1.0
+    assert coverage["pricing"] == 0.5
+    assert coverage["reviews"] == coverage["dietary"] == coverage["others"] == 0.0
+
+
+def test_nothing_found_sentences_do_not_count():
+    coverage = analyze_coverage(["No information about dietary options was found. Vegan details are not available."])
+    assert coverage["dietary"] == 0.0
+
+
+def test_full_coverage_is_sufficient_without_model():
+    result, missing = local_reflection([FULL_SUMMARY], "Tell me about Din Tai Fung at Orchard", last_loop=False, max_follow_ups=3)
+    assert missing == []
+    assert result.is_sufficient is True
+    assert metrics.counter("coverage.reflections_avoided.covered") == 1
+
+
+def test_lookup_gets_follow_ups_for_missing_sections_only():
+    result, missing = local_reflection([MENU_ONLY], "Tell me about Din Tai Fung at Orchard", last_loop=False, max_follow_ups=2)
+    assert missing == ["pricing", "reviews", "updates", "dietary", "others"]
+    assert result.is_sufficient is False
+    assert result.follow_up_queries == [
+        "Din Tai Fung Orchard price range",
+        "Din Tai Fung Orchard customer reviews and ratings",
+    ]
+    assert "pricing" in result.knowledge_gap
+
+
+def test_follow_ups_skip_queries_already_run():
+    searched = ["Din Tai Fung Orchard price range"]
+    result, _ = local_reflection([MENU_ONLY], "Tell me about Din Tai Fung at Orchard", last_loop=False, max_follow_ups=2, searched=searched)
+    assert result.follow_up_queries == [
+        "Din Tai Fung Orchard customer reviews and ratings",
+        "Din Tai Fung Orchard latest promotions and news",
+    ]
+
+
+def test_stops_once_missing_sections_were_all_searched():
+    searched = [
+        "Din Tai Fung Orchard price range",
+        "Din Tai Fung Orchard customer reviews and ratings",
+        "Din Tai Fung Orchard latest promotions and news",
+        "Din Tai Fung Orchard halal vegetarian and allergen options",
+        "Din Tai Fung Orchard opening hours reservations and location",
+    ]
+    result, missing = local_reflection([MENU_ONLY], "Tell me about Din Tai Fung at Orchard", last_loop=False, max_follow_ups=2, searched=searched)
+    assert missing == ["pricing", "reviews", "updates", "dietary", "others"]
+    assert result.is_sufficient is False
+    assert result.follow_up_queries == []
+    assert coverage_report()["avoided_exhausted"] == 1
+
+
+def test_last_loop_skips_model():
+    result, _ = local_reflection([MENU_ONLY], "Compare ramen places and their service", last_loop=True, max_follow_ups=3)
+    assert result.follow_up_queries == []
+    assert metrics.counter("coverage.reflections_avoided.last_loop") == 1
+
+
+def test_open_question_with_gaps_falls_back_to_model():
+    result, missing = local_reflection([MENU_ONLY], "Which ramen places near Bugis are good for a date?", last_loop=False, max_follow_ups=3)
+    assert result is None
+    assert "pricing" in missing
+    report = coverage_report()
+    assert report["model_reflections"] == 1
+    assert report["avoided_rate"] == 0.0
+
+
+def reflect(summaries, topic, configurable, state=None):
+    state = {
+        "messages": [HumanMessage(content=topic)],
+        "search_query": ["q"],
+        "web_research_result": summaries,
+        "research_loop_count": 0,
+        **(state or {}),
+    }
+    model_result = Reflection(is_sufficient=False, knowledge_gap="gap", follow_up_queries=["model query"])
+    with patch.object(graph_module, "invoke_structured", return_value=model_result) as invoke:
+        decision = graph_module.reflection(state, {"configurable": configurable})
+    return decision, invoke
+
+
+def test_reflection_node_skips_model_when_covered():
+    decision, invoke = reflect([FULL_SUMMARY], "Tell me about Din Tai Fung at Orchard", {"coverage_check": True})
+    assert invoke.call_count == 0
+    assert decision["is_sufficient"] is True
+    assert coverage_report()["reflections_avoided"] == 1
+
+
+def test_reflection_node_tells_model_the_missing_sections():
+    topic = "Which ramen places near Bugis are good for a date?"
+    decision, invoke = reflect([MENU_ONLY], topic, {"coverage_check": True, "max_research_loops": 3})
+    assert decision["follow_up_queries"] == ["model query"]
+    prompt = invoke.call_args.args[1]
+    assert "pricing, reviews, updates, dietary, others" in prompt
+
+
+def test_reflection_node_does_not_repeat_searches():
+    searched = {"search_query": ["Din Tai Fung Orchard price range"]}
+    decision, invoke = reflect([MENU_ONLY], "Tell me about Din Tai Fung at Orchard", {"coverage_check": True, "max_research_loops": 3}, searched)
+    assert invoke.call_count == 0
+    assert "Din Tai Fung Orchard price range" not in decision["follow_up_queries"]
+
+
+def test_reflection_node_unchanged_when_disabled():
+    decision, invoke = reflect([FULL_SUMMARY], "Tell me about Din Tai Fung at Orchard", {})
+    assert invoke.call_count == 1
+    assert decision["follow_up_queries"] == ["model query"]
+    assert coverage_report()["reflections_avoided"] == 0
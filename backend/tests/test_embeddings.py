@@ -0,0 +1,93 @@
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.embeddings import (
+        EmbeddingService,
+        FakeEmbeddingProvider,
+        InMemoryEmbeddingCache,
+        RedisEmbeddingCache,
+        content_hash,
+    )
+
+
+class TestFakeEmbeddingProvider:
+    def test_deterministic_unit_vectors(self):
+        provider = FakeEmbeddingProvider(dim=8)
+        first, second = provider.embed_batch(["ramen", "ramen"])
+        assert first == second
+        assert sum(x * x for x in first) == pytest.approx(1.0)
+        assert provider.embed_batch(["sushi"])[0] != first
+
+
+class TestEmbeddingService:
+    def test_deduplicates_and_preserves_order(self):
+        provider = FakeEmbeddingProvider(dim=4)
+        service = EmbeddingService(provider)
+
+        vectors = service.embed(["a", "b", "a", "c"])
+
+        assert provider.calls == [["a", "b", "c"]]
+        assert vectors[0] == vectors[2]
+        assert vectors[1] == provider.embed_batch(["b"])[0]
+
+    def test_serves_repeats_from_cache(self):
+        provider = FakeEmbeddingProvider(dim=4)
+        cache = InMemoryEmbeddingCache()
+        EmbeddingService(provider, cache=cache).embed(["a", "b"])
+
+        service = EmbeddingService(provider, cache=cache)
+        service.embed(["a", "b", "c"])
+
+        assert provider.calls[-1] == ["c"]
+        assert service.stats["cache_hits"] == 2
+        assert service.stats["embedded"] == 1
+
+    def test_micro_batches(self):
+        provider = FakeEmbeddingProvider(dim=4)
+        service = EmbeddingService(provider, batch_size=2)
+
+        service.embed([str(i) for i in range(5)])
+
+        assert [len(call) for call in provider.calls] == [2, 2, 1]
+        assert service.stats["provider_calls"] == 3
+
+    def test_stream_yields_cached_first(self):
+        provider = FakeEmbeddingProvider(dim=4)
+        cache = InMemoryEmbeddingCache()
+        EmbeddingService(provider, cache=cache).embed(["cached"])
+
+        stream = EmbeddingService(provider, cache=cache).embed_stream(["new", "cached"])
+
+        assert next(stream)[0] == 1
+        assert next(stream)[0] == 0
+
+
+class TestRedisEmbeddingCache:
+    def test_round_trip(self):
+        store = {}
+        client = Mock()
+        client.mget.side_effect = lambda keys: [store.get(k) for k in keys]
+        pipe = Mock()
+        pipe.set.side_effect = lambda key, value, ex=None: store.__setitem__(key, value)
+        client.pipeline.return_value = pipe
+        cache = RedisEmbeddingCache(client)
+
+        cache.set_many({"k": [0.5, -1.0]})
+
+        assert cache.get_many(["k", "missing"]) == [[0.5, -1.0], None]
+
+    def test_errors_are_cache_misses(self):
+        client = Mock()
+        client.mget.side_effect = ConnectionError("down")
+        assert RedisEmbeddingCache(client).get_many(["k"]) == [None]
+
+
+def test_content_hash_is_model_scoped():
+    assert content_hash("m1", "text") != content_hash("m2", "text")
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent import hedging
+    from src.agent.hedging import (
+        HedgeBudget,
+        LatencyTracker,
+        hedged_call,
+        hedging_report,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(hedging, "attempt_latency", LatencyTracker(min_samples=5))
+    monkeypatch.setattr(hedging, "primary_latency", LatencyTracker(min_samples=1))
+    monkeypatch.setattr(hedging, "observed_latency", LatencyTracker(min_samples=1))
+    monkeypatch.setattr(hedging, "budget", HedgeBudget())
+    hedging.metrics.reset()
+    yield
+    hedging.metrics.reset()
+
+
+def warm(key="model", seconds=0.01, samples=10):
+    for _ in range(samples):
+        hedging.attempt_latency.record(key, seconds)
+
+
+def test_latency_tracker_needs_samples():
+    tracker = LatencyTracker(min_samples=3)
+    tracker.record("m", 1.0)
+    assert tracker.quantile("m", 0.95) is None
+    tracker.record("m", 2.0)
+    tracker.record("m", 3.0)
+    assert tracker.quantile("m", 0.5) == 2.0
+
+
+def test_budget_limits_hedges():
+    budget = HedgeBudget(burst=2)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    for _ in range(4):
+        budget.on_request(0.25)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_no_hedge_without_latency_history():
+    calls = []
+    assert hedged_call(lambda: calls.append(1) or "ok", "model") == "ok"
+    assert calls == [1]
+    assert hedging_report()["hedges"] == 0
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    warm()
+    release = threading.Event()
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(2)
+            return "slow"
+        return "fast"
+
+    started = time.perf_counter()
+    assert hedged_call(call, "model") == "fast"
+    assert time.perf_counter() - started < 1
+    release.set()
+
+    report = hedging_report()
+    assert report["hedges"] == 1
+    assert report["hedge_wins"] == 1
+    assert report["hedge_rate"] == 1.0
+
+
+def test_losing_attempt_is_reported_when_it_finishes():
+    warm()
+    release = threading.Event()
+    discarded = []
+    finished = threading.Event()
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(2)
+            return "slow"
+        return "fast"
+
+    def on_discarded(result):
+        discarded.append(result)
+        finished.set()
+
+    assert hedged_call(call, "model", on_discarded=on_discarded) == "fast"
+    assert discarded == []
+    release.set()
+    assert finished.wait(2)
+    assert discarded == ["slow"]
+
+
+def test_failed_attempt_falls_back_to_other():
+    warm()
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.1)
+            return "primary"
+        raise RuntimeError("hedge failed")
+
+    assert hedged_call(call, "model") == "primary"
+
+
+def test_exhausted_budget_waits_for_primary():
+    warm()
+    hedging.budget._tokens = 0
+
+    def call():
+        time.sleep(0.05)
+        return "primary"
+
+    assert hedged_call(call, "model", budget_ratio=0.0) == "primary"
+    assert hedging_report()["hedges"] == 0
+    assert hedging_report()["models"]["model"]["p99_observed_seconds"] >= 0.05
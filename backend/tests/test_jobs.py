@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.jobs import InMemoryStreamClient, JobQueue
+    from src.agent.worker import run_worker, start_workers
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(InMemoryStreamClient(), max_attempts=2, claim_idle_ms=50)
+
+
+def fake_graph(answer="Great dumplings"):
+    graph = Mock()
+    graph.invoke.return_value = {"messages": [AIMessage(content=answer)], "sources_gathered": []}
+    return graph
+
+
+class TestJobQueue:
+    def test_enqueue_claim_complete(self, queue):
+        job_id = queue.enqueue("Din Tai Fung", {"max_research_loops": 1})
+        assert queue.status(job_id)["status"] == "queued"
+        assert queue.depth() == 1
+
+        (entry_id, claimed_id, payload), = queue.claim("worker-1", block_ms=10)
+        assert claimed_id == job_id
+        assert payload["configurable"] == {"max_research_loops": 1}
+        assert queue.status(job_id)["status"] == "running"
+
+        queue.complete(entry_id, job_id, {"answer": "ok"})
+        status = queue.status(job_id)
+        assert status["status"] == "done"
+        assert status["result"] == {"answer": "ok"}
+        assert queue.depth() == 0
+
+    def test_failed_job_is_retried_then_failed(self, queue):
+        job_id = queue.enqueue("topic")
+        entry_id, _, _ = queue.claim("w", block_ms=10)[0]
+        queue.fail(entry_id, job_id, "boom")
+        assert queue.status(job_id)["status"] == "queued"
+
+        entry_id, _, _ = queue.claim("w", block_ms=10)[0]
+        queue.fail(entry_id, job_id, "boom again")
+        status = queue.status(job_id)
+        assert status["status"] == "failed"
+        assert status["error"] == "boom again"
+        assert status["attempts"] == 2
+
+    def test_crashed_worker_job_is_reclaimed(self, queue):
+        job_id = queue.enqueue("topic")
+        queue.claim("crashed-worker", block_ms=10)
+        assert queue.claim("other", block_ms=10) == []
+
+        time.sleep(0.06)
+        (_, reclaimed_id, _), = queue.claim("other", block_ms=10)
+        assert reclaimed_id == job_id
+        assert queue.status(job_id)["attempts"] == 2
+
+    def test_running_job_with_heartbeat_is_not_reclaimed(self, queue):
+        job_id = queue.enqueue("topic")
+        (entry_id, _, _), = queue.claim("slow-worker", block_ms=10)
+
+        with queue.heartbeat("slow-worker", entry_id):
+            time.sleep(0.15)
+            assert queue.claim("other", block_ms=10) == []
+        queue.complete(entry_id, job_id, {"answer": "ok"})
+        assert queue.status(job_id)["attempts"] == 1
+
+    def test_claim_times_out_when_empty(self, queue):
+        assert queue.claim("w", block_ms=10) == []
+
+    def test_unknown_job(self, queue):
+        assert queue.status("missing") is None
+
+
+class TestWorker:
+    def test_worker_runs_jobs_and_wait_returns_result(self, queue):
+        stop = start_workers(queue, graph=fake_graph(), concurrency=2, name="test")
+        try:
+            job_id = queue.enqueue("Din Tai Fung")
+            status = queue.wait(job_id, timeout=5, poll_interval=0.01)
+        finally:
+            stop.set()
+        assert status["status"] == "done"
+        assert status["result"]["answer"] == "Great dumplings"
+
+    def test_slow_job_runs_once(self, queue):
+        graph = fake_graph()
+        graph.invoke.side_effect = lambda *args: time.sleep(0.2) or fake_graph().invoke.return_value
+        stop = threading.Event()
+        workers = [threading.Thread(target=run_worker, args=(queue, graph, f"w{i}", stop, 10)) for i in range(2)]
+        for worker in workers:
+            worker.start()
+        try:
+            job_id = queue.enqueue("Din Tai Fung")
+            status = queue.wait(job_id, timeout=5, poll_interval=0.01)
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        assert status["status"] == "done"
+        assert graph.invoke.call_count == 1
+
+    def test_worker_failure_requeues(self, queue):
+        graph = Mock()
+        graph.invoke.side_effect = RuntimeError("upstream down")
+        stop = threading.Event()
+        job_id = queue.enqueue("topic")
+        worker = threading.Thread(target=run_worker, args=(queue, graph, "w", stop, 10))
+        worker.start()
+        try:
+            status = queue.wait(job_id, timeout=5, poll_interval=0.01)
+        finally:
+            stop.set()
+            worker.join()
+        assert status["status"] == "failed"
+        assert graph.invoke.call_count == 2
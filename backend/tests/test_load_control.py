@@ -0,0 +1,148 @@
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.configuration import Configuration
+    from src.agent.research_cache import ResearchCache
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+# The graph and resilience module share `agent.load_control`
+DepthController = type(graph_module.depth_controller)
+load_control = sys.modules[DepthController.__module__]
+
+
+CONFIG = Configuration(target_in_flight_runs=2, target_upstream_latency_seconds=10.0)
+
+
+class TestDepthController:
+    def test_full_depth_when_idle(self):
+        depth = DepthController().choose(3, 3, CONFIG)
+        assert (depth["initial_queries"], depth["max_research_loops"], depth["reduced"]) == (3, 3, False)
+
+    def test_in_flight_runs_reduce_depth(self):
+        controller = DepthController()
+        for _ in range(3):
+            controller.run_started()
+        depth = controller.choose(3, 3, CONFIG)
+        assert depth["pressure"] == 1.5
+        assert (depth["initial_queries"], depth["max_research_loops"], depth["reduced"]) == (2, 2, True)
+
+    def test_slow_upstream_reduces_to_floor(self):
+        controller = DepthController()
+        controller.record_upstream(40.0)
+        depth = controller.choose(3, 3, CONFIG)
+        assert (depth["initial_queries"], depth["max_research_loops"]) == (1, 1)
+
+        floor = Configuration(target_upstream_latency_seconds=10.0, min_initial_queries=2, min_research_loops=2)
+        depth = controller.choose(3, 3, floor)
+        assert (depth["initial_queries"], depth["max_research_loops"]) == (2, 2)
+
+    def test_rate_limits_reduce_depth(self):
+        controller = DepthController()
+        controller.record_upstream(1.0, Exception("429 RESOURCE_EXHAUSTED"))
+        assert controller.choose(4, 3, CONFIG)["initial_queries"] == 2
+        assert load_control.is_rate_limited(Mock(code=429))
+        assert not load_control.is_rate_limited(ValueError("bad request"))
+
+    def test_recovers_when_load_drops(self):
+        controller = DepthController(window=60.0)
+        run_id = controller.run_started("run-1")
+        controller.run_started("run-2")
+        controller.run_started("run-3")
+        controller.record_upstream(40.0)
+        assert controller.choose(3, 3, CONFIG)["reduced"]
+
+        controller.window = 0.0
+        controller.run_finished(run_id)
+        controller.run_finished("run-2")
+        assert not controller.choose(3, 3, CONFIG)["reduced"]
+
+    def test_abandoned_runs_expire(self):
+        controller = DepthController(max_run_seconds=0.0)
+        controller.run_started()
+        assert controller.signals()["in_flight"] == 0
+
+    def test_disabled(self):
+        controller = DepthController()
+        controller.record_upstream(100.0)
+        depth = controller.choose(3, 3, Configuration(adaptive_depth=False))
+        assert (depth["initial_queries"], depth["max_research_loops"]) == (3, 3)
+
+
+def run_graph(controller, reflections, state=None):
+    response = Mock(text="Din Tai Fung summary", candidates=[Mock(grounding_metadata=None)])
+    answer = Mock(invoke=Mock(return_value=AIMessage(content="Final answer")))
+    with patch.object(graph_module, "depth_controller", controller), \
+         patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+         patch.object(graph_module.genai_client.models, "generate_content", return_value=response) as search, \
+         patch.object(graph_module, "invoke_structured", side_effect=reflections), \
+         patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        result = graph_module.graph.invoke(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")], **(state or {})},
+            {"configurable": {"target_upstream_latency_seconds": 10.0}},
+        )
+    return result, search.call_count
+
+
+def insufficient():
+    return Reflection(is_sufficient=False, knowledge_gap="prices", follow_up_queries=["Din Tai Fung prices"])
+
+
+def test_graph_runs_shallower_under_load_and_records_depth():
+    controller = DepthController()
+    controller.record_upstream(40.0)
+    state, searches = run_graph(controller, [insufficient() for _ in range(3)])
+
+    assert searches == 1
+    depth = state["research_depth"]
+    assert (depth["initial_queries"], depth["max_research_loops"], depth["reduced"]) == (1, 1, True)
+    # The run is no longer counted as in flight once it has answered
+    assert controller.signals()["in_flight"] == 0
+
+
+def test_graph_keeps_full_depth_when_idle():
+    state, searches = run_graph(DepthController(), [insufficient(), insufficient(), insufficient()])
+    assert state["research_depth"]["reduced"] is False
+    assert state["research_loop_count"] == 3
+    assert searches == 3 + 2
+
+
+def test_explicit_loop_limit_is_honoured():
+    state, _ = run_graph(DepthController(), [insufficient(), insufficient()], {"max_research_loops": 1})
+    assert state["research_loop_count"] == 1
+
+
+def test_reduced_depth_does_not_stick_to_the_thread():
+    state = {"initial_search_query_count": 1, "max_research_loops": 1, "research_depth": {
+        "initial_queries": 1, "max_research_loops": 1, "requested_queries": 3, "requested_loops": 3,
+    }}
+    assert graph_module.requested_depth(state, Configuration()) == (3, 3)
+    assert graph_module.requested_depth({**state, "max_research_loops": 2}, Configuration()) == (3, 2)
+
+
+def test_run_failing_in_generate_query_is_released():
+    controller = DepthController()
+    with patch.object(graph_module, "conversation_context", side_effect=RuntimeError("boom")), \
+         pytest.raises(RuntimeError):
+        run_graph(controller, [])
+    assert controller.signals()["in_flight"] == 0
+
+
+def test_run_failing_in_a_later_node_is_released():
+    controller = DepthController()
+    with patch.object(graph_module, "exhausted_budget", side_effect=RuntimeError("boom")), \
+         pytest.raises(RuntimeError):
+        run_graph(controller, [insufficient()])
+    assert controller.signals()["in_flight"] == 0
@@ -0,0 +1,105 @@
+import os
+import threading
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent import memory_profiler
+    from src.agent.memory_profiler import compact_state, profiled, state_size
+
+
+@pytest.fixture(autouse=True)
+def fresh_profile():
+    memory_profiler.profile.reset()
+    memory_profiler.metrics.reset()
+    yield
+    memory_profiler.profile.reset()
+    memory_profiler.metrics.reset()
+
+
+def make_state(results=2, result_size=1000):
+    short_url = "https://vertexaisearch.cloud.google.com/id/0-0"
+    return {
+        "web_research_result": [f"[Site]({short_url}) " + "x" * result_size for _ in range(results)],
+        # Only ref 0 (0-0) is cited by the summaries
+        "sources": {
+            "urls": ["https://site.com", "https://other.com"],
+            "labels": ["Site", "Other"],
+            "refs": {0: 0, 1: 1, 1000: 1},
+        },
+    }
+
+
+def allocating_node(state, config):
+    data = [bytearray(1024) for _ in range(100)]
+    return {"size": len(data)}
+
+
+def test_disabled_by_default():
+    seen = []
+    node = profiled("node", lambda state, config: seen.append(state) or {})
+    node({"a": 1}, {"configurable": {}})
+
+    assert seen == [{"a": 1}]
+    assert memory_profiler.profile.report()["nodes"] == {}
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiling_records_node_memory():
+    node = profiled("allocating", allocating_node)
+    assert node({"a": 1}, {"configurable": {"enable_memory_profiling": True}}) == {"size": 100}
+
+    stats = memory_profiler.profile.report()["nodes"]["allocating"]
+    assert stats["calls"] == 1
+    assert stats["peak_bytes_max"] >= 100 * 1024
+    assert stats["state_bytes_max"] == state_size({"a": 1})
+    assert stats["top_allocations"]
+    assert not tracemalloc.is_tracing()
+
+
+def test_overlapping_calls_are_marked_concurrent():
+    barrier = threading.Barrier(2)
+    node = profiled("parallel", lambda state, config: barrier.wait(timeout=5) and {} or {})
+    config = {"configurable": {"enable_memory_profiling": True}}
+    threads = [threading.Thread(target=node, args=({}, config)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profiled("parallel", lambda state, config: {})({}, config)
+
+    stats = memory_profiler.profile.report()["nodes"]["parallel"]
+    assert (stats["calls"], stats["concurrent_calls"]) == (3, 2)
+    assert not tracemalloc.is_tracing()
+
+
+def test_budget_warns_without_changing_state():
+    seen = []
+    node = profiled("node", lambda state, config: seen.append(state) or {})
+    state = make_state()
+    node(state, {"configurable": {"state_size_budget_bytes": 100}})
+
+    assert seen[0] is state
+    assert memory_profiler.profile.report()["budget_exceeded"] == 1
+
+
+def test_budget_compacts_state():
+    seen = []
+    node = profiled("node", lambda state, config: seen.append(state) or {})
+    node(make_state(), {"configurable": {"state_size_budget_bytes": 1000, "state_budget_action": "compact"}})
+
+    compacted = seen[0]
+    assert compacted["sources"] == {"urls": ["https://site.com"], "labels": ["Site"], "refs": {0: 0}}
+    assert state_size(compacted) <= 1000
+    assert memory_profiler.profile.report()["compactions"] == 1
+
+
+def test_compact_state_keeps_small_results():
+    state = make_state(results=2, result_size=10)
+    assert compact_state(state, 10_000)["web_research_result"] == state["web_research_result"]
@@ -0,0 +1,37 @@
+import os
+from unittest.mock import patch
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.metrics import Metrics
+
+
+def test_counters_timings_and_reports():
+    metrics = Metrics()
+    metrics.increment("calls")
+    metrics.increment("calls", 2)
+    metrics.observe("latency", 1.0)
+    metrics.observe("latency", 3.0)
+    metrics.gauge("depth", lambda: 4)
+    metrics.register_report("derived", lambda: {"double": metrics.counter("calls") * 2})
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["counters"] == {"calls": 3}
+    assert snapshot["timings"]["latency"]["mean_seconds"] == 2.0
+    assert snapshot["gauges"] == {"depth": 4}
+    assert snapshot["reports"] == {"derived": {"double": 6}}
+
+
+def test_timer_and_reset():
+    metrics = Metrics()
+    with metrics.timer("block"):
+        pass
+    assert metrics.snapshot()["timings"]["block"]["count"] == 1
+
+    metrics.reset()
+    assert metrics.mean("block") == 0.0
+    assert metrics.counter("calls") == 0
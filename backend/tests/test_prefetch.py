@@ -0,0 +1,176 @@
+import os
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.jobs import InMemoryStreamClient, JobQueue
+    from src.agent.prefetch import (
+        Prefetcher,
+        lookup_prompt,
+        lookup_sections,
+        rank_restaurants,
+    )
+    from src.agent.query_planner import parse_lookup
+    from src.agent.research_cache import SECTION_TTLS, ResearchCache, restaurant_key
+    from src.agent.worker import run_worker
+
+
+def place(id, name, lat, lon, **details):
+    return {"id": id, "name": name, "lat": lat, "lon": lon, **details}
+
+
+VIEWPORT = [
+    place("1", "Din Tai Fung", 1.3000, 103.8000, address="290 Orchard Rd"),
+    place("2", "Jumbo Seafood", 1.3040, 103.8040),
+    place("3", "Unnamed", 1.3001, 103.8001),
+    place("4", "Tim Ho Wan", 1.3020, 103.8020, cuisine="dim_sum"),
+]
+
+
+@pytest.fixture
+def cache():
+    return ResearchCache(FakeRedis())
+
+
+@pytest.fixture
+def prefetcher(cache):
+    return Prefetcher(JobQueue(InMemoryStreamClient(), stream="research:prefetch"), cache, max_per_viewport=2)
+
+
+def test_lookup_prompt_matches_mobile_app():
+    assert lookup_prompt("Din Tai Fung", "290 Orchard Rd") == (
+        "Research about Din Tai Fung restaurant/amenity  located at 290 Orchard Rd. "
+        "Provide food and user reviews, what the menu entails, and the price range."
+    )
+    assert parse_lookup(lookup_prompt("Din Tai Fung", "290 Orchard Rd")) == ("Din Tai Fung", "290 Orchard Rd")
+    assert parse_lookup(lookup_prompt("Din Tai Fung")) == ("Din Tai Fung", "")
+
+
+class TestRanking:
+    def test_closest_to_center_first_and_unnamed_dropped(self):
+        ranked = rank_restaurants(VIEWPORT, center={"lat": 1.3, "lon": 103.8})
+        assert [r["id"] for r in ranked] == ["1", "4", "2"]
+
+    def test_bbox_filters_and_sets_center(self):
+        bbox = {"south": 1.301, "west": 103.801, "north": 1.305, "east": 103.805}
+        ranked = rank_restaurants(VIEWPORT, bbox=bbox)
+        assert [r["id"] for r in ranked] == ["4", "2"]
+
+    def test_details_break_ties(self):
+        ranked = rank_restaurants([
+            place("a", "Plain", 1.0, 103.0),
+            place("b", "Detailed", 1.0, 103.0, address="x", cuisine="y", website="z"),
+        ])
+        assert ranked[0]["id"] == "b"
+
+
+class TestPrefetcher:
+    def test_schedules_top_candidates(self, prefetcher):
+        result = prefetcher.schedule("s1", VIEWPORT, center={"lat": 1.3, "lon": 103.8})
+        assert [item["id"] for item in result["scheduled"]] == ["1", "4"]
+
+        job = prefetcher.queue.status(result["scheduled"][0]["job_id"])
+        assert job["status"] == "queued"
+        _, _, payload = prefetcher.queue.claim("w", block_ms=10)[0]
+        assert payload["topic"] == lookup_prompt("Din Tai Fung", "290 Orchard Rd")
+        assert payload["priority"] == "batch"
+
+    def test_fresh_restaurants_are_skipped(self, prefetcher, cache):
+        key = restaurant_key(lookup_prompt("Din Tai Fung", "290 Orchard Rd"))
+        for section in ("menu", "reviews"):
+            cache.add_result(key, section, {"search_query": [section], "web_research_result": [], "sources_gathered": []})
+
+        result = prefetcher.schedule("s1", VIEWPORT, center={"lat": 1.3, "lon": 103.8})
+        assert result["cached"] == ["1"]
+        assert [item["id"] for item in result["scheduled"]] == ["4", "2"]
+
+    def test_without_the_fast_path_every_section_must_be_fresh(self, prefetcher, cache):
+        key = restaurant_key(lookup_prompt("Din Tai Fung", "290 Orchard Rd"))
+        for section in ("menu", "reviews"):
+            cache.add_result(key, section, {"search_query": [section], "web_research_result": [], "sources_gathered": []})
+
+        # The tap's LLM-generated queries may search other sections
+        configurable = {"enable_query_fast_path": False}
+        result = prefetcher.schedule("s1", VIEWPORT, center={"lat": 1.3, "lon": 103.8}, configurable=configurable)
+        assert result["cached"] == []
+        assert [item["id"] for item in result["scheduled"]] == ["1", "4"]
+        assert prefetcher.queue.claim("w", block_ms=10)[0][2]["configurable"]["enable_query_fast_path"] is False
+
+        for section in SECTION_TTLS:
+            cache.add_result(key, section, {"search_query": [section], "web_research_result": [], "sources_gathered": []})
+        result = prefetcher.schedule("s2", VIEWPORT, center={"lat": 1.3, "lon": 103.8}, configurable=configurable)
+        assert result["cached"] == ["1"]
+
+    def test_lookup_sections_follow_the_query_path(self):
+        topic = lookup_prompt("Din Tai Fung", "290 Orchard Rd")
+        assert lookup_sections(topic) == {"menu", "reviews"}
+        assert lookup_sections(topic, {"number_of_initial_queries": 1}) == {"reviews"}
+        assert lookup_sections(topic, {"enable_query_fast_path": False}) == set(SECTION_TTLS)
+
+    def test_viewport_change_cancels_dropped_runs(self, prefetcher):
+        first = prefetcher.schedule("s1", VIEWPORT[:2])
+        jobs = {item["id"]: item["job_id"] for item in first["scheduled"]}
+
+        second = prefetcher.schedule("s1", [VIEWPORT[1], VIEWPORT[3]])
+        assert second["cancelled"] == 1
+        assert prefetcher.queue.status(jobs["1"])["status"] == "cancelled"
+        # Still-visible restaurants keep their queued run
+        assert {item["job_id"] for item in second["scheduled"]} >= {jobs["2"]}
+
+        # Cancelled runs are acknowledged instead of being handed to a worker
+        claimed = [job_id for _, job_id, _ in prefetcher.queue.claim("w", count=10, block_ms=10)]
+        assert jobs["1"] not in claimed
+
+    def test_shared_runs_survive_other_sessions(self, prefetcher):
+        job_id = prefetcher.schedule("s1", VIEWPORT[:1])["scheduled"][0]["job_id"]
+        assert prefetcher.schedule("s2", VIEWPORT[:1])["scheduled"][0]["job_id"] == job_id
+
+        assert prefetcher.cancel("s1") == 0
+        assert prefetcher.queue.status(job_id)["status"] == "queued"
+        assert prefetcher.cancel("s2") == 1
+
+    def test_backpressure(self, cache):
+        queue = JobQueue(InMemoryStreamClient(), stream="research:prefetch")
+        queue.enqueue("other")
+        prefetcher = Prefetcher(queue, cache, max_queue_depth=1)
+        assert prefetcher.schedule("s1", VIEWPORT)["scheduled"] == []
+
+
+def test_worker_prefers_interactive_jobs():
+    client = InMemoryStreamClient()
+    interactive = JobQueue(client)
+    background = JobQueue(client, stream="research:prefetch")
+    background.enqueue("prefetch")
+    interactive.enqueue("tap")
+
+    topics = []
+    done = threading.Event()
+    graph = Mock()
+
+    def invoke(state, config):
+        topics.append(state["messages"][0].content)
+        if len(topics) == 2:
+            done.set()
+        return {"messages": [AIMessage(content="ok")], "sources_gathered": []}
+
+    graph.invoke.side_effect = invoke
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=run_worker, args=(interactive, graph, "w", stop), kwargs={"block_ms": 50, "background": background}
+    )
+    thread.start()
+    try:
+        assert done.wait(5)
+    finally:
+        stop.set()
+        thread.join(5)
+    assert topics == ["tap", "prefetch"]
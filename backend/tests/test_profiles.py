@@ -0,0 +1,73 @@
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.configuration import Configuration
+    from src.agent.profiles import PROFILES, apply_profile, get_profile
+    from src.agent.research_cache import ResearchCache
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+
+
+def run_graph(graph, configurable):
+    response = Mock(text="Din Tai Fung summary", candidates=[Mock(grounding_metadata=None)])
+    answer = Mock(invoke=Mock(return_value=AIMessage(content="Final answer")))
+    insufficient = Reflection(is_sufficient=False, knowledge_gap="prices", follow_up_queries=["Din Tai Fung prices"])
+    with patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+         patch.object(graph_module.genai_client.models, "generate_content", return_value=response) as search, \
+         patch.object(graph_module, "invoke_structured", return_value=insufficient) as reflect, \
+         patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        state = graph.invoke(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")]},
+            {"configurable": configurable},
+        )
+    return state, search.call_count, reflect.call_count, answer.invoke.call_args.args[0]
+
+
+def test_unknown_profile_falls_back_to_full():
+    assert get_profile(Configuration(graph_profile="tiny")) is PROFILES["full"]
+
+
+def test_apply_profile_caps_depth():
+    depth = apply_profile({"initial_queries": 3, "max_research_loops": 2}, PROFILES["lite"])
+    assert (depth["initial_queries"], depth["max_research_loops"], depth["profile"]) == (1, 0, "lite")
+    depth = apply_profile({"initial_queries": 3, "max_research_loops": 2}, PROFILES["full"])
+    assert (depth["initial_queries"], depth["max_research_loops"]) == (3, 2)
+
+
+def test_full_profile_reflects_and_writes_report():
+    state, searches, reflections, prompt = run_graph(graph_module.graph, {"max_research_loops": 2})
+    # Two planned queries and one follow-up
+    assert (searches, reflections) == (2 + 1, 2)
+    assert state["research_depth"]["profile"] == "full"
+    assert "## 💰 Pricing" in prompt
+
+
+@pytest.mark.parametrize("graph_name, configurable", [
+    ("graph", {"graph_profile": "lite"}),
+    ("lite_graph", {}),
+])
+def test_lite_profile_searches_once_without_reflection(graph_name, configurable):
+    state, searches, reflections, prompt = run_graph(getattr(graph_module, graph_name), configurable)
+    assert (searches, reflections) == (1, 0)
+    assert state["messages"][-1].content == "Final answer"
+    assert state["research_depth"]["profile"] == "lite"
+    assert "at most 3 sentences" in prompt
+    assert "## 💰 Pricing" not in prompt
+
+
+def test_lite_graph_has_no_reflection_node():
+    assert "reflection" not in graph_module.lite_graph.get_graph().nodes
+    assert "reflection" in graph_module.graph.get_graph().nodes
@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+from types import SimpleNamespace as NS
+from unittest.mock import Mock, patch
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    # `app` runs the graph it imports itself
+    import agent.graph  # noqa: F401
+    import src.agent.graph  # noqa: F401
+    from src.agent.app import app
+    from src.agent.research_cache import ResearchCache
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+app_graph_module = sys.modules["agent.graph"]
+
+
+def grounded_response(text, url):
+    chunk = NS(web=NS(uri=url, title=url.split("//")[1]))
+    support = NS(segment=NS(start_index=0, end_index=len(text)), grounding_chunk_indices=[0])
+    return NS(text=text, candidates=[NS(grounding_metadata=NS(grounding_chunks=[chunk], grounding_supports=[support]))])
+
+
+def mocked_run(module=graph_module):
+    searches = [
+        grounded_response("Dumplings are $12.", "https://burpple.com"),
+        grounded_response("Queues are long.", "https://eatbook.sg"),
+        grounded_response("Open till 10pm.", "https://dintaifung.com.sg"),
+    ]
+    reflections = [
+        Reflection(is_sufficient=False, knowledge_gap="hours", follow_up_queries=["Din Tai Fung Orchard opening hours"]),
+        Reflection(is_sufficient=True, knowledge_gap="", follow_up_queries=[]),
+    ]
+    answer = Mock(invoke=Mock(return_value=AIMessage(content="Final answer")))
+    return (
+        patch.object(module, "get_research_cache", return_value=ResearchCache(FakeRedis())),
+        patch.object(module.genai_client.models, "generate_content", side_effect=searches),
+        patch.object(module, "invoke_structured", side_effect=reflections),
+        patch.object(module, "ChatGoogleGenerativeAI", return_value=answer),
+    )
+
+
+def test_events_arrive_in_order_before_the_answer():
+    cache, search, reflect, answer = mocked_run()
+    with cache, search, reflect, answer:
+        chunks = list(graph_module.graph.stream(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")]},
+            {"configurable": {"number_of_initial_queries": 2}},
+            stream_mode=["custom", "updates"],
+        ))
+
+    events = [chunk["event"] for mode, chunk in chunks if mode == "custom"]
+    assert events == [
+        "queries_generated",
+        "branch_completed", "branch_completed",
+        "reflection", "research_decision",
+        "branch_completed",
+        "reflection", "research_decision",
+        "answer_started",
+    ]
+    progress = [chunk for mode, chunk in chunks if mode == "custom"]
+    assert len(progress[0]["queries"]) == 2
+    assert {source["url"] for event in progress[1:3] for source in event["sources"]} == {
+        "https://burpple.com", "https://eatbook.sg",
+    }
+    assert progress[4] == {**progress[4], "action": "continue", "research_loop_count": 1}
+    assert progress[7]["action"] == "finalize"
+
+    # Sources are streamed before the answer node produces its update
+    first_branch = next(i for i, (mode, chunk) in enumerate(chunks) if mode == "custom" and chunk["event"] == "branch_completed")
+    answer_update = next(i for i, (mode, chunk) in enumerate(chunks) if mode == "updates" and "finalize_answer" in chunk)
+    assert first_branch < answer_update
+
+
+def test_nodes_called_directly_do_not_emit():
+    state = {"is_sufficient": True, "research_loop_count": 1, "follow_up_queries": []}
+    assert graph_module.evaluate_research(state, {"configurable": {}}) == ["finalize_answer"]
+
+
+def test_research_stream_endpoint():
+    cache, search, reflect, answer = mocked_run(app_graph_module)
+    client = TestClient(app)
+    with cache, search, reflect, answer:
+        response = client.post("/research/stream", json={
+            "topic": "Tell me about Din Tai Fung at Orchard",
+            "configurable": {"number_of_initial_queries": 2},
+        })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    names = [block.split("\n")[0] for block in blocks]
+    assert names[0] == "event: progress"
+    assert names[-1] == "event: answer"
+    final = json.loads(blocks[-1].split("data: ", 1)[1])
+    assert final["answer"] == "Final answer"
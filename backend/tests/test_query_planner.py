@@ -0,0 +1,101 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.query_planner import (
+        fast_path_report,
+        metrics,
+        parse_lookup,
+        plan_queries,
+    )
+    from src.agent.research_cache import restaurant_key
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestParseLookup:
+    def test_mobile_app_prompt(self):
+        topic = (
+            "Research about Din Tai Fung restaurant/amenity  located at 290 Orchard Rd, Singapore. "
+            "Provide food and user reviews, what the menu entails, and the price range."
+        )
+        assert parse_lookup(topic) == ("Din Tai Fung", "290 Orchard Rd, Singapore")
+
+    def test_mobile_app_prompt_without_address(self):
+        topic = (
+            "Research about Din Tai Fung restaurant/amenity . "
+            "Provide food and user reviews, what the menu entails, and the price range."
+        )
+        assert parse_lookup(topic) == ("Din Tai Fung", "")
+
+    @pytest.mark.parametrize("topic, expected", [
+        ("Tell me about Jumbo Seafood at Clarke Quay", ("Jumbo Seafood", "Clarke Quay")),
+        ("Research about Tim Ho Wan", ("Tim Ho Wan", "")),
+        ("what about Burger King in Tampines?", ("Burger King", "Tampines")),
+        ("Look up Din Tai Fung in Orchard", ("Din Tai Fung", "Orchard")),
+    ])
+    def test_simple_lookups(self, topic, expected):
+        assert parse_lookup(topic) == expected
+
+    @pytest.mark.parametrize("topic", [
+        "What are good restaurants in SF?",
+        "Compare Din Tai Fung and Paradise Dynasty",
+        "Which is cheaper, A or B?",
+        "User: Tell me about A\nAssistant: A is great\nUser: and its halal options?\n",
+        "",
+    ])
+    def test_complex_questions_fall_back(self, topic):
+        assert parse_lookup(topic) is None
+
+    @pytest.mark.parametrize("topic", [
+        "Tell me about the prices and dietary options at Din Tai Fung",
+        "Tell me about the vegan options at Din Tai Fung",
+        "Opening hours of Jumbo at Clarke Quay",
+        "Tell me about Din Tai Fung at Orchard and its prices",
+        "Italian restaurants in San Francisco",
+        "halal food in Bugis",
+        "Good coffee in Tiong Bahru?",
+    ])
+    def test_aspect_and_category_questions_fall_back(self, topic):
+        assert parse_lookup(topic) is None
+
+    @pytest.mark.parametrize("topic", [
+        "I am in a hurry",
+        "We are at the airport.",
+        "My friends are in town this weekend",
+        "Din Tai Fung in Orchard",
+    ])
+    def test_sentences_without_a_lookup_verb_fall_back(self, topic):
+        assert parse_lookup(topic) is None
+        assert plan_queries(topic, 3) is None
+        assert restaurant_key(topic) is None
+
+
+class TestPlanQueries:
+    def test_respects_query_count(self):
+        assert plan_queries("Tell me about A at B", 1) == ["A B customer reviews"]
+        assert len(plan_queries("Tell me about A at B", 3)) == 2
+
+    def test_report_counts_fast_path_and_savings(self):
+        plan_queries("Tell me about A at B", 2)
+        plan_queries("Tell me about A at B", 2)
+        plan_queries("Compare A and B", 2)
+        metrics.observe("query_planner.llm_seconds", 1.5)
+
+        report = fast_path_report()
+
+        assert report["fast_path"] == 2
+        assert report["llm_fallback"] == 1
+        assert report["fast_path_rate"] == pytest.approx(2 / 3)
+        assert report["estimated_seconds_saved"] == pytest.approx(3.0)
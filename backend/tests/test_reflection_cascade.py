@@ -0,0 +1,74 @@
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.configuration import Configuration
+    from src.agent.reflection_cascade import cascade_reflection, cascade_report, metrics
+    from src.agent.tools_and_schemas import CascadeReflection
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def make_reflection(confidence):
+    return CascadeReflection(
+        is_sufficient=True, knowledge_gap="", follow_up_queries=[], confidence=confidence
+    )
+
+
+@pytest.fixture
+def configurable():
+    return Configuration(
+        reflection_cascade=True,
+        reflection_cascade_model="cheap-model",
+        reflection_cascade_threshold=0.7,
+    )
+
+
+def test_confident_cheap_model_is_accepted(configurable):
+    invoke = Mock(return_value=make_reflection(0.9))
+
+    result = cascade_reflection("prompt", configurable, invoke)
+
+    assert result.is_sufficient is True
+    model, prompt, schema = invoke.call_args.args
+    assert model == "cheap-model"
+    assert "confidence" in prompt
+    assert schema.__name__ == "CascadeReflection"
+
+
+def test_low_confidence_escalates(configurable):
+    assert cascade_reflection("prompt", configurable, Mock(return_value=make_reflection(0.3))) is None
+    assert metrics.counter("reflection_cascade.escalations.low_confidence") == 1
+
+
+@pytest.mark.parametrize("invoke", [
+    Mock(side_effect=ValueError("schema validation failed")),
+    Mock(return_value=None),
+])
+def test_invalid_output_escalates(configurable, invoke):
+    assert cascade_reflection("prompt", configurable, invoke) is None
+    assert metrics.counter("reflection_cascade.escalations.invalid_output") == 1
+
+
+def test_report_escalation_rate(configurable):
+    cascade_reflection("prompt", configurable, Mock(return_value=make_reflection(0.9)))
+    cascade_reflection("prompt", configurable, Mock(return_value=make_reflection(0.9)))
+    cascade_reflection("prompt", configurable, Mock(return_value=make_reflection(0.1)))
+    cascade_reflection("prompt", configurable, Mock(return_value=None))
+
+    report = cascade_report()
+
+    assert report["calls"] == 4
+    assert report["accepted"] == 2
+    assert report["escalation_rate"] == 0.5
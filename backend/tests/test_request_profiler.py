@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.research_cache import ResearchCache
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+request_profiler = sys.modules[graph_module.request_profiled.__module__]
+
+
+def slow_search(**kwargs):
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return Mock(text="Din Tai Fung summary", candidates=[Mock(grounding_metadata=None)])
+
+
+def run_graph(configurable):
+    answer = Mock(invoke=Mock(return_value=AIMessage(content="Final answer")))
+    with patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+         patch.object(graph_module.genai_client.models, "generate_content", side_effect=slow_search), \
+         patch.object(graph_module, "invoke_structured", return_value=Reflection(
+             is_sufficient=True, knowledge_gap="", follow_up_queries=[])), \
+         patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        return graph_module.graph.invoke(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")]},
+            {"configurable": {"number_of_initial_queries": 2, **configurable}},
+        )
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILING_ADMIN_TOKEN", "secret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_INTERVAL_SECONDS", "0.001")
+
+
+def granted(**configurable):
+    return {**configurable, "langgraph_auth_permissions": request_profiler.profile_permissions("secret")}
+
+
+def test_profiled_run_reports_nodes_and_flamegraph(tmp_path):
+    state = run_graph(granted(profile_run=True))
+
+    profile = state["profile"]
+    assert set(profile["nodes"]) == {"generate_query", "web_research", "reflection", "finalize_answer"}
+    assert profile["nodes"]["web_research"]["calls"] == 2
+    assert profile["nodes"]["web_research"]["wall_ms"] >= 80
+    assert profile["nodes"]["web_research"]["samples"] > 0
+
+    lines = profile["flamegraph"].splitlines()
+    assert any(line.startswith("web_research;") and "test_request_profiler:slow_search" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    with open(profile["artifact"], encoding="utf-8") as handle:
+        assert handle.read().strip() == profile["flamegraph"]
+    assert request_profiler._active == {}
+
+
+def test_profile_header_forwarded_by_langgraph_api_enables_profiling():
+    state = run_graph(granted(**{"x-profile": "1"}))
+    assert "nodes" in state["profile"]
+
+
+def test_only_a_valid_token_grants_the_permission():
+    assert request_profiler.profile_permissions("secret") == [request_profiler.PROFILE_PERMISSION]
+    assert request_profiler.profile_permissions("guess") == []
+    assert request_profiler.profile_permissions(None) == []
+
+
+def test_token_in_configurable_is_ignored():
+    assert "profile" not in run_graph({"profile_run": True, "profile_token": "secret"})
+    assert "profile" not in run_graph({"x-profile": "1", "x-profile-token": "secret"})
+
+
+def test_disabled_without_admin_token(monkeypatch):
+    permissions = granted()["langgraph_auth_permissions"]
+    monkeypatch.delenv("PROFILING_ADMIN_TOKEN")
+    assert request_profiler.profile_permissions("secret") == []
+    state = run_graph({"profile_run": True, "langgraph_auth_permissions": permissions})
+    assert "profile" not in state
+
+
+def test_off_by_default():
+    state = run_graph({})
+    assert "profile" not in state
+    assert request_profiler._active == {}
@@ -0,0 +1,178 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.research_cache import (
+        SECTION_TTLS,
+        ResearchCache,
+        classify_query,
+        rebase_result,
+        restaurant_key,
+    )
+
+# `src.agent.graph` resolves to the compiled graph re-exported by the package
+graph_module = sys.modules["src.agent.graph"]
+
+
+def make_result(query, short_id=0):
+    short_url = f"https://vertexaisearch.cloud.google.com/id/{short_id}-0"
+    return {
+        "search_query": [query],
+        "web_research_result": [f"Found it [Site]({short_url})"],
+        "sources": {"urls": ["https://site.com"], "labels": ["Site"], "refs": {short_id * 1000: 0}},
+    }
+
+
+class TestClassifyQuery:
+    @pytest.mark.parametrize("query, section", [
+        ("Din Tai Fung Orchard menu signature dishes", "menu"),
+        ("Din Tai Fung Orchard price range", "pricing"),
+        ("Din Tai Fung Orchard customer reviews", "reviews"),
+        ("Din Tai Fung Orchard latest promotions", "updates"),
+        ("Din Tai Fung Orchard halal vegetarian options", "dietary"),
+        ("Din Tai Fung Orchard opening hours parking", "updates"),
+        ("Din Tai Fung Orchard parking", "others"),
+    ])
+    def test_sections(self, query, section):
+        assert classify_query(query) == section
+
+
+def test_restaurant_key_uses_name_and_location_not_wording():
+    key = restaurant_key("Tell me about Din Tai Fung at Orchard!")
+    assert key == restaurant_key("look up din tai  fung in orchard")
+    assert key == restaurant_key(
+        "Research about Din Tai Fung restaurant/amenity located at Orchard. "
+        "Provide food and user reviews, what the menu entails, and the price range."
+    )
+    assert key != restaurant_key("Tell me about Din Tai Fung at Jewel")
+    assert key != restaurant_key("Tell me about Jumbo Seafood at Orchard")
+
+
+def test_questions_that_are_not_lookups_have_no_key():
+    assert restaurant_key("Which ramen places near Bugis are good for a date?") is None
+
+
+def test_rebase_result_rewrites_short_urls():
+    rebased = rebase_result(make_result("q", short_id=7), 2)
+    assert "/id/2-0" in rebased["web_research_result"][0]
+    assert rebased["sources"]["refs"] == {2000: 0}
+    assert rebased["sources"]["urls"] == ["https://site.com"]
+
+
+def test_results_cached_as_segment_lists_are_converted():
+    short_url = "https://vertexaisearch.cloud.google.com/id/7-0"
+    legacy = {
+        "search_query": ["q"],
+        "web_research_result": [f"Found it [Site]({short_url})"],
+        "sources_gathered": [{"label": "Site", "short_url": short_url, "value": "https://site.com"}] * 3,
+    }
+    rebased = rebase_result(legacy, 2)
+    assert rebased["sources"] == {"urls": ["https://site.com"], "labels": ["Site"], "refs": {2000: 0}}
+
+
+class TestResearchCache:
+    def test_sections_have_independent_ttls(self):
+        client = FakeRedis()
+        cache = ResearchCache(client)
+
+        cache.add_result("r1", "menu", make_result("menu"))
+        cache.add_result("r1", "updates", make_result("promotions"))
+
+        assert client.ttls["research:r1:menu"] == SECTION_TTLS["menu"]
+        assert client.ttls["research:r1:updates"] == SECTION_TTLS["updates"]
+        assert set(cache.get_sections("r1")) == {"menu", "updates"}
+        assert cache.get_sections("r2") == {}
+
+    def test_same_query_replaces_entry(self):
+        cache = ResearchCache(FakeRedis())
+        cache.add_result("r1", "menu", make_result("menu"))
+        cache.add_result("r1", "menu", make_result("menu"))
+        cache.add_result("r1", "menu", make_result("menu items"))
+
+        assert len(cache.get_sections("r1")["menu"]) == 2
+        assert len(cache.get_stale("r1", "menu")) == 2
+
+    def test_parallel_writes_keep_every_result(self):
+        cache = ResearchCache(FakeRedis())
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: cache.add_result("r1", "menu", make_result(f"menu {i}")), range(8)))
+
+        assert len(cache.get_sections("r1")["menu"]) == 8
+
+    def test_stale_copy_is_capped(self):
+        cache = ResearchCache(FakeRedis(), stale_max_entries=3)
+        for i in range(10):
+            cache.add_result("r1", "menu", make_result(f"menu {i}"))
+
+        stale = cache.get_stale("r1", "menu")
+        assert [entry["search_query"] for entry in stale] == [["menu 7"], ["menu 8"], ["menu 9"]]
+
+    def test_redis_errors_are_misses(self):
+        client = Mock()
+        client.pipeline.return_value.execute.side_effect = ConnectionError("down")
+        assert ResearchCache(client).get_sections("r1") == {}
+
+
+class TestPlanCachedResearch:
+    def test_only_stale_sections_are_searched(self):
+        topic = "Tell me about Din Tai Fung at Orchard"
+        cache = ResearchCache(FakeRedis())
+        cache.add_result(restaurant_key(topic), "menu", make_result("menu dishes", short_id=4))
+        state = {"messages": [HumanMessage(content=topic)]}
+
+        with patch.object(graph_module, "get_research_cache", return_value=cache):
+            plan = graph_module.plan_cached_research(
+                state, ["Din Tai Fung Orchard menu", "Din Tai Fung Orchard reviews"]
+            )
+
+        assert plan["query_list"] == ["Din Tai Fung Orchard reviews"]
+        assert plan["search_query"] == ["menu dishes"]
+        assert "/id/0-0" in plan["web_research_result"][0]
+        assert plan["restaurant_key"] == restaurant_key(topic)
+
+    def test_later_turns_and_new_conversations_share_the_cache(self):
+        topic = "Tell me about Din Tai Fung at Orchard"
+        cache = ResearchCache(FakeRedis())
+        cache.add_result(restaurant_key(topic), "menu", make_result("menu dishes"))
+        later_turn = {"messages": [
+            HumanMessage(content="Where should I eat near Bugis?"),
+            AIMessage(content="Try the hawker centre."),
+            HumanMessage(content=topic),
+        ]}
+
+        with patch.object(graph_module, "get_research_cache", return_value=cache):
+            plan = graph_module.plan_cached_research(later_turn, ["Din Tai Fung Orchard menu"])
+
+        assert plan["query_list"] == []
+        assert plan["search_query"] == ["menu dishes"]
+
+    def test_open_questions_skip_the_cache(self):
+        cache = Mock()
+        state = {"messages": [HumanMessage(content="Which ramen places near Bugis are good for a date?")]}
+        with patch.object(graph_module, "get_research_cache", return_value=cache):
+            plan = graph_module.plan_cached_research(state, ["ramen Bugis"])
+
+        assert plan == {"query_list": ["ramen Bugis"], "restaurant_key": ""}
+        cache.get_sections.assert_not_called()
+
+    def test_all_cached_routes_to_reflection(self):
+        state = {"query_list": [], "search_query": ["cached"], "restaurant_key": "r1"}
+        assert graph_module.continue_to_web_research(state) == "reflection"
+
+    def test_web_research_ids_follow_cached_results(self):
+        state = {"query_list": ["a", "b"], "search_query": ["cached"], "restaurant_key": "r1"}
+        sends = graph_module.continue_to_web_research(state)
+        assert [send.arg["id"] for send in sends] == [1, 2]
+        assert sends[0].arg["restaurant_key"] == "r1"
@@ -0,0 +1,256 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.configuration import Configuration
+    from src.agent.research_cache import STALE_TTL, ResearchCache
+
+graph_module = sys.modules["src.agent.graph"]
+# The graph imports `agent.resilience`; share its breaker registry
+resilience = sys.modules[graph_module.guarded_call.__module__]
+CircuitBreaker = resilience.CircuitBreaker
+CircuitOpenError = resilience.CircuitOpenError
+UpstreamTimeoutError = resilience.UpstreamTimeoutError
+breaker_report = resilience.breaker_report
+guarded_call = resilience.guarded_call
+
+
+def make_result(query, short_id=0):
+    short_url = f"https://vertexaisearch.cloud.google.com/id/{short_id}-0"
+    return {
+        "search_query": [query],
+        "web_research_result": [f"Found it [Site]({short_url})"],
+        "sources": {"urls": ["https://site.com"], "labels": ["Site"], "refs": {short_id * 1000: 0}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    resilience.metrics.reset()
+    yield
+    resilience.metrics.reset()
+
+
+def fail():
+    raise ConnectionError("upstream down")
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        assert breaker.state == "half_open"
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0)
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+
+class TestGuardedCall:
+    def test_returns_result(self):
+        assert guarded_call(lambda: 42, "model", timeout=1) == 42
+
+    def test_open_breaker_short_circuits(self):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                guarded_call(fail, "model", timeout=1, failure_threshold=2)
+
+        calls = []
+        with pytest.raises(CircuitOpenError):
+            guarded_call(lambda: calls.append(1), "model", timeout=1, failure_threshold=2)
+        assert calls == []
+
+        report = breaker_report()
+        assert report["short_circuited"] == 1
+        assert report["failures"] == 2
+        assert report["breakers"]["model"]["state"] == "open"
+
+    def test_timeout_counts_as_failure(self):
+        with pytest.raises(UpstreamTimeoutError):
+            guarded_call(lambda: time.sleep(0.5), "slow", timeout=0.05, failure_threshold=1)
+        assert resilience.get_breaker("slow").state == "open"
+        assert breaker_report()["timeouts"] == 1
+
+    def test_bad_responses_do_not_open_breaker(self):
+        def invalid():
+            raise ValueError("response did not match the schema")
+
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                guarded_call(invalid, "model", timeout=1, failure_threshold=1)
+        assert resilience.get_breaker("model").state == "closed"
+        assert breaker_report()["request_errors"] == 3
+
+    @pytest.mark.parametrize("error", [
+        type("ServerError", (Exception,), {"code": 503})("unavailable"),
+        type("StatusError", (Exception,), {"status_code": 500})("internal"),
+    ])
+    def test_server_errors_open_breaker(self, error):
+        def wrapped():
+            try:
+                raise error
+            except Exception as e:
+                raise RuntimeError("model call failed") from e
+
+        with pytest.raises(RuntimeError):
+            guarded_call(wrapped, "model", timeout=1, failure_threshold=1)
+        assert resilience.get_breaker("model").state == "open"
+
+    def test_queue_time_does_not_count(self, monkeypatch):
+        monkeypatch.setattr(resilience, "_executor", ThreadPoolExecutor(max_workers=1))
+        busy = threading.Thread(target=guarded_call, args=(lambda: time.sleep(0.2), "busy", 1))
+        busy.start()
+        time.sleep(0.02)
+        started = time.monotonic()
+        assert guarded_call(lambda: time.sleep(0.2) or "ok", "model", timeout=0.3) == "ok"
+        busy.join()
+        assert time.monotonic() - started > 0.3
+
+    def test_queue_timeout_cancels_without_failure(self, monkeypatch):
+        monkeypatch.setattr(resilience, "_executor", ThreadPoolExecutor(max_workers=1))
+        busy = threading.Thread(target=guarded_call, args=(lambda: time.sleep(0.3), "busy", 1))
+        busy.start()
+        time.sleep(0.02)
+        calls = []
+        with pytest.raises(UpstreamTimeoutError):
+            guarded_call(lambda: calls.append(1), "model", timeout=0.05, failure_threshold=1)
+        busy.join()
+        time.sleep(0.05)
+        assert calls == []
+        assert resilience.get_breaker("model").state == "closed"
+        assert breaker_report()["queue_timeouts"] == 1
+
+    def test_breakers_are_per_model(self):
+        with pytest.raises(ConnectionError):
+            guarded_call(fail, "a", timeout=1, failure_threshold=1)
+        assert guarded_call(lambda: "ok", "b", timeout=1) == "ok"
+
+
+class TestStaleCache:
+    def test_stale_copy_outlives_section_ttl(self):
+        client = FakeRedis()
+        cache = ResearchCache(client)
+        cache.add_result("r1", "menu", make_result("menu"))
+
+        assert client.ttls["research:stale:r1:menu"] == STALE_TTL
+        client.expire_fresh()
+        assert cache.get_sections("r1") == {}
+        assert cache.get_stale("r1", "menu")[0]["search_query"] == ["menu"]
+
+    def test_web_research_serves_stale_result_on_failure(self):
+        cache = ResearchCache(FakeRedis())
+        cache.add_result("r1", "menu", make_result("Din Tai Fung menu", short_id=3))
+        cache.add_result("r1", "menu", make_result("Din Tai Fung signature dishes", short_id=4))
+        state = {"search_query": "Din Tai Fung menu", "id": 5, "restaurant_key": "r1"}
+
+        with patch.object(graph_module, "get_research_cache", return_value=cache), \
+             patch.object(graph_module.genai_client.models, "generate_content", side_effect=fail):
+            result = graph_module.web_research(state, {"configurable": {}})
+
+        assert result["search_query"] == ["Din Tai Fung menu"]
+        assert "/id/5-0" in result["web_research_result"][0]
+        assert result["sources"]["refs"] == {5000: 0}
+        assert breaker_report()["stale_served"] == 1
+
+    def test_web_research_without_cache_returns_no_summary(self):
+        cache = ResearchCache(FakeRedis())
+        state = {"search_query": "Din Tai Fung reviews", "id": 0, "restaurant_key": "r1"}
+
+        with patch.object(graph_module, "get_research_cache", return_value=cache), \
+             patch.object(graph_module.genai_client.models, "generate_content", side_effect=fail):
+            result = graph_module.web_research(state, {"configurable": {}})
+
+        assert result == {
+            "sources": {"urls": [], "labels": [], "refs": {}},
+            "search_query": ["Din Tai Fung reviews"],
+            "web_research_result": [],
+        }
+
+    def test_open_breaker_skips_search(self):
+        configurable = Configuration(circuit_failure_threshold=1)
+        with pytest.raises(ConnectionError):
+            graph_module.guarded(fail, configurable.query_generator_model, configurable)
+
+        cache = ResearchCache(FakeRedis())
+        state = {"search_query": "Din Tai Fung reviews", "id": 0, "restaurant_key": "r1"}
+        with patch.object(graph_module, "get_research_cache", return_value=cache), \
+             patch.object(graph_module.genai_client.models, "generate_content") as generate:
+            graph_module.web_research(state, {"configurable": {}})
+
+        generate.assert_not_called()
+        assert breaker_report()["short_circuited"] == 1
+
+
+class TestGuardedModelCalls:
+    def open_breaker(self, model):
+        configurable = Configuration(circuit_failure_threshold=1)
+        with pytest.raises(ConnectionError):
+            graph_module.guarded(fail, model, configurable)
+
+    def test_open_breaker_skips_query_generation(self):
+        configurable = Configuration()
+        self.open_breaker(configurable.query_generator_model)
+        state = {"messages": [HumanMessage(content="Where should I eat tonight?")]}
+
+        with patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+             patch.object(graph_module, "ChatGoogleGenerativeAI") as llm:
+            result = graph_module.generate_query(state, {"configurable": {"enable_query_fast_path": False}})
+
+        llm.return_value.with_structured_output.return_value.invoke.assert_not_called()
+        assert result["query_list"] == ["Where should I eat tonight?"]
+        assert breaker_report()["short_circuited"] == 1
+
+    def test_open_breaker_fails_the_answer_fast(self):
+        configurable = Configuration()
+        self.open_breaker(configurable.answer_model)
+        state = {"messages": [HumanMessage(content="Din Tai Fung at Orchard")], "web_research_result": ["summary"]}
+
+        with patch.object(graph_module, "ChatGoogleGenerativeAI") as llm, pytest.raises(CircuitOpenError):
+            graph_module.finalize_answer(state, {"configurable": {}})
+
+        llm.return_value.invoke.assert_not_called()
+
+    def test_slow_answer_times_out(self):
+        state = {"messages": [HumanMessage(content="Din Tai Fung at Orchard")], "web_research_result": ["summary"]}
+
+        with patch.object(graph_module, "ChatGoogleGenerativeAI") as llm, pytest.raises(UpstreamTimeoutError):
+            llm.return_value.invoke.side_effect = lambda *args, **kwargs: time.sleep(0.5)
+            graph_module.finalize_answer(state, {"configurable": {"upstream_timeout_seconds": 0.05}})
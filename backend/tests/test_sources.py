@@ -0,0 +1,129 @@
+import os
+import sys
+from types import SimpleNamespace as NS
+from unittest.mock import Mock, patch
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.research_cache import ResearchCache
+    from src.agent.sources import (
+        cited_sources,
+        empty_sources,
+        make_ref,
+        merge_sources,
+        parse_ref,
+        resolve_citations,
+        short_url,
+        sources_from_segments,
+    )
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+
+SHORT = "https://vertexaisearch.cloud.google.com/id/"
+
+
+def table(*entries):
+    """Table from (ref, url, label) triples."""
+    return sources_from_segments(
+        {"short_url": short_url(ref), "value": url, "label": label} for ref, url, label in entries
+    )
+
+
+def test_refs_round_trip_short_urls():
+    assert make_ref(3, 12) == 3012
+    assert short_url(3012) == f"{SHORT}3-12"
+    assert parse_ref(f"{SHORT}3-12") == 3012
+    assert parse_ref("https://example.com") is None
+
+
+def test_segments_are_interned():
+    sources = sources_from_segments([
+        {"label": "burpple", "short_url": f"{SHORT}0-1", "value": "https://burpple.com/dtf"},
+        {"label": "burpple", "short_url": f"{SHORT}0-1", "value": "https://burpple.com/dtf"},
+        {"label": "burpple", "short_url": None, "value": "https://burpple.com/dtf"},
+    ])
+    assert sources == {"urls": ["https://burpple.com/dtf"], "labels": ["burpple"], "refs": {1: 0}}
+
+
+def test_merge_interns_urls_across_branches():
+    left = table((0, "https://a.com", "a"), (1, "https://b.com", "b"))
+    right = table((1000, "https://b.com", "b"), (1001, "https://c.com", "c"))
+    merged = merge_sources(left, right)
+
+    assert merged["urls"] == ["https://a.com", "https://b.com", "https://c.com"]
+    assert merged["refs"] == {0: 0, 1: 1, 1000: 1, 1001: 2}
+    # The reducer must not mutate the previous value
+    assert left["urls"] == ["https://a.com", "https://b.com"]
+    assert merge_sources(None, empty_sources()) == empty_sources()
+    assert merge_sources(merged, None) is merged
+
+
+def test_merge_normalises_json_refs():
+    assert merge_sources(None, {"urls": ["u"], "labels": ["l"], "refs": {"2003": 0}})["refs"] == {2003: 0}
+
+
+def test_cited_sources_drops_uncited_refs_and_urls():
+    sources = table((0, "https://a.com", "a"), (1, "https://b.com", "b"), (1000, "https://c.com", "c"), (1001, "https://c.com", "c"))
+    pruned = cited_sources(sources, [f"See [c]({SHORT}1-1) and [a]({SHORT}0-0).", "Nothing cited"])
+    assert pruned == {"urls": ["https://a.com", "https://c.com"], "labels": ["a", "c"], "refs": {0: 0, 1001: 1}}
+
+
+def test_resolve_citations_lists_each_url_once():
+    sources = table((3012, "https://tripadvisor.com/dtf", "tripadvisor"), (4000, "https://tripadvisor.com/dtf", "tripadvisor"))
+    text, used = resolve_citations(
+        f"Cheap [tripadvisor]({SHORT}3-12). Busy [tripadvisor]({SHORT}4-0). Odd [x]({SHORT}9-9).", sources
+    )
+    assert text == (
+        "Cheap [tripadvisor](https://tripadvisor.com/dtf). Busy [tripadvisor](https://tripadvisor.com/dtf). "
+        f"Odd [x]({SHORT}9-9)."
+    )
+    assert used == [{"label": "tripadvisor", "short_url": f"{SHORT}3-12", "value": "https://tripadvisor.com/dtf"}]
+
+
+def grounded_response(text, urls):
+    chunks = [NS(web=NS(uri=url, title=f"{url.split('//')[1]}")) for url in urls]
+    # Every sentence cites every chunk, as long grounded answers tend to
+    supports = [
+        NS(segment=NS(start_index=0, end_index=len(text)), grounding_chunk_indices=list(range(len(urls))))
+        for _ in range(5)
+    ]
+    metadata = NS(grounding_chunks=chunks, grounding_supports=supports)
+    return NS(text=text, candidates=[NS(grounding_metadata=metadata)])
+
+
+def test_parallel_branches_share_one_table():
+    responses = [
+        grounded_response("Dumplings are $12.", ["https://burpple.com", "https://eatbook.sg"]),
+        grounded_response("Queues are long.", ["https://eatbook.sg", "https://tripadvisor.com"]),
+    ]
+    answer = Mock()
+
+    def invoke(prompt, config=None):
+        # Cite every token the prompt offered
+        return AIMessage(content=" ".join(sorted(set(
+            token for token in prompt.split() if token.startswith("[c")
+        ))))
+
+    answer.invoke.side_effect = invoke
+    with patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+         patch.object(graph_module.genai_client.models, "generate_content", side_effect=responses), \
+         patch.object(graph_module, "invoke_structured", return_value=Reflection(
+             is_sufficient=True, knowledge_gap="", follow_up_queries=[])), \
+         patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        state = graph_module.graph.invoke(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")]},
+            {"configurable": {"number_of_initial_queries": 2}},
+        )
+
+    assert sorted(state["sources"]["urls"]) == ["https://burpple.com", "https://eatbook.sg", "https://tripadvisor.com"]
+    assert len(state["sources"]["refs"]) == 4
+    assert sorted(source["value"] for source in state["sources_gathered"]) == sorted(state["sources"]["urls"])
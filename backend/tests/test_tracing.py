@@ -0,0 +1,113 @@
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from tests.fakes import FakeRedis
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    import src.agent.graph  # noqa: F401
+    from src.agent.research_cache import ResearchCache
+    from src.agent.tools_and_schemas import Reflection
+
+graph_module = sys.modules["src.agent.graph"]
+# The graph imports `agent.tracing`; configure the provider through it
+tracing = sys.modules[graph_module.traced.__module__]
+
+exporter = InMemorySpanExporter()
+tracing._configured = False
+tracing.setup_tracing(exporter)
+
+
+@pytest.fixture(autouse=True)
+def clear_spans():
+    exporter.clear()
+    yield
+    exporter.clear()
+
+
+def run_graph(reflections):
+    response = Mock(text="Din Tai Fung summary", candidates=[Mock(grounding_metadata=None)])
+    answer = Mock(invoke=Mock(return_value=AIMessage(content="Final answer")))
+    with patch.object(graph_module, "get_research_cache", return_value=ResearchCache(FakeRedis())), \
+         patch.object(graph_module.genai_client.models, "generate_content", return_value=response), \
+         patch.object(graph_module, "invoke_structured", side_effect=reflections), \
+         patch.object(graph_module, "ChatGoogleGenerativeAI", return_value=answer):
+        return graph_module.graph.invoke(
+            {"messages": [HumanMessage(content="Tell me about Din Tai Fung at Orchard")]},
+            {"configurable": {"number_of_initial_queries": 2}},
+        )
+
+
+def spans_by_name():
+    spans = {}
+    for finished in exporter.get_finished_spans():
+        spans.setdefault(finished.name, []).append(finished)
+    return spans
+
+
+def test_nodes_share_one_trace_with_branch_parents():
+    state = run_graph([
+        Reflection(is_sufficient=False, knowledge_gap="prices", follow_up_queries=["Din Tai Fung Orchard prices"]),
+        Reflection(is_sufficient=True, knowledge_gap="", follow_up_queries=[]),
+    ])
+    assert state["messages"][-1].content == "Final answer"
+
+    spans = spans_by_name()
+    assert len(spans["web_research"]) == 3
+    assert len(spans["reflection"]) == 2
+    assert {s.context.trace_id for s in exporter.get_finished_spans()} == {
+        spans["generate_query"][0].context.trace_id
+    }
+
+    generate_query = spans["generate_query"][0].context.span_id
+    first_reflection = min(spans["reflection"], key=lambda s: s.start_time).context.span_id
+    parents = sorted(
+        (s.attributes["research.branch_id"], s.parent.span_id) for s in spans["web_research"]
+    )
+    assert parents == [(0, generate_query), (1, generate_query), (2, first_reflection)]
+
+
+def test_upstream_and_cache_operations_are_children_of_nodes():
+    run_graph([Reflection(is_sufficient=True, knowledge_gap="", follow_up_queries=[])])
+    spans = spans_by_name()
+
+    node_ids = {s.context.span_id: s.name for s in exporter.get_finished_spans()}
+    upstream_parents = {node_ids[s.parent.span_id] for s in spans["upstream_call"]}
+    assert upstream_parents == {"web_research", "reflection", "finalize_answer"}
+    assert node_ids[spans["research_cache.get_sections"][0].parent.span_id] == "generate_query"
+    assert {node_ids[s.parent.span_id] for s in spans["research_cache.add_result"]} == {"web_research"}
+
+
+def test_run_id_determines_trace_id():
+    run_id = "1b4e28ba-2fa1-11d2-883f-0016d3cca427"
+    context = tracing.run_root_context({"metadata": {"run_id": run_id}})
+    span_context = tracing.trace.get_current_span(context).get_span_context()
+    assert span_context.trace_id == int(run_id.replace("-", ""), 16)
+
+
+def test_traceparent_round_trip():
+    with tracing.tracer.start_as_current_span("parent") as parent:
+        traceparent = tracing.format_context(parent)
+    restored = tracing.trace.get_current_span(tracing.parse_context(traceparent))
+    assert restored.get_span_context().span_id == parent.get_span_context().span_id
+
+
+def test_file_exporter_and_waterfall(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    file_exporter = tracing.FileSpanExporter(str(path))
+    run_graph([Reflection(is_sufficient=True, knowledge_gap="", follow_up_queries=[])])
+    file_exporter.export(exporter.get_finished_spans())
+
+    waterfall = tracing.render_waterfall(tracing.load_spans(str(path)))
+    lines = waterfall.splitlines()
+    assert lines[0].startswith("trace 0x")
+    assert any(line.strip().startswith("generate_query") for line in lines)
+    assert any(line.strip().startswith("web_research") for line in lines)
@@ -0,0 +1,94 @@
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent.vector_search import VectorIndex, _normalize, brute_force_search
+
+
+def clustered_vectors(n, dim=32, topics=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim))
+    return _normalize(centers[rng.integers(0, topics, n)] + rng.standard_normal((n, dim)) * 0.5)
+
+
+class TestVectorIndex:
+    def test_exact_before_training(self):
+        index = VectorIndex(dim=4, min_train_size=100)
+        index.add(["a", "b"], [[1, 0, 0, 0], [0, 1, 0, 0]], [{"restaurant_name": "A"}, None])
+
+        result = index.search([1, 0.1, 0, 0], match_count=1)
+
+        assert not index.is_trained
+        assert result[0]["id"] == "a"
+        assert result[0]["restaurant_name"] == "A"
+        assert result[0]["similarity"] == pytest.approx(0.995, abs=0.01)
+
+    def test_match_threshold(self):
+        index = VectorIndex(dim=4)
+        index.add(["a", "b"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+
+        result = index.search([1, 0, 0, 0], match_count=10, match_threshold=0.5)
+
+        assert [match["id"] for match in result] == ["a"]
+
+    def test_trains_and_keeps_recall(self):
+        data = clustered_vectors(600)
+        index = VectorIndex(dim=32, n_lists=8, n_probe=3, min_train_size=500)
+        index.add([str(i) for i in range(600)], data)
+
+        assert index.is_trained
+        hits = 0
+        for query in data[:20]:
+            expected = {row for row, _ in brute_force_search(data, query, match_count=5)}
+            found = {int(m["id"]) for m in index.search(query, match_count=5)}
+            hits += len(expected & found)
+        assert hits / 100 >= 0.9
+
+    def test_incremental_insert_after_training(self):
+        data = clustered_vectors(300)
+        index = VectorIndex(dim=32, n_lists=4, min_train_size=200)
+        index.add([str(i) for i in range(300)], data)
+        index.add(["new"], [data[0] * 2])
+
+        result = index.search(data[0], match_count=2)
+
+        assert {m["id"] for m in result} == {"0", "new"}
+
+    def test_replace_and_remove(self):
+        index = VectorIndex(dim=4)
+        index.add(["a"], [[1, 0, 0, 0]])
+        index.add(["a"], [[0, 1, 0, 0]])
+
+        assert len(index) == 1
+        assert index.search([0, 1, 0, 0], match_count=1)[0]["id"] == "a"
+        assert index.search([1, 0, 0, 0], match_count=5, match_threshold=0.5) == []
+
+        assert index.remove("a") is True
+        assert index.search([0, 1, 0, 0]) == []
+
+    def test_dimension_mismatch(self):
+        index = VectorIndex(dim=4)
+        with pytest.raises(ValueError):
+            index.add(["a"], [[1, 0, 0]])
+        with pytest.raises(ValueError):
+            index.search([1, 0, 0])
+
+    @pytest.mark.parametrize("quantization", ["int8", "float16"])
+    def test_save_and_load(self, tmp_path, quantization):
+        data = clustered_vectors(50)
+        index = VectorIndex(dim=32, quantization=quantization)
+        index.add([str(i) for i in range(50)], data, [{"n": i} for i in range(50)])
+        path = str(tmp_path / "index.npz")
+
+        index.save(path)
+        loaded = VectorIndex.load(path)
+
+        assert len(loaded) == 50
+        assert loaded.search(data[7], match_count=1)[0]["n"] == 7
@@ -0,0 +1,343 @@
+import os
+import sys
+import time
+import uuid
+from unittest.mock import patch
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ["GEMINI_API_KEY"] = "test-api-key"
+
+with patch('google.genai.Client'), \
+     patch('langchain_google_genai.ChatGoogleGenerativeAI'), \
+     patch('redis.Redis.from_url'):
+    from src.agent import app as app_module
+    from src.agent.app import app
+    from src.agent.embeddings import EmbeddingService, FakeEmbeddingProvider
+    from src.agent.writeback import (
+        InMemoryWriter,
+        PostgresWriter,
+        WritebackItem,
+        WritebackPipeline,
+        extractive_summary,
+    )
+
+# The app and the graph use the `agent.writeback` copy of the module
+writeback_module = sys.modules["agent.writeback"]
+
+USER = "00000000-0000-0000-0000-000000000001"
+OTHER_USER = "00000000-0000-0000-0000-000000000002"
+JWT_SECRET = "test-jwt-secret-of-at-least-32-bytes"
+ANSWER = (
+    "## Menu\n"
+    "Din Tai Fung is known for its xiao long bao [burpple](https://burpple.com/dtf). Queues are long.\n"
+    "## Dietary\nNo information found."
+)
+
+
+def item(name="Din Tai Fung", answer=ANSWER, user_id=USER, **fields):
+    return WritebackItem(user_id=user_id, restaurant_name=name, answer=answer, **fields)
+
+
+def interaction(writer, name="Din Tai Fung", user_id=USER, address=None, interaction_type="view"):
+    row_id = str(uuid.uuid4())
+    writer.rows[row_id] = {
+        "id": row_id, "user_id": user_id, "restaurant_name": name, "restaurant_address": address,
+        "interaction_type": interaction_type, "summary": None, "embedding": None,
+    }
+    return row_id
+
+
+def bearer(user_id=USER, secret=JWT_SECRET):
+    token = jwt.encode({"sub": user_id, "aud": "authenticated"}, secret, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+class FlakyWriter(InMemoryWriter):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def update(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        return super().update(rows)
+
+
+@pytest.fixture
+def provider():
+    return FakeEmbeddingProvider(dim=8)
+
+
+def pipeline(writer, provider, **kwargs):
+    return WritebackPipeline(writer, EmbeddingService(provider), retry_backoff=0, **kwargs)
+
+
+def test_extractive_summary_skips_headings_and_links():
+    assert extractive_summary(ANSWER) == "Din Tai Fung is known for its xiao long bao."
+    assert extractive_summary("## Menu\nNo information found.") == ""
+
+
+def test_items_match_the_users_rows_for_the_restaurant():
+    row = {"id": "row-1", "user_id": USER, "restaurant_name": "Din Tai Fung", "restaurant_address": "290 Orchard Rd"}
+    assert item().matches(row)
+    assert item(name="din tai fung", restaurant_address="orchard").matches(row)
+    assert item(interaction_id="row-1", name="Anything").matches(row)
+    assert not item(restaurant_address="Marina Bay").matches(row)
+    assert not item(interaction_id="row-2").matches(row)
+    assert not item(user_id=OTHER_USER).matches(row)
+    assert item().key() == item(name="DIN TAI FUNG", answer="newer answer").key()
+
+
+def test_batches_summaries_and_embeddings(provider):
+    writer = InMemoryWriter()
+    calls = []
+
+    def summarize(answers):
+        calls.append(len(answers))
+        return [f"Summary {len(calls)}.{index}" for index in range(len(answers))]
+
+    wb = pipeline(writer, provider, summarize=summarize, batch_size=3)
+    ids = [interaction(writer, name=f"Restaurant {index}") for index in range(5)]
+    for index in range(5):
+        assert wb.submit(item(name=f"Restaurant {index}"))
+    assert wb.flush() == 5
+
+    assert calls == [3, 2]
+    assert [len(texts) for texts in provider.calls] == [3, 2]
+    assert writer.batches == [3, 2]
+    row = writer.rows[ids[0]]
+    assert row["summary"] == "Summary 1.0"
+    assert len(row["embedding"]) == 8
+
+
+def test_summarizer_failure_falls_back_to_extract(provider):
+    writer = InMemoryWriter()
+    wb = pipeline(writer, provider, summarize=lambda answers: ["only one"] * (len(answers) - 1))
+    interaction(writer)
+    interaction(writer, name="Jumbo")
+    wb.submit(item())
+    wb.submit(item(name="Jumbo"))
+    wb.flush()
+    assert {row["summary"] for row in writer.rows.values()} == {"Din Tai Fung is known for its xiao long bao."}
+
+
+def test_duplicates_in_a_batch_keep_latest(provider):
+    writer = InMemoryWriter()
+    wb = pipeline(writer, provider)
+    interaction(writer)
+    wb.submit(item(answer="Old news."))
+    wb.submit(item(answer="Fresh news."))
+    assert wb.flush() == 1
+    assert [row["summary"] for row in writer.rows.values()] == ["Fresh news."]
+
+
+def test_retries_are_idempotent(provider):
+    writer = FlakyWriter(failures=2)
+    wb = pipeline(writer, provider, max_attempts=3)
+    interaction(writer)
+    wb.submit(item())
+    assert wb.flush() == 1
+    assert len(writer.rows) == 1
+
+    # Writing the same interaction again updates the row in place
+    wb.submit(item(answer="Now serves vegan dumplings."))
+    wb.flush()
+    assert len(writer.rows) == 1
+    assert next(iter(writer.rows.values()))["summary"] == "Now serves vegan dumplings."
+
+
+def test_gives_up_after_max_attempts(provider):
+    writer = FlakyWriter(failures=5)
+    wb = pipeline(writer, provider, max_attempts=2)
+    row_id = interaction(writer)
+    wb.submit(item())
+    assert wb.flush() == 0
+    assert writer.rows[row_id]["summary"] is None
+
+
+def test_fills_every_interaction_with_the_restaurant_and_never_inserts(provider):
+    metrics = writeback_module.metrics
+    metrics.reset()
+    writer = InMemoryWriter()
+    wb = pipeline(writer, provider)
+    view = interaction(writer, address="290 Orchard Rd")
+    favorite = interaction(writer, name="din tai fung", address="290 Orchard Rd", interaction_type="favorite")
+    elsewhere = interaction(writer, address="1 Marina Bay")
+    wb.submit(item(restaurant_address="Orchard"))
+    wb.submit(item(name="Jumbo"))
+    assert wb.flush() == 2
+
+    assert len(writer.rows) == 3
+    assert writer.rows[view]["summary"] == writer.rows[favorite]["summary"] == "Din Tai Fung is known for its xiao long bao."
+    assert writer.rows[elsewhere]["summary"] is None
+    # Only the rows actually filled are counted
+    assert metrics.counter("writeback.rows") == 2
+    metrics.reset()
+
+
+def test_backpressure(provider):
+    wb = pipeline(InMemoryWriter(), provider, max_pending=2)
+    assert wb.submit(item(name="a"))
+    assert wb.submit(item(name="b"))
+    assert not wb.submit(item(name="c"))
+    assert wb.pending == 2
+
+
+def test_background_thread_flushes_partial_batches(provider):
+    writer = InMemoryWriter()
+    row_id = interaction(writer)
+    wb = pipeline(writer, provider, batch_size=10, flush_interval=0.05).start()
+    try:
+        wb.submit(item())
+        deadline = time.monotonic() + 5
+        while not writer.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        wb.stop()
+    assert writer.rows[row_id]["summary"] == "Din Tai Fung is known for its xiao long bao."
+
+
+def test_rows_of_other_users_are_not_overwritten(provider):
+    writer = InMemoryWriter()
+    wb = pipeline(writer, provider)
+    row_id = interaction(writer)
+    wb.submit(item(interaction_id=row_id))
+    wb.flush()
+
+    wb.submit(item(answer="Closed for good.", user_id=OTHER_USER, interaction_id=row_id))
+    wb.submit(item(answer="Closed for good.", user_id=OTHER_USER))
+    assert wb.flush() == 0
+    assert writer.rows[row_id]["user_id"] == USER
+    assert writer.rows[row_id]["summary"] == "Din Tai Fung is known for its xiao long bao."
+
+
+def test_writeback_endpoint(provider, monkeypatch):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", JWT_SECRET)
+    writer = InMemoryWriter()
+    row_id = interaction(writer)
+    wb = pipeline(writer, provider, max_pending=1)
+    client = TestClient(app)
+    with patch.object(app_module, "get_writeback_pipeline", return_value=wb):
+        response = client.post("/writeback", headers=bearer(), json={"items": [
+            {"restaurant_name": "Din Tai Fung", "answer": ANSWER, "interaction_id": row_id},
+            {"restaurant_name": "Jumbo", "answer": ANSWER},
+        ]})
+        assert response.status_code == 202
+        assert response.json() == {"accepted": 1, "rejected": [1]}
+        assert response.headers["Retry-After"] == "5"
+
+        response = client.post("/writeback", headers=bearer(), json={"items": [
+            {"restaurant_name": "Jumbo", "answer": ANSWER},
+        ]})
+        assert response.status_code == 503
+
+        response = client.post("/writeback", headers=bearer(), json={"items": [
+            {"restaurant_name": "Jumbo", "answer": ANSWER, "interaction_id": "not-a-uuid"},
+        ]})
+        assert response.status_code == 422
+
+    assert wb.flush() == 1
+    assert writer.rows[row_id]["summary"] == "Din Tai Fung is known for its xiao long bao."
+
+
+@pytest.mark.parametrize("headers, status", [
+    ({}, 401),
+    (bearer(secret="wrong-jwt-secret-of-at-least-32-bytes"), 401),
+    ({"Authorization": "Basic dXNlcjpwYXNz"}, 401),
+])
+def test_writeback_endpoint_requires_a_valid_token(provider, monkeypatch, headers, status):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", JWT_SECRET)
+    wb = pipeline(InMemoryWriter(), provider)
+    client = TestClient(app)
+    with patch.object(app_module, "get_writeback_pipeline", return_value=wb):
+        response = client.post("/writeback", headers=headers, json={"items": [
+            {"restaurant_name": "Din Tai Fung", "answer": ANSWER},
+        ]})
+    assert response.status_code == status
+    assert wb.pending == 0
+
+
+def test_writeback_endpoint_without_auth_configured(provider, monkeypatch):
+    monkeypatch.delenv("SUPABASE_JWT_SECRET", raising=False)
+    response = TestClient(app).post("/writeback", headers=bearer(), json={"items": [
+        {"restaurant_name": "Din Tai Fung", "answer": ANSWER},
+    ]})
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize("user_id, topic, queued", [
+    (USER, "Tell me about Din Tai Fung at Orchard", True),
+    (None, "Tell me about Din Tai Fung at Orchard", False),
+    (USER, "Which ramen places near Bugis are good for a date?", False),
+])
+def test_finished_answers_are_queued_from_the_graph(provider, user_id, topic, queued):
+    writer = InMemoryWriter()
+    row_id = interaction(writer, address="290 Orchard Rd")
+    wb = pipeline(writer, provider)
+    with patch.object(writeback_module, "get_writeback_pipeline", return_value=wb):
+        assert writeback_module.queue_answer(user_id, topic, ANSWER) is queued
+    assert wb.flush() == int(queued)
+    assert len(writer.rows) == 1
+    assert (writer.rows[row_id]["summary"] is not None) is queued
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.getenv("WRITEBACK_TEST_DATABASE_URL"), reason="WRITEBACK_TEST_DATABASE_URL not set")
+def test_postgres_update(provider):
+    import psycopg
+
+    dsn = os.environ["WRITEBACK_TEST_DATABASE_URL"]
+    schema = f"writeback_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute(
+            f"CREATE TABLE {schema}.user_restaurant_interactions ("
+            "id uuid DEFAULT gen_random_uuid() PRIMARY KEY, user_id uuid, restaurant_name text NOT NULL, "
+            "restaurant_address text, restaurant_cuisine text, interaction_type text NOT NULL, "
+            "interaction_date timestamptz DEFAULT now(), created_at timestamptz DEFAULT now(), "
+            "embedding vector(8), summary text)"
+        )
+        try:
+            insert = (
+                f"INSERT INTO {schema}.user_restaurant_interactions "
+                f"(user_id, restaurant_name, restaurant_address, interaction_type) VALUES (%s, %s, %s, %s) RETURNING id"
+            )
+            for row in [
+                (USER, "Din Tai Fung", "290 Orchard Rd", "view"),
+                (USER, "Din Tai Fung", "290 Orchard Rd", "favorite"),
+                (USER, "Din Tai Fung", "1 Marina Bay", "view"),
+            ]:
+                conn.execute(insert, row)
+            existing = conn.execute(insert, (USER, "Jumbo", None, "click")).fetchone()[0]
+
+            writer = PostgresWriter(dsn, table=f"{schema}.user_restaurant_interactions")
+            wb = pipeline(writer, provider)
+            wb.submit(item(restaurant_address="orchard"))
+            wb.submit(item(name="Jumbo", answer="Chilli crab by the river.", interaction_id=str(existing)))
+            wb.submit(item(name="Burnt Ends", answer="Closed."))
+            assert wb.flush() == 3
+            # A retried batch rewrites the same rows
+            wb.submit(item(restaurant_address="orchard"))
+            assert wb.flush() == 2
+            # Another user's answers don't overwrite the rows
+            wb.submit(item(name="Jumbo", answer="Closed.", user_id=OTHER_USER, interaction_id=str(existing)))
+            wb.submit(item(answer="Closed.", user_id=OTHER_USER))
+            assert wb.flush() == 0
+
+            rows = conn.execute(
+                f"SELECT restaurant_name, restaurant_address, interaction_type, summary, embedding IS NOT NULL "
+                f"FROM {schema}.user_restaurant_interactions ORDER BY restaurant_name, restaurant_address, interaction_type"
+            ).fetchall()
+            assert rows == [
+                ("Din Tai Fung", "1 Marina Bay", "view", None, False),
+                ("Din Tai Fung", "290 Orchard Rd", "favorite", "Din Tai Fung is known for its xiao long bao.", True),
+                ("Din Tai Fung", "290 Orchard Rd", "view", "Din Tai Fung is known for its xiao long bao.", True),
+                ("Jumbo", None, "click", "Chilli crab by the river.", True),
+            ]
+        finally:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
@@ -4,6 +4,7 @@ import { useLocalSearchParams, useRouter } from 'expo-router';
 import Constants from 'expo-constants';
 import Markdown from 'react-native-markdown-display';
 import { RestaurantService } from '../../lib/database';
+import { supabase } from '../../lib/supabase';
 import { IconSymbol } from '../../components/ui/IconSymbol';
 
 
@@ -107,10 +108,12 @@ export default function RestaurantInfo() {
         }
 
         const apiUrl = Constants.expoConfig?.extra?.apiUrl || 'http://localhost:2024';
+        const { data: { session } } = await supabase.auth.getSession();
         const response = await fetch(`${apiUrl}/runs/stream`, {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
+            ...(session ? { Authorization: `Bearer ${session.access_token}` } : {}),
           },
           body: JSON.stringify({
             assistant_id: "agent",